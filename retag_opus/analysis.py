@@ -0,0 +1,300 @@
+"""Module for analysing music files before their tags are resolved.
+
+The analysis of a file reads its tags and parses new tags from them
+and from the YouTube description, without any user interaction. It can
+therefore run in a background thread or in worker processes, ahead of
+the file the user is working on, while the results are handled in order
+in the main thread.
+"""
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping
+
+from retag_opus.custom_rules import TagRule
+from retag_opus.description_parser import DescriptionParser
+from retag_opus.memo import DEFAULT_MEMO_SIZE, MemoCounts, counts_since, memo_counts, resize_memos
+from retag_opus.music_tags import MusicTags
+from retag_opus.opus_reader import read_tags
+from retag_opus.profiling import (
+    STAGE_PARSE_DESCRIPTION,
+    STAGE_PARSE_TAGS,
+    STAGE_PRUNE,
+    STAGE_READ,
+    Profiler,
+)
+from retag_opus.tags_parser import TagsParser
+
+if TYPE_CHECKING:
+    from retag_opus.cache import AnalysisCache
+
+Tags = dict[str, list[str]]
+
+PENDING_FILES_PER_JOB = 4
+
+
+class AnalysisOptions:
+    """Settings that affect how files are analysed."""
+
+    def __init__(
+        self,
+        manual_album: str | None = None,
+        tags_to_delete: list[str] | None = None,
+        strings_to_delete_tags_based_on: list[str] | None = None,
+        custom_rules: tuple[TagRule, ...] = (),
+        memo_size: int = DEFAULT_MEMO_SIZE,
+        stop_tags: tuple[str, ...] = (),
+    ) -> None:
+        """Set the options.
+
+        :param manual_album: Album set manually by the user, if any.
+        :param tags_to_delete: Tags that should always be removed.
+        :param strings_to_delete_tags_based_on: Regexes that cause a tag
+            to be removed if they fully match any of its values.
+        :param custom_rules: Tag rules from the config file.
+        :param memo_size: Number of results each memo of the split and
+            prune helpers keeps. 0 turns the memos off.
+        :param stop_tags: Tags after which to stop parsing a description,
+            once each of them has a value. If empty, whole descriptions
+            are parsed.
+        """
+        self.manual_album = manual_album
+        self.tags_to_delete = tags_to_delete or []
+        self.strings_to_delete_tags_based_on = strings_to_delete_tags_based_on or []
+        self.custom_rules = custom_rules
+        self.memo_size = memo_size
+        self.stop_tags = stop_tags
+
+
+class FileAnalysis:
+    """The tags found for one music file, before they are resolved.
+
+    When the analysis is made by the pipeline with proposals turned on,
+    it also has the tags the file would be saved with, the conflicts
+    that were resolved with the policy to get them, and the messages
+    about the tags that were resolved.
+
+    A file that can't be read or parsed has an analysis with the error
+    and no tags, so that one broken file doesn't stop the others.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        tags: MusicTags,
+        description_lines: list[str] | None,
+        new_data_exists: bool,
+        status: str | None = None,
+        timings: dict[str, float] | None = None,
+        memo_counts: MemoCounts | None = None,
+        error: Exception | None = None,
+    ) -> None:
+        """Store the result of the analysis.
+
+        :param file_path: The analysed music file.
+        :param tags: The tags from all sources, with the tags that are
+            resolved automatically.
+        :param description_lines: The YouTube description of the song,
+            if it has one.
+        :param new_data_exists: Whether anything new was found.
+        :param status: What the user did with the file in an earlier
+            run, if it is unchanged since then.
+        :param timings: Seconds spent in each stage of the analysis, if
+            it was just made.
+        :param memo_counts: Hits and misses of each memo during the
+            analysis, if it was just made.
+        :param error: The error that stopped the file from being read or
+            parsed, if any.
+        """
+        self.file_path = file_path
+        self.tags = tags
+        self.description_lines = description_lines
+        self.new_data_exists = new_data_exists
+        self.status = status
+        self.timings = timings or {}
+        self.memo_counts = memo_counts or {}
+        self.error = error
+        self.resolved: Mapping[str, list[str]] | None = None
+        self.conflicts: dict[str, dict[str, list[str]]] = {}
+        self.messages: list[str] = []
+
+    @classmethod
+    def failed(cls, file_path: Path, error: Exception) -> "FileAnalysis":
+        """Make the analysis of a file that couldn't be read or parsed.
+
+        :param file_path: The music file.
+        :param error: The error that stopped the analysis.
+
+        :return: An analysis with the error and without any tags.
+        """
+        return cls(file_path, MusicTags(), None, False, error=error)
+
+
+def analyze_file(file_path: Path, options: AnalysisOptions) -> FileAnalysis:
+    """Read a music file and parse new tags from it.
+
+    Errors reading or parsing the file are caught and returned in the
+    analysis instead of being raised.
+
+    :param file_path: The music file to analyse.
+    :param options: Settings for the analysis.
+
+    :return: The result of the analysis.
+    """
+    try:
+        return _analyze_file(file_path, options)
+    except Exception as e:
+        return FileAnalysis.failed(file_path, e)
+
+
+def _analyze_file(file_path: Path, options: AnalysisOptions) -> FileAnalysis:
+    """Read a music file and parse new tags from it, raising any error."""
+    manual_album_set = options.manual_album is not None
+    profiler = Profiler()
+    profiler.enable()
+    resize_memos(options.memo_size)
+    earlier_memo_counts = memo_counts()
+
+    # 1. Read the data and make basic improvements
+    with profiler.stage(STAGE_READ):
+        old_tags = read_tags(file_path)
+    tags = MusicTags(manual_album_set=manual_album_set, custom_rules=options.custom_rules)
+
+    tags.original = old_tags
+    tags.discard_upload_date()
+    if options.manual_album is not None:
+        tags.switch_album_to_disc_subtitle(options.manual_album)
+
+    tags.resolved = tags.original
+
+    with profiler.stage(STAGE_PARSE_TAGS):
+        old_tags_parser = TagsParser(tags.original)
+        old_tags_parser.parse_tags()
+        old_tags_parser.split_select_original_tags()
+        tags.fromtags = old_tags_parser.tags
+
+    # 1.1 Manually set album
+    if options.manual_album is not None:
+        tags.resolved["album"] = [options.manual_album]
+
+    # 2. Get description
+    description_lines: list[str] | None = old_tags.get("synopsis")
+    if description_lines is None:
+        description_lines = old_tags.get("description")
+
+    # 3. If description exists, send it to be parsed
+    if description_lines:
+        with profiler.stage(STAGE_PARSE_DESCRIPTION):
+            desc_parser = DescriptionParser(
+                manual_album_set=manual_album_set, custom_rules=options.custom_rules, stop_tags=options.stop_tags
+            )
+            description = "\n".join(description_lines)
+            desc_parser.parse(description)
+            tags.youtube = desc_parser.tags
+            tags.add_source_tag()
+
+        with profiler.stage(STAGE_PARSE_TAGS):
+            new_tags_parser = TagsParser(tags.youtube)
+            new_tags_parser.parse_tags()
+            tags.fromdesc = new_tags_parser.tags
+
+    # 4.5 Get rid of shady tags
+    with profiler.stage(STAGE_PRUNE):
+        tags.prune_resolved_tags(options.tags_to_delete, options.strings_to_delete_tags_based_on)
+
+    timings = {stage: sum(durations) for stage, durations in profiler.durations.items()}
+    return FileAnalysis(
+        file_path,
+        tags,
+        description_lines,
+        tags.check_any_new_data_exists(),
+        timings=timings,
+        memo_counts=counts_since(earlier_memo_counts),
+    )
+
+
+def analyze_files(
+    file_paths: Iterable[Path],
+    options: AnalysisOptions,
+    jobs: int = 1,
+    prefetch: int = 0,
+    cache: "AnalysisCache | None" = None,
+) -> Iterator[FileAnalysis]:
+    """Analyse music files, in the background or in parallel.
+
+    The results are yielded in the same order as the files are given.
+    With more than one job, the files are analysed in a process pool.
+    Otherwise, if prefetch is set, they are analysed in a background
+    thread while the previous result is being handled. Either way, only
+    a limited number of files are analysed ahead of the consumer, so
+    that memory use doesn't grow with the number of files.
+
+    Files found in the cache are not analysed again, and new analyses
+    are stored in it, unless they failed. A file whose analysis fails,
+    also when its worker process does, is yielded with the error.
+
+    :param file_paths: The music files to analyse.
+    :param options: Settings for the analysis.
+    :param jobs: Number of worker processes to use.
+    :param prefetch: Number of files to analyse ahead of the one that
+        was last yielded.
+    :param cache: Cache of analyses from earlier runs.
+
+    :return: Iterator with the analysis of each file.
+    """
+    executor: Executor
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        window = max(jobs * PENDING_FILES_PER_JOB, prefetch + 1)
+    elif prefetch > 0:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retag-prefetch")
+        window = prefetch + 1
+    else:
+        for file_path in file_paths:
+            analysis = cache.get(file_path, options) if cache is not None else None
+            if analysis is None:
+                analysis = analyze_file(file_path, options)
+                if cache is not None and analysis.error is None:
+                    cache.put(analysis, options)
+            yield analysis
+        return
+
+    try:
+        # Pending analyses, their files, and whether they should be stored
+        # in the cache
+        pending: deque[tuple[Future[FileAnalysis], Path, bool]] = deque()
+        for file_path in file_paths:
+            cached = cache.get(file_path, options) if cache is not None else None
+            if cached is not None:
+                done: Future[FileAnalysis] = Future()
+                done.set_result(cached)
+                pending.append((done, file_path, False))
+            else:
+                pending.append((executor.submit(analyze_file, file_path, options), file_path, True))
+            if len(pending) >= window:
+                yield _finish(*pending.popleft(), options, cache)
+        while pending:
+            yield _finish(*pending.popleft(), options, cache)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _finish(
+    future: Future[FileAnalysis],
+    file_path: Path,
+    is_new: bool,
+    options: AnalysisOptions,
+    cache: "AnalysisCache | None",
+) -> FileAnalysis:
+    """Wait for an analysis and store it in the cache if it is new.
+
+    Errors from the worker, such as it being killed, are returned in the
+    analysis instead of being raised.
+    """
+    try:
+        analysis = future.result()
+    except Exception as e:
+        return FileAnalysis.failed(file_path, e)
+    if is_new and cache is not None and analysis.error is None:
+        cache.put(analysis, options)
+    return analysis
@@ -0,0 +1,242 @@
+"""Module for saving tags without risking the music file.
+
+The tags are written to a copy of the music file next to it, which then
+replaces the original with a rename. The copy shares its data blocks
+with the original where the file system supports it, and is otherwise
+made by the kernel, so the audio is never copied through the app. Each
+step is recorded in a journal of the process, so that saves interrupted
+by a crash can be finished or undone when the app is started again.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import IO, Final, Iterable
+
+from retag_opus.opus_writer import save_tags
+
+Tags = dict[str, list[str]]
+
+FICLONE: Final[int] = 0x40049409
+"""The Linux ioctl for making a copy that shares data with the original."""
+
+SAVE_STARTED: Final[str] = "started"
+SAVE_READY: Final[str] = "ready"
+SAVE_DONE: Final[str] = "done"
+
+
+def sync_file(file_path: Path) -> None:
+    """Make sure the contents of a file are written to the disk."""
+    with open(file_path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def sync_directory(directory: Path) -> None:
+    """Make sure renames in a directory are written to the disk."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def copy_owner(source: Path, destination: Path) -> None:
+    """Give a file the owner and group of another, as far as allowed.
+
+    Only root can give a file away, but the group can be set to any
+    group the user is in. Whatever isn't allowed is left as it is.
+    """
+    stat = os.stat(source)
+    try:
+        os.chown(destination, stat.st_uid, stat.st_gid)
+    except PermissionError:
+        try:
+            os.chown(destination, -1, stat.st_gid)
+        except PermissionError:
+            pass
+
+
+def clone_file(source: Path, destination: Path) -> None:
+    """Copy a file with as little copying of data as possible.
+
+    A reflink is tried first, then copy_file_range, which lets the file
+    system copy the data without it passing through the app, and
+    finally an ordinary copy. The owner, permissions, timestamps and
+    extended attributes are copied too, so that the copy can replace the
+    original like a save that changed the file in place.
+
+    :param source: The file to copy.
+    :param destination: The new file.
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            except OSError:
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                shutil.copyfileobj(src, dst)
+    copy_owner(source, destination)
+    shutil.copystat(source, destination)
+
+
+class SaveJournal:
+    """Record of the steps of atomic saves, for recovering from crashes.
+
+    Every process has its own journal, which it holds a lock on while it
+    is open, so that journals are only recovered once the process that
+    wrote them has ended.
+    """
+
+    def __init__(self, journal_path: Path) -> None:
+        """Open the journal and lock it.
+
+        :param journal_path: The journal file.
+        """
+        self.journal_path = journal_path
+        journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: IO[str] = open(journal_path, "a", encoding="utf-8")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def path_for(state_dir: Path) -> Path:
+        """Get the path of the journal of this process.
+
+        :param state_dir: Directory for journals.
+
+        :return: The journal file.
+        """
+        return state_dir / f"saves-{os.getpid()}.jsonl"
+
+    def record(self, file_path: Path, temp_path: Path, state: str) -> None:
+        """Append a step of a save to the journal.
+
+        The journal is synced when a copy is ready to replace the
+        original, since that is when a crash must lead to finishing the
+        save rather than undoing it.
+
+        :param file_path: The music file being saved.
+        :param temp_path: The copy the tags are written to.
+        :param state: One of the SAVE_ constants.
+        """
+        entry = {"path": str(file_path), "temp": str(temp_path), "state": state}
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            if state == SAVE_READY:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Remove the journal, since all saves are done, and close it.
+
+        The journal is removed before its lock is let go, so that it is
+        never recovered while it is being removed.
+        """
+        self.journal_path.unlink(missing_ok=True)
+        self._file.close()
+
+    @staticmethod
+    def recover(state_dir: Path) -> tuple[int, int]:
+        """Finish or undo the saves that were interrupted.
+
+        Only the journals of processes that have ended are recovered,
+        which are those that can be locked. The journals of processes
+        that are still saving are left alone.
+
+        :param state_dir: Directory for journals.
+
+        :return: The number of saves that were finished and undone.
+        """
+        finished = undone = 0
+        for journal_path in sorted(state_dir.glob("saves*.jsonl")):
+            try:
+                f = open(journal_path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                if not journal_path.exists():
+                    continue
+                journal_finished, journal_undone = SaveJournal._recover_saves(f)
+                journal_path.unlink()
+            finished += journal_finished
+            undone += journal_undone
+        return finished, undone
+
+    @staticmethod
+    def _recover_saves(journal: IO[str]) -> tuple[int, int]:
+        """Finish or undo the unfinished saves of a journal.
+
+        A save whose copy was ready is finished by replacing the music
+        file with the copy. The copies of other unfinished saves are
+        removed, which leaves the music file as it was.
+
+        :param journal: The open journal file.
+
+        :return: The number of saves that were finished and undone.
+        """
+        states: dict[tuple[str, str], str] = {}
+        for line in journal:
+            try:
+                entry = json.loads(line)
+                states[(str(entry["path"]), str(entry["temp"]))] = str(entry["state"])
+            except (ValueError, KeyError, TypeError):
+                continue
+
+        finished = undone = 0
+        for (path, temp), state in states.items():
+            temp_path = Path(temp)
+            if state == SAVE_DONE or not temp_path.exists():
+                continue
+            if state == SAVE_READY:
+                os.replace(temp_path, path)
+                finished += 1
+            else:
+                temp_path.unlink()
+                undone += 1
+        return finished, undone
+
+
+def save_tags_atomically(
+    file_path: Path,
+    new_tags: Tags,
+    deleted_tags: Iterable[str],
+    padding: int,
+    journal: SaveJournal,
+) -> None:
+    """Write tags to a copy of an Opus file and let it replace the file.
+
+    :param file_path: The music file.
+    :param new_tags: Tags to set, replacing any values they have.
+    :param deleted_tags: Tags to remove from the file.
+    :param padding: Number of bytes to reserve after the tags if the
+        comment header has to grow.
+    :param journal: Journal to record the steps of the save in.
+    """
+    temp_path = file_path.with_name(f".{file_path.name}.retag-tmp")
+    journal.record(file_path, temp_path, SAVE_STARTED)
+    try:
+        clone_file(file_path, temp_path)
+        save_tags(temp_path, new_tags, deleted_tags, padding)
+        sync_file(temp_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    journal.record(file_path, temp_path, SAVE_READY)
+    os.replace(temp_path, file_path)
+    sync_directory(file_path.parent)
+    journal.record(file_path, temp_path, SAVE_DONE)
@@ -0,0 +1,390 @@
+"""Benchmarks for the parsing pipeline, run with the retag-bench command.
+
+The benchmarks run on synthetic data: YouTube descriptions like the
+ones generated for songs distributed through Content ID, and Opus files
+of different sizes with such descriptions in their tags. For each stage
+of the pipeline, the throughput and the peak memory use are reported.
+"""
+import argparse
+import json
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Final, Sequence
+
+from mutagen._vorbis import VComment
+from mutagen.ogg import OggPage
+
+from retag_opus.analysis import AnalysisOptions, analyze_file
+from retag_opus.cli import Cli
+from retag_opus.description_parser import DescriptionParser
+from retag_opus.memo import clear_memos
+from retag_opus.music_tags import MusicTags
+from retag_opus.tags_parser import TagsParser
+
+Tags = dict[str, list[str]]
+
+DESCRIPTION_KINDS: Final[tuple[str, ...]] = ("short", "long", "pathological")
+DESCRIPTION_WEIGHTS: Final[tuple[int, ...]] = (6, 3, 1)
+FILE_AUDIO_PAGES: Final[tuple[int, ...]] = (10, 100, 1000)
+"""Number of audio pages of about 10 kB in the files, used in turn."""
+
+NAMES: Final[tuple[str, ...]] = (
+    "Ben Ivor",
+    "The Global",
+    "Anna Lindqvist",
+    "Marcus O'Neill",
+    "DJ Pastel",
+    "Sofía Ramírez",
+    "Kenji Watanabe",
+    "Orchestra of the Night",
+    "Lena Berg",
+    "Tomasz Nowak",
+)
+WORDS: Final[tuple[str, ...]] = ("Proper", "Goodbyes", "Night", "Summer", "Lights", "River", "Echo", "Gold", "Run")
+CREDIT_ROLES: Final[tuple[str, ...]] = (
+    "Composer",
+    "Lyricist",
+    "Composer Lyricist",
+    "Producer",
+    "Associated Performer",
+    "Vocals",
+    "Background Vocalist",
+    "Drums",
+    "Percussion",
+    "Keyboards",
+    "Piano",
+    "Synthesizer",
+    "Guitar",
+    "Acoustic Guitar",
+    "Bass Guitar",
+    "Violin",
+    "Cello",
+    "Programming",
+    "Saxophone",
+    "Flute",
+    "Arranger",
+    "Publisher",
+    "Author",
+    "Mixing Engineer",
+    "Mastering Engineer",
+    "Studio Personnel, Recording Engineer",
+)
+
+
+def _title(rng: random.Random) -> str:
+    """Make up a song title."""
+    return " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+
+
+def generate_description(rng: random.Random, kind: str = "short") -> str:
+    """Generate a YouTube description like those from Content ID.
+
+    :param rng: Source of randomness.
+    :param kind: "short" for a few credits, "long" for a long list of
+        credits, and "pathological" for lines that are slow to match,
+        such as long lines with keywords but without a colon.
+
+    :return: The description.
+    """
+    artists = rng.sample(NAMES, 2)
+    title = _title(rng)
+    year = rng.randint(1960, 2024)
+    lines = [
+        f"Provided to YouTube by {rng.choice(NAMES)} Records",
+        "",
+        f"{title} (feat. {artists[1]}) · {artists[0]} · {artists[1]}",
+        "",
+        _title(rng),
+        "",
+        f"℗ {year} {rng.choice(NAMES)} Records",
+        "",
+        f"Released on: {year}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}",
+        "",
+    ]
+    number_of_credits = rng.randint(2, 6) if kind == "short" else rng.randint(40, 120)
+    for _ in range(number_of_credits):
+        lines.append(f"{rng.choice(CREDIT_ROLES)}: {rng.choice(NAMES)}")
+    if kind == "pathological":
+        lines.extend(
+            [
+                "Performer " * 400,
+                "Composer" + " :" * 500 + " x",
+                "guitar bass drums " * 200 + ":",
+                "℗" * 2000,
+                rng.choice(NAMES) * 300,
+            ]
+        )
+    lines.extend(["", "Auto-generated by YouTube."])
+    return "\n".join(lines)
+
+
+def generate_corpus(count: int, seed: int = 0) -> list[str]:
+    """Generate a mix of descriptions of all kinds.
+
+    :param count: Number of descriptions.
+    :param seed: Seed for the randomness, so that runs are comparable.
+
+    :return: The descriptions.
+    """
+    rng = random.Random(seed)
+    kinds = rng.choices(DESCRIPTION_KINDS, weights=DESCRIPTION_WEIGHTS, k=count)
+    return [generate_description(rng, kind) for kind in kinds]
+
+
+def original_tags(description: str, rng: random.Random) -> Tags:
+    """Make up the tags a downloader would have given a song."""
+    return {
+        "title": [f"{_title(rng)} (feat. {rng.choice(NAMES)}) (2039 Remaster)"],
+        "artist": [f"{rng.choice(NAMES)} and {rng.choice(NAMES)}"],
+        "purl": ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"],
+        "synopsis": [description],
+    }
+
+
+def write_opus_file(file_path: Path, tags: Tags, audio_pages: int = 3, padding: int = 0) -> Path:
+    """Write an Ogg Opus file with the given tags and silent audio.
+
+    :param file_path: The file to write.
+    :param tags: The tags of the file.
+    :param audio_pages: Number of pages of audio, each about 10 kB.
+    :param padding: Number of bytes of padding after the tags.
+
+    :return: The path of the file.
+    """
+    comments = VComment()  # type: ignore
+    comments.vendor = "retag-bench"
+    for key, values in tags.items():
+        for value in values:
+            comments.append((key, value))
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 2, 312, 48000, 0, 0)
+    comment_packet = b"OpusTags" + comments.write(framing=False) + b"\x00" * padding  # type: ignore
+
+    first_page = OggPage()  # type: ignore
+    first_page.packets = [head]
+    first_page.first = True
+    pages = [first_page]
+    pages.extend(OggPage.from_packets([comment_packet], sequence=1))  # type: ignore
+    for number in range(audio_pages):
+        audio_page = OggPage()  # type: ignore
+        audio_page.packets = [b"\xfc" + b"\xff" * 199] * 50
+        audio_page.position = 960 * 50 * (number + 1)
+        audio_page.sequence = len(pages)
+        audio_page.last = number == audio_pages - 1
+        pages.append(audio_page)
+    for page in pages:
+        page.serial = 1234
+        if page.position == -1 and page.complete:
+            page.position = 0
+
+    with open(file_path, "wb") as f:
+        for page in pages:
+            f.write(page.write())  # type: ignore
+    return file_path
+
+
+class BenchmarkResult:
+    """Throughput and memory use of one benchmark."""
+
+    def __init__(self, name: str, unit: str, items: int, lines: int, seconds: float, peak_memory: int) -> None:
+        """Store the result.
+
+        :param name: Name of the benchmark.
+        :param unit: What an item is, e.g. "files".
+        :param items: Number of items handled in each round.
+        :param lines: Number of description lines handled in each round.
+        :param seconds: Time of the fastest round.
+        :param peak_memory: Peak memory allocated during a round, in
+            bytes.
+        """
+        self.name = name
+        self.unit = unit
+        self.items = items
+        self.lines = lines
+        self.seconds = seconds
+        self.peak_memory = peak_memory
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the result as a dictionary that can be saved as JSON."""
+        seconds = max(self.seconds, 1e-9)
+        return {
+            "name": self.name,
+            "unit": self.unit,
+            "items": self.items,
+            "seconds": self.seconds,
+            "items_per_second": self.items / seconds,
+            "lines_per_second": self.lines / seconds if self.lines else None,
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+
+def measure(name: str, unit: str, items: int, lines: int, work: Callable[[], object], repeat: int) -> BenchmarkResult:
+    """Time a benchmark and measure its memory use.
+
+    The memory is measured in a separate round, since tracing
+    allocations slows the code down. The memos are cleared before each
+    round, so that every round starts like a new run.
+
+    :param name: Name of the benchmark.
+    :param unit: What an item is.
+    :param items: Number of items handled by work.
+    :param lines: Number of description lines handled by work.
+    :param work: Function that runs one round of the benchmark.
+    :param repeat: Number of timed rounds, of which the fastest counts.
+
+    :return: The result of the benchmark.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        clear_memos()
+        start = time.perf_counter()
+        work()
+        seconds = min(seconds, time.perf_counter() - start)
+    clear_memos()
+    tracemalloc.start()
+    try:
+        work()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(name, unit, items, lines, seconds, peak_memory)
+
+
+def run_benchmarks(descriptions: int, files: int, repeat: int = 3, seed: int = 0) -> list[BenchmarkResult]:
+    """Run all benchmarks.
+
+    :param descriptions: Number of descriptions to parse.
+    :param files: Number of Opus files to analyse.
+    :param repeat: Number of rounds of each benchmark.
+    :param seed: Seed for generating the data.
+
+    :return: The result of each benchmark.
+    """
+    rng = random.Random(seed)
+    corpus = generate_corpus(descriptions, seed)
+    total_lines = sum(description.count("\n") + 1 for description in corpus)
+    all_original_tags = [original_tags(description, rng) for description in corpus]
+
+    def parse_descriptions() -> list[Tags]:
+        parsed = []
+        for description in corpus:
+            parser = DescriptionParser()
+            parser.parse(description)
+            parsed.append(parser.tags)
+        return parsed
+
+    def parse_tags() -> None:
+        for tags in all_original_tags:
+            TagsParser(tags).parse_tags()
+
+    def parse_many_tags() -> None:
+        TagsParser.parse_many(all_original_tags)
+
+    youtube_tags = parse_descriptions()
+    music_tags = []
+    for tags, youtube in zip(all_original_tags, youtube_tags):
+        song = MusicTags()
+        song.original = tags
+        song.resolved = dict(tags)
+        song.youtube = youtube
+        music_tags.append(song)
+
+    def check_new_data() -> None:
+        for song in music_tags:
+            song.check_any_new_data_exists()
+
+    results = [
+        measure("description_parse", "descriptions", descriptions, total_lines, parse_descriptions, repeat),
+        measure("tags_parse", "songs", descriptions, 0, parse_tags, repeat),
+        measure("tags_parse_many", "songs", descriptions, 0, parse_many_tags, repeat),
+        measure("new_data_check", "songs", descriptions, 0, check_new_data, repeat),
+    ]
+
+    with TemporaryDirectory(prefix="retag-bench-") as temp_dir:
+        file_paths = []
+        file_lines = 0
+        for number in range(files):
+            description = corpus[number % len(corpus)] if corpus else generate_description(rng)
+            file_lines += description.count("\n") + 1
+            audio_pages = FILE_AUDIO_PAGES[number % len(FILE_AUDIO_PAGES)]
+            file_path = Path(temp_dir) / f"song {number}.opus"
+            file_paths.append(write_opus_file(file_path, original_tags(description, rng), audio_pages))
+        options = AnalysisOptions()
+
+        def analyze_files() -> None:
+            for file_path in file_paths:
+                analyze_file(file_path, options)
+
+        results.append(measure("analyze_file", "files", files, file_lines, analyze_files, repeat))
+    return results
+
+
+def format_results(results: Sequence[BenchmarkResult]) -> str:
+    """Format the results as a table."""
+    rows = [("benchmark", "items", "seconds", "items/s", "lines/s", "peak memory")]
+    for result in results:
+        data = result.as_dict()
+        lines_per_second = data["lines_per_second"]
+        rows.append(
+            (
+                result.name,
+                f"{result.items} {result.unit}",
+                f"{result.seconds:.3f}",
+                f"{data['items_per_second']:.1f}",
+                f"{lines_per_second:.0f}" if lines_per_second is not None else "-",
+                f"{result.peak_memory / 1024:.0f} KiB",
+            )
+        )
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if column == 0 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+
+
+def run(argv: Sequence[str] | None = None) -> int:
+    """Run the benchmarks and report the results."""
+    parser = argparse.ArgumentParser(prog="retag-bench", description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--descriptions",
+        type=Cli.positive_int,
+        default=2000,
+        help="Number of descriptions to parse. Default: 2000",
+    )
+    parser.add_argument(
+        "--files",
+        type=Cli.positive_int,
+        default=12,
+        help="Number of Opus files of 100 kB to 10 MB to analyse. Default: 12",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=Cli.positive_int,
+        default=3,
+        help="Number of rounds of each benchmark, of which the fastest is reported. Default: 3",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generating the data. Default: 0")
+    parser.add_argument("--json", default=None, metavar="FILE", help="Also write the results as JSON to a file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.descriptions, args.files, args.repeat, args.seed)
+    print(format_results(results))
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "seed": args.seed,
+                    "results": [result.as_dict() for result in results],
+                },
+                f,
+                indent=2,
+            )
+    return 0
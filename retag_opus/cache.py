@@ -0,0 +1,163 @@
+"""Module for caching the analysis of music files between runs.
+
+The cache is an SQLite database that maps the path of a music file to
+the tags found when it was analysed and to what the user did with it.
+An entry is only used while the file has the same size and modification
+time as when it was stored, and optionally the same hash of the start
+of the file, where the comment header is.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Final
+
+from retag_opus import __version__
+from retag_opus.analysis import AnalysisOptions, FileAnalysis
+from retag_opus.constants import STATUS_SAVED
+from retag_opus.music_tags import MusicTags
+
+HEADER_HASH_SIZE: Final[int] = 64 * 1024
+"""Number of bytes at the start of a file that are hashed."""
+
+SOURCES: Final[tuple[str, ...]] = ("original", "youtube", "fromtags", "fromdesc", "resolved")
+
+
+class AnalysisCache:
+    """Store analyses of music files on disk, keyed by file identity."""
+
+    def __init__(self, db_path: Path, verify_content: bool = False) -> None:
+        """Open the database, creating it if needed.
+
+        :param db_path: Path of the SQLite database.
+        :param verify_content: Whether to also compare a hash of the
+            start of the file, not just its size and modification time.
+        """
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.verify_content = verify_content
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT, "
+            "options_key TEXT, analysis TEXT, status TEXT)"
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    @staticmethod
+    def options_key(options: AnalysisOptions) -> str:
+        """Describe the options and app version that affect an analysis."""
+        return json.dumps(
+            [
+                __version__,
+                options.manual_album,
+                options.tags_to_delete,
+                options.strings_to_delete_tags_based_on,
+                [rule.as_dict() for rule in options.custom_rules],
+                list(options.stop_tags),
+            ]
+        )
+
+    def _identity(self, file_path: Path) -> tuple[int, int, str] | None:
+        """Get size, modification time and header hash of a file.
+
+        :return: The identity of the file, or None if it can't be read.
+        """
+        try:
+            stat = os.stat(file_path)
+            digest = ""
+            if self.verify_content:
+                with open(file_path, "rb") as f:
+                    digest = hashlib.sha1(f.read(HEADER_HASH_SIZE)).hexdigest()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, digest
+
+    def get(self, file_path: Path, options: AnalysisOptions) -> FileAnalysis | None:
+        """Get what is stored about a file that is unchanged since.
+
+        :param file_path: The music file.
+        :param options: The options the file should have been analysed
+            with.
+
+        :return: The stored analysis with the status of the file, if it
+            has one. A file that has been saved has no stored tags, so
+            only its path and status are set. None is returned if the
+            file isn't in the cache, has changed, or was analysed with
+            other options.
+        """
+        identity = self._identity(file_path)
+        if identity is None:
+            return None
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest, options_key, analysis, status FROM files WHERE path = ?",
+            (str(file_path),),
+        ).fetchone()
+        if row is None or tuple(row[:2]) != identity[:2] or row[3] != self.options_key(options):
+            return None
+        if self.verify_content and row[2] != identity[2]:
+            return None
+        tags = MusicTags(manual_album_set=options.manual_album is not None, custom_rules=options.custom_rules)
+        if row[4] is None:
+            if row[5] is None:
+                return None
+            return FileAnalysis(file_path, tags, None, False, status=row[5])
+        data = json.loads(row[4])
+        for source in SOURCES:
+            setattr(tags, source, data["tags"][source])
+        return FileAnalysis(file_path, tags, data["description_lines"], data["new_data_exists"], status=row[5])
+
+    def put(self, analysis: FileAnalysis, options: AnalysisOptions) -> None:
+        """Store a fresh analysis of a file.
+
+        Any status stored for the file is cleared, since the analysis is
+        only redone when the file has changed.
+
+        :param analysis: The analysis to store.
+        :param options: The options the analysis was made with.
+        """
+        identity = self._identity(analysis.file_path)
+        if identity is None:
+            return
+        data = {
+            "tags": {source: getattr(analysis.tags, source).as_dict() for source in SOURCES},
+            "description_lines": analysis.description_lines,
+            "new_data_exists": analysis.new_data_exists,
+        }
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            (str(analysis.file_path), *identity, self.options_key(options), json.dumps(data)),
+        )
+        self.connection.commit()
+
+    def set_status(self, file_path: Path, options: AnalysisOptions, status: str) -> None:
+        """Record what was done with a file.
+
+        The identity of the file is updated, since saving changes the
+        file. The stored analysis is dropped when the file was saved,
+        since it no longer describes the file.
+
+        :param file_path: The music file.
+        :param options: The options the file was analysed with.
+        :param status: One of the status constants in constants.
+        """
+        identity = self._identity(file_path)
+        if identity is None:
+            return
+        if status == STATUS_SAVED:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                (str(file_path), *identity, self.options_key(options), status),
+            )
+        else:
+            self.connection.execute(
+                "UPDATE files SET size = ?, mtime_ns = ?, digest = ?, status = ? WHERE path = ?",
+                (*identity, status, str(file_path)),
+            )
+        self.connection.commit()
@@ -1,22 +1,83 @@
 """Module for parsing command line arguments."""
 import argparse
 from argparse import Namespace
-from typing import Sequence
-
-import shtab
+from typing import Any, Final, Sequence
 
 from retag_opus import __version__
+from retag_opus.constants import SYNC_BATCH, SYNC_POLICIES
+from retag_opus.memo import DEFAULT_MEMO_SIZE
+from retag_opus.resolution_policy import POLICIES
+
+COMPLETION_SHELLS: Final[tuple[str, ...]] = ("bash", "zsh", "tcsh")
+
+PATH_COMPLETIONS: Final[dict[str, str]] = {
+    "dir": "DIRECTORY",
+    "plan": "FILE",
+    "apply": "FILE",
+    "profile_json": "FILE",
+}
+"""The kind of path each option that takes a path is completed with."""
+
+
+class PrintCompletionAction(argparse.Action):
+    """Print a shell completion script for the parser and exit.
+
+    shtab is only imported here, since it is slow to import and not
+    needed for anything else.
+    """
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: Namespace,
+        values: str | Sequence[Any] | None,
+        option_string: str | None = None,
+    ) -> None:
+        """Print the completion script for the given shell."""
+        import shtab
+
+        for action in parser._actions:
+            if action.dest in PATH_COMPLETIONS:
+                action.complete = getattr(shtab, PATH_COMPLETIONS[action.dest])  # type: ignore
+        print(shtab.complete(parser, str(values)))
+        parser.exit(0)
 
 
 class Cli:
     """Class for parsing command line arguments."""
 
+    @staticmethod
+    def positive_int(value: str) -> int:
+        """Convert an argument to an integer that is at least 1."""
+        number = Cli.non_negative_int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1: '{value}'")
+        return number
+
+    @staticmethod
+    def non_negative_int(value: str) -> int:
+        """Convert an argument to an integer that is at least 0."""
+        try:
+            number = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid integer value: '{value}'")
+        if number < 0:
+            raise argparse.ArgumentTypeError(f"must not be negative: '{value}'")
+        return number
+
     @staticmethod
     def parse_arguments(argv: Sequence[str] | None) -> Namespace:
         """Create parser and parse CLI arguments, and return them."""
         parser = argparse.ArgumentParser()
 
-        shtab.add_argument_to(parser, ["-s", "--print-completion"])
+        parser.add_argument(
+            "-s",
+            "--print-completion",
+            action=PrintCompletionAction,
+            choices=COMPLETION_SHELLS,
+            default=None,
+            help="print shell completion script",
+        )
 
         parser.add_argument(
             "-a",
@@ -37,14 +98,181 @@ class Cli:
             help="Manually sets the album tag to the given value and puts any parsed album in the " "discsubtitle tag",
         )
 
+        parser.add_argument(
+            "--batch",
+            action="store_true",
+            default=False,
+            dest="batch",
+            help="Resolve conflicting tags without asking, using the resolution policy, and save every song",
+        )
+
+        parser.add_argument(
+            "--policy",
+            action="store",
+            choices=list(POLICIES),
+            default=None,
+            dest="policy",
+            help="Source to prefer when resolving conflicts in batch mode. Overrides the policy in the config file",
+        )
+
         parser.add_argument(
             "-d",
             "--directory",
             action="store",
-            required=True,
+            required=False,
+            default=None,
             dest="dir",
             help="directory in which the files to be retagged are " "located",
-        ).complete = shtab.DIRECTORY  # type: ignore
+        )
+
+        parser.add_argument(
+            "-r",
+            "--recursive",
+            action="store_true",
+            default=False,
+            dest="recursive",
+            help="Also retag files in subdirectories of the directory",
+        )
+
+        parser.add_argument(
+            "--include",
+            action="append",
+            default=None,
+            dest="include",
+            metavar="PATTERN",
+            help="Glob pattern for names of files to retag. Can be given more than once. Default: *.opus",
+        )
+
+        parser.add_argument(
+            "--exclude",
+            action="append",
+            default=None,
+            dest="exclude",
+            metavar="PATTERN",
+            help="Glob pattern for names or relative paths of files and directories to leave out. Can be given more "
+            "than once",
+        )
+
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            action="store",
+            type=Cli.positive_int,
+            default=1,
+            dest="jobs",
+            help="Number of processes to use for reading and parsing files ahead of the one being resolved",
+        )
+
+        parser.add_argument(
+            "--prefetch",
+            action="store",
+            type=Cli.non_negative_int,
+            default=2,
+            dest="prefetch",
+            help="Number of songs to read and parse in the background while the current one is resolved. "
+            "0 turns it off",
+        )
+
+        parser.add_argument(
+            "--memo-size",
+            action="store",
+            type=Cli.non_negative_int,
+            default=DEFAULT_MEMO_SIZE,
+            dest="memo_size",
+            help="Number of results to remember for each of the helpers that split artists, prune titles and "
+            "match description lines, which are often called with the same strings. 0 turns it off. "
+            f"Default: {DEFAULT_MEMO_SIZE}",
+        )
+
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            default=False,
+            dest="no_cache",
+            help="Neither use nor update the cache of files analysed and handled in earlier runs",
+        )
+
+        parser.add_argument(
+            "--cache-verify",
+            action="store_true",
+            default=False,
+            dest="cache_verify",
+            help="Also compare a hash of the start of each file, where the tags are, before using the cache",
+        )
+
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            default=False,
+            dest="resume",
+            help="Continue the previous session in the directory, skipping songs that were already handled",
+        )
+
+        parser.add_argument(
+            "--sync",
+            action="store",
+            choices=SYNC_POLICIES,
+            default=SYNC_BATCH,
+            dest="sync",
+            help="When to make sure saved songs are written to the disk: after each song, once for all songs at the "
+            "end, or never. Default: batch",
+        )
+
+        parser.add_argument(
+            "--writers",
+            action="store",
+            type=Cli.positive_int,
+            default=1,
+            dest="writers",
+            help="Number of songs to save at the same time in the background",
+        )
+
+        parser.add_argument(
+            "--atomic",
+            action="store_true",
+            default=False,
+            dest="atomic",
+            help="Save each song by writing a copy of it and renaming the copy over it, so that a crash can't leave "
+            "a song half written",
+        )
+
+        plan_group = parser.add_mutually_exclusive_group()
+
+        plan_group.add_argument(
+            "--plan",
+            action="store",
+            default=None,
+            dest="plan",
+            metavar="FILE",
+            help="Write the changes batch mode would make to a file, with a line of JSON per song, without saving "
+            "anything",
+        )
+
+        plan_group.add_argument(
+            "--apply",
+            action="store",
+            default=None,
+            dest="apply",
+            metavar="FILE",
+            help="Save the changes in a file written with --plan, to the songs that are unchanged since",
+        )
+
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            default=False,
+            dest="profile",
+            help="Print how much time was spent in each stage, such as reading, parsing and saving, at exit",
+        )
+
+        parser.add_argument(
+            "--profile-json",
+            action="store",
+            default=None,
+            dest="profile_json",
+            metavar="FILE",
+            help="Also write the time spent in each stage to a file as JSON. Implies --profile",
+        )
 
         parser.add_argument(
             "-V",
@@ -53,4 +281,7 @@ class Cli:
             version=f"retag (version {__version__})",
         )
 
-        return parser.parse_args(argv)
+        args = parser.parse_args(argv)
+        if args.dir is None and args.apply is None:
+            parser.error("the following arguments are required: -d/--directory")
+        return args
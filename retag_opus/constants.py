@@ -10,12 +10,28 @@ INTERPUNCT: Final = "\u00b7"
 SPACE: Final = " "
 SEP: Final = " | "
 
+STATUS_SAVED: Final = "saved"
+STATUS_PASSED: Final = "passed"
+STATUS_SKIPPED: Final = "skipped"
+
+SYNC_FILE: Final = "file"
+SYNC_BATCH: Final = "batch"
+SYNC_NONE: Final = "none"
+SYNC_POLICIES: Final = (SYNC_FILE, SYNC_BATCH, SYNC_NONE)
+
 
 class ParsingReference(TypedDict):
-    """This is dictionary with a tag name and regex for parsing it."""
+    """This is dictionary with a tag name and regex for parsing it.
+
+    The keywords are lowercase strings of which at least one is found in
+    any line that one of the patterns matches, once the line has been
+    lowercased. Patterns are only tried on lines containing a keyword,
+    unless the list of keywords is empty.
+    """
 
     print: str
     pattern: list[str]
+    keywords: list[str]
 
 
 tag_parse_patterns: Final[dict[str, str]] = {
@@ -30,10 +46,24 @@ tag_parse_patterns: Final[dict[str, str]] = {
     "albumversion": r"(?i)(.*?)\s*[\(\[](album version.*?)[\)\]]\s*(.*)",
 }
 
+tag_parse_keywords: Final[dict[str, tuple[str, ...]]] = {
+    "featuring": ("feat", "ft"),
+    "remaster": ("remaster",),
+    "remaster2": ("remaster",),
+    "live": ("live",),
+    "instrumental": ("instrumental",),
+    "instrumental2": ("instrumental",),
+    "remix": ("remix",),
+    "remix2": ("remix",),
+    "albumversion": ("album version",),
+}
+"""For each title pattern, lowercase strings of which one is in any title
+it matches. Titles without any of them aren't matched against it."""
+
 all_tags: Final[dict[str, ParsingReference]] = {
-    "title": {"print": "Title", "pattern": [r".*“(.*)” by .* from ‘.*’"]},
-    "album": {"print": "Album", "pattern": [r".*“.*” by .* from ‘(.*)’"]},
-    "albumartist": {"print": "Album Artist", "pattern": []},
+    "title": {"print": "Title", "pattern": [r".*“(.*)” by .* from ‘.*’"], "keywords": ["from ‘"]},
+    "album": {"print": "Album", "pattern": [r".*“.*” by .* from ‘(.*)’"], "keywords": ["from ‘"]},
+    "albumartist": {"print": "Album Artist", "pattern": [], "keywords": []},
     "artist": {
         "print": "Artist(s)",
         "pattern": [
@@ -41,22 +71,28 @@ all_tags: Final[dict[str, ParsingReference]] = {
             r".*\([fF]eat. (.+?)\)",
             r".*“.*” by (.*) from ‘.*’",
         ],
+        "keywords": ["artist", "(feat", "from ‘"],
+    },
+    "date": {"print": "Date", "pattern": [r"Released on:\s*(\d\d\d\d-\d\d-\d\d)"], "keywords": ["released on:"]},
+    "genre": {"print": "Genre", "pattern": [], "keywords": []},
+    "version": {"print": "Version", "pattern": [], "keywords": []},
+    "performer": {"print": "Performer", "pattern": [r".*[pP]erformer.*:\s*(.+)\s*"], "keywords": ["performer"]},
+    "organization": {
+        "print": "Organization",
+        "pattern": [r"Provided to YouTube by (.+)\s*"],
+        "keywords": ["provided to youtube by"],
     },
-    "date": {"print": "Date", "pattern": [r"Released on:\s*(\d\d\d\d-\d\d-\d\d)"]},
-    "genre": {"print": "Genre", "pattern": []},
-    "version": {"print": "Version", "pattern": []},
-    "performer": {"print": "Performer", "pattern": [r".*[pP]erformer.*:\s*(.+)\s*"]},
-    "organization": {"print": "Organization", "pattern": [r"Provided to YouTube by (.+)\s*"]},
-    "copyright": {"print": "Copyright", "pattern": [r"\u2117 (.+)\s*"]},
-    "composer": {"print": "Composer", "pattern": [r".*?[cC]omposer.*:\s*(.+)\s*"]},
-    "conductor": {"print": "Conductor", "pattern": [r".*[cC]onductor.*:\s*(.+)\s*"]},
+    "copyright": {"print": "Copyright", "pattern": [r"\u2117 (.+)\s*"], "keywords": ["\u2117"]},
+    "composer": {"print": "Composer", "pattern": [r".*?[cC]omposer.*:\s*(.+)\s*"], "keywords": ["composer"]},
+    "conductor": {"print": "Conductor", "pattern": [r".*[cC]onductor.*:\s*(.+)\s*"], "keywords": ["conductor"]},
     "arranger": {
         "print": "Arranger",
         "pattern": [r".*?[aA]rranged\s+[bB]y.*:\s*(.+)\s*", r".*?[aA]rranger.*:\s*(.+)\s*"],
+        "keywords": ["arrang"],
     },
-    "author": {"print": "Author", "pattern": [r"(.*, )?[aA]uthor.*:\s*(.+)\s*"]},
-    "producer": {"print": "Producer", "pattern": [r"(.*, )?[pP]roducer.*:\s*(.+)\s*"]},
-    "publisher": {"print": "Publisher", "pattern": [r"(.*, )?[pP]ublisher.*:\s*(.+)\s*"]},
+    "author": {"print": "Author", "pattern": [r"(.*, )?[aA]uthor.*:\s*(.+)\s*"], "keywords": ["author"]},
+    "producer": {"print": "Producer", "pattern": [r"(.*, )?[pP]roducer.*:\s*(.+)\s*"], "keywords": ["producer"]},
+    "publisher": {"print": "Publisher", "pattern": [r"(.*, )?[pP]ublisher.*:\s*(.+)\s*"], "keywords": ["publisher"]},
     "lyricist": {
         "print": "Lyricist",
         "pattern": [
@@ -64,32 +100,67 @@ all_tags: Final[dict[str, ParsingReference]] = {
             r"(.*, )?[wW]ritten\s+[bB]y.*:\s*(.+)\s*",
             r".*[lL]yricist.*:\s*(.+)\s*",
         ],
+        "keywords": ["writ", "lyricist"],
     },
 }
 
 performer_tags: Final[dict[str, ParsingReference]] = {
-    "performer:vocals": {"print": "- Vocals", "pattern": [r"(.*, )?(Lead\s+)?[vV]ocal(?!.*[eE]ngineer).*:\s*(.+)\s*"]},
+    "performer:vocals": {
+        "print": "- Vocals",
+        "pattern": [r"(.*, )?(Lead\s+)?[vV]ocal(?!.*[eE]ngineer).*:\s*(.+)\s*"],
+        "keywords": ["vocal"],
+    },
     "performer:background vocals": {
         "print": "- Background Vocals",
         "pattern": [r"(.*, )?[bB]ackground\s+[vV]ocal.*:\s*(.+)\s*"],
+        "keywords": ["vocal"],
     },
-    "performer:drums": {"print": "- Drums", "pattern": [r"(.*, )?[dD]rum.*:\s*(.+)\s*"]},
-    "performer:percussion": {"print": "- Percussion", "pattern": [r".*[pP]ercussion.*:\s*(.+)\s*"]},
-    "performer:keyboard": {"print": "- Keyboard", "pattern": [r"(.*, )?[kK]eyboard.*:\s*(.+)\s*"]},
-    "performer:piano": {"print": "- Piano", "pattern": [r"(.*, )?[pP]iano.*:\s*(.+)\s*"]},
-    "performer:synthesizer": {"print": "- Synthesizer", "pattern": [r".*[sS]ynth.*:\s*(.+)\s*"]},
+    "performer:drums": {"print": "- Drums", "pattern": [r"(.*, )?[dD]rum.*:\s*(.+)\s*"], "keywords": ["drum"]},
+    "performer:percussion": {
+        "print": "- Percussion",
+        "pattern": [r".*[pP]ercussion.*:\s*(.+)\s*"],
+        "keywords": ["percussion"],
+    },
+    "performer:keyboard": {
+        "print": "- Keyboard",
+        "pattern": [r"(.*, )?[kK]eyboard.*:\s*(.+)\s*"],
+        "keywords": ["keyboard"],
+    },
+    "performer:piano": {"print": "- Piano", "pattern": [r"(.*, )?[pP]iano.*:\s*(.+)\s*"], "keywords": ["piano"]},
+    "performer:synthesizer": {"print": "- Synthesizer", "pattern": [r".*[sS]ynth.*:\s*(.+)\s*"], "keywords": ["synth"]},
     "performer:guitar": {
         "print": "- Guitar",
         "pattern": [r"(.*, )?[gG]uitar.*:\s*(.+)\s*" r".*[eE]lectric\s+[gG]uitar.*:\s*(.+)\s*"],
+        "keywords": ["guitar"],
+    },
+    "performer:electric guitar": {"print": "- Electric guitar", "pattern": [], "keywords": []},
+    "performer:bass guitar": {
+        "print": "- Bass guitar",
+        "pattern": [r".*[bB]ass\s+[gG]uitar.*:\s*(.+)\s*"],
+        "keywords": ["guitar"],
+    },
+    "performer:acoustic guitar": {
+        "print": "- Acoustic guitar",
+        "pattern": [r".*[aA]coustic\s+[gG]uitar.*:\s*(.+)\s*"],
+        "keywords": ["guitar"],
+    },
+    "performer:ukulele": {"print": "- Ukulele", "pattern": [r".*[uU]kulele.*:\s*(.+)\s*"], "keywords": ["ukulele"]},
+    "performer:violin": {"print": "- Violin", "pattern": [r"(.*, )?[vV]iolin.*:\s*(.+)\s*"], "keywords": ["violin"]},
+    "performer:double bass": {
+        "print": "- Double bass",
+        "pattern": [r".*[dD]ouble\s+[bB]ass.*:\s*(.+)\s*"],
+        "keywords": ["bass"],
+    },
+    "performer:cello": {"print": "- Cello", "pattern": [r"(.*, )?[cC]ello.*:\s*(.+)\s*"], "keywords": ["cello"]},
+    "performer:programming": {
+        "print": "- Programming",
+        "pattern": [r"(.*, )?[pP]rogramm(er|ing).*:\s*(.+)\s*"],
+        "keywords": ["programm"],
+    },
+    "performer:saxophone": {
+        "print": "- Saxophone",
+        "pattern": [r"(.*, )?[sS]axophone.*:\s*(.+)\s*"],
+        "keywords": ["saxophone"],
     },
-    "performer:electric guitar": {"print": "- Electric guitar", "pattern": []},
-    "performer:bass guitar": {"print": "- Bass guitar", "pattern": [r".*[bB]ass\s+[gG]uitar.*:\s*(.+)\s*"]},
-    "performer:acoustic guitar": {"print": "- Acoustic guitar", "pattern": [r".*[aA]coustic\s+[gG]uitar.*:\s*(.+)\s*"]},
-    "performer:ukulele": {"print": "- Ukulele", "pattern": [r".*[uU]kulele.*:\s*(.+)\s*"]},
-    "performer:violin": {"print": "- Violin", "pattern": [r"(.*, )?[vV]iolin.*:\s*(.+)\s*"]},
-    "performer:double bass": {"print": "- Double bass", "pattern": [r".*[dD]ouble\s+[bB]ass.*:\s*(.+)\s*"]},
-    "performer:cello": {"print": "- Cello", "pattern": [r"(.*, )?[cC]ello.*:\s*(.+)\s*"]},
-    "performer:programming": {"print": "- Programming", "pattern": [r"(.*, )?[pP]rogramm(er|ing).*:\s*(.+)\s*"]},
-    "performer:saxophone": {"print": "- Saxophone", "pattern": [r"(.*, )?[sS]axophone.*:\s*(.+)\s*"]},
-    "performer:flute": {"print": "- Flute", "pattern": [r"(.*, )?[fF]lute.*:\s*(.+)\s*"]},
+    "performer:flute": {"print": "- Flute", "pattern": [r"(.*, )?[fF]lute.*:\s*(.+)\s*"], "keywords": ["flute"]},
 }
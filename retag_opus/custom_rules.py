@@ -0,0 +1,156 @@
+r"""Module for tag rules added in the configuration file.
+
+Rules in the 'rules' array of the config file add tags to parse from
+YouTube descriptions, or more patterns for the tags that are already
+parsed, without changing the constants module:
+
+    [[rules]]
+    tag = "performer:theremin"
+    name = "- Theremin"
+    patterns = ['(.*, )?[tT]heremin.*:\s*(.+)\s*']
+    keywords = ["theremin"]
+
+Tags starting with "performer:" are listed with the performers. The
+rules are checked when the config file is read, and their patterns are
+compiled into the same engine as the built-in patterns.
+"""
+import re
+from typing import Any, Final, Mapping
+
+from retag_opus import constants
+from retag_opus.exceptions import InvalidConfigException
+
+RULE_KEYS: Final[frozenset[str]] = frozenset(("tag", "name", "patterns", "keywords"))
+
+PERFORMER_PREFIX: Final[str] = "performer:"
+
+BACKREFERENCE_REGEX: Final[re.Pattern[str]] = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]")
+"""Numbered backreferences, which would refer to the wrong group once the
+pattern is combined with the others."""
+
+
+class TagRule:
+    """A tag to parse from descriptions, and the patterns to find it with."""
+
+    def __init__(self, tag: str, name: str | None, patterns: tuple[str, ...], keywords: tuple[str, ...]) -> None:
+        """Store the rule.
+
+        :param tag: The tag the patterns find a value for.
+        :param name: Name to print the tag with. For a built-in tag it
+            can be left out to keep its name.
+        :param patterns: Regexes of lines with a value for the tag, which
+            is taken from the last group.
+        :param keywords: Lowercase strings of which one is in any line
+            the patterns match. Without keywords, the patterns are tried
+            on every line.
+        """
+        self.tag = tag
+        self.name = name
+        self.patterns = patterns
+        self.keywords = keywords
+
+    @property
+    def is_performer(self) -> bool:
+        """Check whether the tag is listed with the performers."""
+        return self.tag.startswith(PERFORMER_PREFIX)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Describe the rule as it is written in the config file."""
+        return {"tag": self.tag, "name": self.name, "patterns": list(self.patterns), "keywords": list(self.keywords)}
+
+    def _key(self) -> tuple[str, str | None, tuple[str, ...], tuple[str, ...]]:
+        """Get the values that identify the rule."""
+        return self.tag, self.name, self.patterns, self.keywords
+
+    def __eq__(self, other: object) -> bool:
+        """Check whether two rules are the same."""
+        return isinstance(other, TagRule) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        """Hash the rule, so that tables can be cached by their rules."""
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        """Show the rule."""
+        return f"TagRule({self.tag!r}, {self.name!r}, {self.patterns!r}, {self.keywords!r})"
+
+
+def _string_list(rule_config: Mapping[str, Any], key: str, position: int) -> tuple[str, ...]:
+    """Get a list of strings from a rule, which must not be empty."""
+    values = rule_config.get(key, [])
+    if not isinstance(values, list) or not all(isinstance(value, str) and value for value in values):
+        raise InvalidConfigException(f"'{key}' of rule {position} must be a list of non-empty strings")
+    return tuple(values)
+
+
+def rule_from_config(rule_config: Any, position: int) -> TagRule:
+    """Check and compile one rule from the config file.
+
+    :param rule_config: The table of the rule.
+    :param position: Number of the rule in the config file, from 1.
+
+    :raises InvalidConfigException: Raised if the rule is malformed or
+        one of its patterns is not a valid regex with a group, or can't
+        be embedded in the regex that combines the patterns.
+
+    :return: The rule.
+    """
+    if not isinstance(rule_config, dict):
+        raise InvalidConfigException(f"Rule {position} must be a table")
+    unknown_keys = sorted(set(rule_config) - RULE_KEYS)
+    if unknown_keys:
+        raise InvalidConfigException(f"Unknown keys in rule {position}: {', '.join(unknown_keys)}")
+
+    tag = rule_config.get("tag")
+    if not isinstance(tag, str) or not tag or "=" in tag or not all(0x20 <= ord(char) <= 0x7D for char in tag):
+        raise InvalidConfigException(f"'tag' of rule {position} must be a tag name of ASCII characters without '='")
+    tag = tag.lower()
+
+    name = rule_config.get("name")
+    is_known = tag in constants.all_tags or tag in constants.performer_tags
+    if name is not None and not isinstance(name, str):
+        raise InvalidConfigException(f"'name' of rule {position} must be a string")
+    if name is None and not is_known:
+        raise InvalidConfigException(f"Rule {position} adds the tag '{tag}', so it needs a 'name' to print it with")
+
+    patterns = _string_list(rule_config, "patterns", position)
+    if not patterns:
+        raise InvalidConfigException(f"Rule {position} has no patterns")
+    # Imported here, since the engine needs the rules from this module
+    from retag_opus.pattern_engine import PatternEngine
+
+    for pattern in patterns:
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise InvalidConfigException(f"Invalid pattern in rule {position}: {pattern}: {e}") from e
+        if compiled.groups == 0:
+            raise InvalidConfigException(f"Pattern in rule {position} has no group to get the value from: {pattern}")
+        if compiled.groupindex or BACKREFERENCE_REGEX.search(pattern):
+            raise InvalidConfigException(
+                f"Pattern in rule {position} has named groups or backreferences, which can't be used: {pattern}"
+            )
+        try:
+            re.compile(PatternEngine.wrap(pattern))
+        except re.error as e:
+            raise InvalidConfigException(
+                f"Pattern in rule {position} can't be combined with the other patterns: {pattern}: {e}"
+            ) from e
+
+    keywords = tuple(keyword.lower() for keyword in _string_list(rule_config, "keywords", position))
+    return TagRule(tag, name, patterns, keywords)
+
+
+def rules_from_config(config: Mapping[str, Any]) -> tuple[TagRule, ...]:
+    """Check and compile the rules in the config file.
+
+    :param config: The whole parsed config file.
+
+    :raises InvalidConfigException: Raised if the rules are malformed.
+
+    :return: The rules, in the order they are written.
+    """
+    rules_config = config.get("rules", [])
+    if not isinstance(rules_config, list):
+        raise InvalidConfigException("'rules' must be an array of tables, written as [[rules]]")
+    return tuple(rule_from_config(rule_config, position) for position, rule_config in enumerate(rules_config, start=1))
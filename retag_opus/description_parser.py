@@ -1,8 +1,11 @@
 """Module for parsing a YouTube descripton into metadata tags."""
 import re
-from copy import deepcopy
+from typing import Collection, Iterable, Iterator
 
 from retag_opus import constants
+from retag_opus.custom_rules import TagRule
+from retag_opus.memo import Memo
+from retag_opus.pattern_engine import COPYRIGHT_DATE_KEYWORD, COPYRIGHT_DATE_PATTERN, get_engine
 from retag_opus.utils import Utils
 
 INTERPUNCT = "\u00b7"
@@ -10,19 +13,43 @@ INTERPUNCT = "\u00b7"
 Tags = dict[str, list[str]]
 
 
+def _parse_artist_and_title(source_line: str) -> tuple[tuple[str, ...], str]:
+    """Parse artist and title from standard ContentID line, for the memo."""
+    artist_and_title = source_line.split(" " + constants.INTERPUNCT + " ")
+    title = artist_and_title[0]
+    artist = artist_and_title[1:]
+
+    if len(artist) < 2 and ", " in artist[0]:
+        artist = Utils.split_tag(artist[0])
+
+    return tuple(artist), title
+
+
+_artists_and_titles: Memo[tuple[tuple[str, ...], str]] = Memo("parse_artist_and_title", _parse_artist_and_title)
+
+
 class DescriptionParser:
     """Parse tags from YouTube description."""
 
-    def __init__(self, manual_album_set: bool = False) -> None:
-        """Create tags dictionary that will hold the parsed tags."""
+    def __init__(
+        self,
+        manual_album_set: bool = False,
+        custom_rules: tuple[TagRule, ...] = (),
+        stop_tags: Collection[str] = (),
+    ) -> None:
+        """Create tags dictionary that will hold the parsed tags.
+
+        :param manual_album_set: Whether the album is set manually.
+        :param custom_rules: Rules from the config file.
+        :param stop_tags: Tags after which to stop parsing a description,
+            once each of them has a value. The rest of the description,
+            such as lyrics, is then not read. If empty, the whole
+            description is parsed.
+        """
         self.tags: Tags = {}
-        self.base_patterns = deepcopy(constants.all_tags)
-        self.performer_patterns = deepcopy(constants.performer_tags)
+        self.engine = get_engine(manual_album_set, custom_rules)
         self.manual_album_set = manual_album_set
-        if manual_album_set:
-            self.base_patterns["discsubtitle"] = self.base_patterns["album"].copy()
-            self.base_patterns["discsubtitle"]["print"] = "Disc subtitle"
-            self.base_patterns["album"]["pattern"] = []
+        self.stop_tags = frozenset(stop_tags)
 
     def parse_artist_and_title(self, source_line: str) -> tuple[list[str], str]:
         """Parse artist and title from standard ContentID line.
@@ -35,32 +62,32 @@ class DescriptionParser:
 
         :return: List or artists and title of song as string.
         """
-        artist_and_title = source_line.split(" " + constants.INTERPUNCT + " ")
-        title = artist_and_title[0]
-        artist: list[str] = artist_and_title[1:]
+        artist, title = _artists_and_titles(source_line)
+        return list(artist), title
 
-        if len(artist) < 2 and ", " in artist[0]:
-            artist = Utils().split_tag(artist[0])
+    def add_tag_value(self, field_name: str, field_value: str) -> None:
+        """Add a parsed value to the field_name tag.
 
-        return artist, title
+        If the tag already has values, the value is appended and
+        duplicate values are removed.
+        """
+        if self.tags.get(field_name):
+            self.tags[field_name].append(field_value)
+            self.tags[field_name] = Utils().remove_duplicates(self.tags[field_name])
+        else:
+            self.tags[field_name] = [field_value]
 
-    def standard_pattern(self, field_name: str, regex: str, line: str) -> None:
+    def standard_pattern(self, field_name: str, regex: str | re.Pattern[str], line: str) -> None:
         """Parse metadata from line with regex and put in field_name.
 
         Use a regex on a standard format to extract metadata from the
         string line and set the result to the tag field_value. If the
         value already exists, remove duplicate values.
         """
-        pattern = re.compile(regex)
-        pattern_match = re.match(pattern, line)
+        pattern_match = re.match(regex, line)
         if pattern_match:
             field_value = pattern_match.groups()[len(pattern_match.groups()) - 1]
-            field_value = field_value.strip()
-            if self.tags.get(field_name):
-                self.tags[field_name].append(field_value)
-                self.tags[field_name] = Utils().remove_duplicates(self.tags[field_name])
-            else:
-                self.tags[field_name] = [field_value]
+            self.add_tag_value(field_name, field_value.strip())
 
     def parse(self, description_tag_full: str) -> None:
         """Parse the provided youtube description.
@@ -71,13 +98,31 @@ class DescriptionParser:
         :param description_tag_full: The full YouTube description as a
             string.
         """
-        lines_since_title_artist: int = 1000
+        for _ in self.parse_lines(description_tag_full.splitlines()):
+            pass
+
+    def parse_lines(self, description_lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+        """Parse the lines of a YouTube description in a single pass.
 
-        description_tag_lines: list[str] = description_tag_full.splitlines(False)
+        The tags are put in the internal tags variable of the object, as
+        by parse, and each value is also yielded as soon as its line is
+        parsed. Once the lines run out, or every tag in stop_tags has a
+        value, the artists are split and the year of the copyright line
+        is used as the date if no date was found.
 
-        for description_line in description_tag_lines:
-            description_line = re.sub("\n", "", description_line)
-            if re.match(r"^\s*$", description_line):
+        :param description_lines: The lines of the description, without
+            line endings. They are read one at a time, so they can come
+            from a generator.
+
+        :return: Iterator with the tag name and value of every value
+            found, in the order they are found. Artists are yielded as
+            they are written in the line, before they are split.
+        """
+        lines_since_title_artist: int = 1000
+        copyright_dates: list[str] = []
+
+        for description_line in description_lines:
+            if not description_line or description_line.isspace():
                 continue
             lines_since_title_artist = lines_since_title_artist + 1
             # Artist and title
@@ -86,26 +131,34 @@ class DescriptionParser:
                 youtube_artist, youtube_title = self.parse_artist_and_title(description_line)
                 if youtube_artist:
                     self.tags["artist"] = Utils().remove_duplicates(youtube_artist)
+                    for artist_name in self.tags["artist"]:
+                        yield "artist", artist_name
                 self.tags["title"] = [youtube_title]
+                yield "title", youtube_title
 
             if lines_since_title_artist == 1:
-                if self.manual_album_set:
-                    self.tags["discsubtitle"] = [description_line.strip()]
-                else:
-                    self.tags["album"] = [description_line.strip()]
-
-            for tag_id, tag_data in self.base_patterns.items():
-                for pattern in tag_data["pattern"]:
-                    self.standard_pattern(tag_id, pattern, description_line)
+                album_tag = "discsubtitle" if self.manual_album_set else "album"
+                self.tags[album_tag] = [description_line.strip()]
+                yield album_tag, self.tags[album_tag][0]
 
-            for tag_id, tag_data in self.performer_patterns.items():
-                for pattern in tag_data["pattern"]:
-                    self.standard_pattern(tag_id, pattern, description_line)
+            for tag_id, field_value in self.engine.cached_match(description_line):
+                self.add_tag_value(tag_id, field_value)
+                yield tag_id, field_value
 
             title = self.tags.pop("title", None)
             if title:
                 self.tags["title"] = [title[0]]
 
+            if COPYRIGHT_DATE_KEYWORD in description_line:
+                copyright_match = COPYRIGHT_DATE_PATTERN.match(description_line)
+                if copyright_match and copyright_match.group(1) not in copyright_dates:
+                    copyright_dates.append(copyright_match.group(1))
+
+            # The copyright year is only used for the date if no release
+            # date is found, so it doesn't count as finding the date
+            if self.stop_tags and all(tag_id in self.tags for tag_id in self.stop_tags):
+                break
+
         artist = self.tags.get("artist")
         if artist:
             self.tags["albumartist"] = [artist[0]]
@@ -123,17 +176,7 @@ class DescriptionParser:
             if value == []:
                 self.tags.pop(key)
 
-        # Basic pattern:
-        # r".*[ ]   .*:\s*(.*)\s*"
-
-        # Custom patterns
-        for description_line in description_tag_lines:
-            description_line = description_line.replace("\n", "")
-            description_line = re.sub("\n", "", description_line)
-
-            self.standard_pattern("copyright_date", r"\u2117 (\d\d\d\d)\s", description_line)
-
-        copyright_date = self.tags.pop("copyright_date", None)
-        date = self.tags.get("date")
-        if copyright_date and not date:
-            self.tags["date"] = copyright_date
+        if copyright_dates and not self.tags.get("date"):
+            self.tags["date"] = copyright_dates
+            for copyright_date in copyright_dates:
+                yield "date", copyright_date
@@ -3,3 +3,15 @@
 
 class UserExitException(Exception):
     """Raised when the user has made a choice to exit the app."""
+
+
+class InvalidConfigException(Exception):
+    """Raised when the configuration of the app is invalid."""
+
+
+class OpusHeaderException(Exception):
+    """Raised when the headers of an Opus file can't be read directly."""
+
+
+class InvalidPlanException(Exception):
+    """Raised when a change plan can't be read."""
@@ -0,0 +1,78 @@
+"""Module for keeping a journal of the songs handled in a session.
+
+Each decision about a file is appended to the journal as a line of
+JSON as soon as it is made, so that an interrupted session can be
+resumed without opening the files that were already handled.
+"""
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import IO
+
+
+class SessionJournal:
+    """Append-only record of what was done with each file."""
+
+    def __init__(self, journal_path: Path, resume: bool = False) -> None:
+        """Open the journal.
+
+        :param journal_path: The journal file.
+        :param resume: Whether to continue the journal of the previous
+            session. Otherwise a new, empty journal is started.
+        """
+        self.journal_path = journal_path
+        self.completed: dict[str, str] = {}
+        if resume:
+            self.completed = self.read(journal_path)
+        journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: IO[str] = open(journal_path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def path_for(state_dir: Path, music_dir: Path) -> Path:
+        """Get the journal file for sessions in the given directory."""
+        directory_hash = hashlib.sha1(str(music_dir).encode()).hexdigest()[:16]
+        return state_dir / f"session-{directory_hash}.jsonl"
+
+    @staticmethod
+    def read(journal_path: Path) -> dict[str, str]:
+        """Read the decisions in a journal.
+
+        Lines that can't be parsed, such as one that was only partly
+        written when the app crashed, are ignored.
+
+        :param journal_path: The journal file.
+
+        :return: Mapping from file path to the last decision about it.
+        """
+        completed: dict[str, str] = {}
+        try:
+            with open(journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        completed[str(entry["path"])] = str(entry["status"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return completed
+
+    def is_completed(self, file_path: Path) -> bool:
+        """Check whether the file was handled in the resumed session."""
+        return str(file_path) in self.completed
+
+    def record(self, file_path: Path, status: str) -> None:
+        """Append a decision about a file to the journal.
+
+        :param file_path: The music file.
+        :param status: One of the status constants in constants.
+        """
+        entry = {"path": str(file_path), "status": status, "time": time.time()}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.completed[str(file_path)] = status
+
+    def close(self) -> None:
+        """Close the journal file."""
+        self._file.close()
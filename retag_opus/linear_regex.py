@@ -0,0 +1,568 @@
+"""Module for matching regexes in time linear in the length of the text.
+
+Python's regex engine backtracks, and patterns like the title patterns,
+where groups of any text are followed by optional whitespace, can take
+time cubic in the length of the text to fail. A LinearPattern runs the
+same regex as a set of threads that step through the text together, one
+character at a time, and threads that reach the same point of the
+pattern are merged. This takes time proportional to the length of the
+text times the size of the pattern, whatever the text is.
+
+Threads are kept in the order the backtracking engine would try them,
+so the match and its groups are the same as those of re.match. The
+pattern is parsed by Python's own regex parser, and each character is
+tested by a one-character regex compiled with the same flags, so
+classes, case folding and dots behave exactly as they do with re.
+Lookarounds, backreferences, atomic groups and possessive repeats can't
+be matched this way, and patterns with them raise UnsupportedPattern.
+
+Python's regex parser is private, as re._parser, or sre_parse before
+Python 3.11, and can change in any release. It is only used on the
+versions in PARSER_VERSIONS. On other versions every pattern raises
+UnsupportedPattern, and is matched with the re module instead.
+
+Most texts don't match, and the threads don't need to keep their groups
+to tell whether a text matches at all. Unless the pattern has anchors,
+the set of threads that follows each set of threads on each character
+is remembered, so that telling whether a long text matches takes one
+dictionary lookup per character, and the groups are only found for
+texts that match.
+"""
+import importlib
+import re
+import sys
+from typing import Any, Callable, Final
+
+PARSER_VERSIONS: Final[tuple[tuple[int, int], ...]] = ((3, 10), (3, 11), (3, 12), (3, 13))
+"""Python versions whose private regex parser LinearPattern is known to
+work with. On other versions every pattern is unsupported, so that the
+callers fall back to the re module."""
+
+sre_parse: Any = None
+if sys.version_info[:2] in PARSER_VERSIONS:
+    try:
+        sre_parse = importlib.import_module("re._parser" if sys.version_info >= (3, 11) else "sre_parse")
+    except ImportError:  # pragma: no cover
+        pass
+
+LINEAR_MATCH_LENGTH: Final[int] = 512
+"""Longest text that titles and description lines are matched against
+with the re module, which is many times faster than LinearPattern on
+normal text. The title patterns take at most some milliseconds to fail
+on text this long."""
+
+BACKTRACKING_MATCH_LENGTH: Final[int] = 64
+"""Longest text matched with the re module for the few patterns that
+backtrack badly on text shorter than LINEAR_MATCH_LENGTH."""
+
+MAX_EXPANDED_REPEAT: Final[int] = 100
+"""Largest count of a counted repeat, which is written out in full."""
+
+MAX_CACHED_STATES: Final[int] = 1000
+"""Largest number of sets of threads whose transitions a pattern keeps."""
+
+STATE_MATCHES: Final[int] = 1
+"""Verdict of a set of threads of which one has matched."""
+
+STATE_FAILS: Final[int] = 2
+"""Verdict of an empty set of threads, which can't match any more."""
+
+CATEGORY_ESCAPES: Final[dict[str, str]] = {
+    "CATEGORY_DIGIT": r"\d",
+    "CATEGORY_NOT_DIGIT": r"\D",
+    "CATEGORY_SPACE": r"\s",
+    "CATEGORY_NOT_SPACE": r"\S",
+    "CATEGORY_WORD": r"\w",
+    "CATEGORY_NOT_WORD": r"\W",
+}
+
+CHAR_FLAGS: Final[int] = re.IGNORECASE | re.DOTALL | re.ASCII
+"""Flags that change which characters a one-character regex matches."""
+
+TEMPLATE_REGEX: Final[re.Pattern[str]] = re.compile(r"\\(?:g<(\d+)>|(\d+)|(.))", re.DOTALL)
+
+TEMPLATE_ESCAPES: Final[dict[str, str]] = {
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+    "\\": "\\",
+}
+
+Captures = tuple[int, ...]
+Instruction = tuple[Any, ...]
+
+
+class UnsupportedPattern(ValueError):
+    """Raised for a pattern that can't be matched in linear time."""
+
+
+def _escape(char_code: int) -> str:
+    """Write a character so that it is literal anywhere in a regex."""
+    return f"\\U{char_code:08x}"
+
+
+def _class_item(op: str, value: Any) -> str:
+    """Write an item of a character class as it is in a regex."""
+    if op == "LITERAL":
+        return _escape(value)
+    if op == "RANGE":
+        return f"{_escape(value[0])}-{_escape(value[1])}"
+    if op == "CATEGORY" and str(value) in CATEGORY_ESCAPES:
+        return CATEGORY_ESCAPES[str(value)]
+    raise UnsupportedPattern(f"Unsupported item in character class: {op}")
+
+
+def _char_regex(op: str, value: Any) -> str:
+    """Write a pattern item that matches one character as a regex."""
+    if op == "LITERAL":
+        return _escape(value)
+    if op == "NOT_LITERAL":
+        return f"[^{_escape(value)}]"
+    if op == "ANY":
+        return "."
+    if op == "IN":
+        negate = bool(value) and str(value[0][0]) == "NEGATE"
+        items = value[1:] if negate else value
+        return "[" + ("^" if negate else "") + "".join(_class_item(str(item_op), arg) for item_op, arg in items) + "]"
+    raise UnsupportedPattern(f"Unsupported pattern item: {op}")
+
+
+def _char_test(regex: str, flags: int) -> Callable[[str], bool]:
+    """Make a test of whether a character matches a one-character regex.
+
+    The result for each character is remembered, since titles and
+    descriptions use few different characters.
+    """
+    compiled = re.compile(regex, flags & CHAR_FLAGS)
+    results: dict[str, bool] = {}
+
+    def test(char: str) -> bool:
+        result = results.get(char)
+        if result is None:
+            result = results[char] = compiled.fullmatch(char) is not None
+        return result
+
+    return test
+
+
+def _nullable(items: Any) -> bool:
+    """Check whether a parsed pattern can match the empty string."""
+    for op, value in items:
+        name = str(op)
+        if name in ("LITERAL", "NOT_LITERAL", "ANY", "IN"):
+            return False
+        if name in ("MAX_REPEAT", "MIN_REPEAT"):
+            if value[0] > 0 and not _nullable(value[2]):
+                return False
+        elif name == "SUBPATTERN":
+            if not _nullable(value[3]):
+                return False
+        elif name == "BRANCH":
+            if not any(_nullable(branch) for branch in value[1]):
+                return False
+    return True
+
+
+class _Compiler:
+    """Compiles a parsed pattern to instructions for the thread machine.
+
+    The instructions are tuples whose first element is the kind:
+    ("char", test), ("split", preferred, other), ("jump", target),
+    ("save", slot), ("assert", position kind, flags) and ("match",).
+    """
+
+    def __init__(self) -> None:
+        """Start with no instructions."""
+        self.program: list[Instruction] = []
+
+    def emit(self, *instruction: Any) -> int:
+        """Add an instruction and get its index."""
+        self.program.append(instruction)
+        return len(self.program) - 1
+
+    def compile(self, items: Any, flags: int) -> None:
+        """Compile a sequence of parsed pattern items."""
+        for op, value in items:
+            self.compile_item(str(op), value, flags)
+
+    def compile_item(self, op: str, value: Any, flags: int) -> None:
+        """Compile one parsed pattern item."""
+        if op in ("LITERAL", "NOT_LITERAL", "ANY", "IN"):
+            self.emit("char", _char_test(_char_regex(op, value), flags))
+        elif op == "SUBPATTERN":
+            group, add_flags, del_flags, items = value
+            if group is not None:
+                self.emit("save", 2 * group)
+            self.compile(items, (flags | add_flags) & ~del_flags)
+            if group is not None:
+                self.emit("save", 2 * group + 1)
+        elif op == "BRANCH":
+            self.compile_branch(value[1], flags)
+        elif op in ("MAX_REPEAT", "MIN_REPEAT"):
+            self.compile_repeat(value, op == "MAX_REPEAT", flags)
+        elif op == "AT":
+            self.emit("assert", str(value), flags)
+        else:
+            raise UnsupportedPattern(f"Unsupported pattern item: {op}")
+
+    def compile_branch(self, branches: Any, flags: int) -> None:
+        """Compile alternatives, preferring the ones written first."""
+        jumps = []
+        for branch in branches[:-1]:
+            split = self.emit("split", None, None)
+            self.compile(branch, flags)
+            jumps.append(self.emit("jump", None))
+            self.program[split] = ("split", split + 1, len(self.program))
+        self.compile(branches[-1], flags)
+        for jump in jumps:
+            self.program[jump] = ("jump", len(self.program))
+
+    def compile_repeat(self, value: Any, greedy: bool, flags: int) -> None:
+        """Compile a repeat, writing out the counted repetitions."""
+        minimum, maximum, items = value
+        unbounded = maximum == sre_parse.MAXREPEAT
+        if minimum > MAX_EXPANDED_REPEAT or (not unbounded and maximum > MAX_EXPANDED_REPEAT):
+            raise UnsupportedPattern(f"Repeat count above {MAX_EXPANDED_REPEAT}")
+        if _nullable(items) and (unbounded or maximum > 1):
+            raise UnsupportedPattern("Repeat of something that can match the empty string")
+        for _ in range(minimum):
+            self.compile(items, flags)
+        if unbounded:
+            loop = self.emit("split", None, None)
+            self.compile(items, flags)
+            self.emit("jump", loop)
+            self.program[loop] = self.choice(loop + 1, len(self.program), greedy)
+            return
+        splits = []
+        for _ in range(maximum - minimum):
+            splits.append(self.emit("split", None, None))
+            self.compile(items, flags)
+        for split in splits:
+            self.program[split] = self.choice(split + 1, len(self.program), greedy)
+
+    @staticmethod
+    def choice(repeat: int, skip: int, greedy: bool) -> Instruction:
+        """Make a split that prefers repeating if the repeat is greedy."""
+        return ("split", repeat, skip) if greedy else ("split", skip, repeat)
+
+
+def _is_word(text: str, index: int, flags: int) -> bool:
+    """Check whether the character at an index is a word character."""
+    if not 0 <= index < len(text):
+        return False
+    char = text[index]
+    return char.isascii() and (char.isalnum() or char == "_") if flags & re.ASCII else char.isalnum() or char == "_"
+
+
+def _position_holds(kind: str, flags: int, text: str, index: int) -> bool:
+    r"""Check a zero-width assertion like ^, $ or \b at an index."""
+    multiline = bool(flags & re.MULTILINE)
+    if kind == "AT_BEGINNING_STRING" or (kind == "AT_BEGINNING" and not multiline):
+        return index == 0
+    if kind in ("AT_BEGINNING", "AT_BEGINNING_LINE"):
+        return index == 0 or text[index - 1] == "\n"
+    if kind == "AT_END_STRING":
+        return index == len(text)
+    if kind == "AT_END" and not multiline:
+        return index == len(text) or (index == len(text) - 1 and text[index] == "\n")
+    if kind in ("AT_END", "AT_END_LINE"):
+        return index == len(text) or text[index] == "\n"
+    if kind in ("AT_BOUNDARY", "AT_NON_BOUNDARY"):
+        boundary = _is_word(text, index - 1, flags) != _is_word(text, index, flags)
+        return boundary == (kind == "AT_BOUNDARY")
+    raise UnsupportedPattern(f"Unsupported position: {kind}")  # pragma: no cover, rejected when compiling
+
+
+class _ThreadSet:
+    """A set of threads, and the sets that follow it on each character."""
+
+    __slots__ = ("threads", "verdict", "following")
+
+    def __init__(self, threads: frozenset[int], match_index: int) -> None:
+        """Store the threads and tell whether they have matched or failed."""
+        self.threads = threads
+        self.verdict = STATE_MATCHES if match_index in threads else 0 if threads else STATE_FAILS
+        self.following: dict[str, _ThreadSet] = {}
+
+
+class LinearMatch:
+    """A match of a LinearPattern, with the methods of re.Match used here."""
+
+    def __init__(self, text: str, captures: Captures) -> None:
+        """Store the text and where each group starts and ends in it."""
+        self.string = text
+        self._captures = captures
+
+    def span(self, group: int = 0) -> tuple[int, int]:
+        """Get where a group starts and ends, or (-1, -1) if it didn't match."""
+        return self._captures[2 * group], self._captures[2 * group + 1]
+
+    def start(self, group: int = 0) -> int:
+        """Get where a group starts."""
+        return self.span(group)[0]
+
+    def end(self, group: int = 0) -> int:
+        """Get where a group ends."""
+        return self.span(group)[1]
+
+    def group(self, group: int = 0) -> str | Any:
+        """Get the text of a group, or None if it didn't match."""
+        start, end = self.span(group)
+        return None if start < 0 or end < 0 else self.string[start:end]
+
+    def groups(self) -> tuple[str | Any, ...]:
+        """Get the text of every group."""
+        return tuple(self.group(group) for group in range(1, len(self._captures) // 2))
+
+    def expand(self, template: str) -> str:
+        r"""Put the groups into a template like that of re.sub.
+
+        Groups are written as \1 or \g<1>, and a group that didn't match
+        is put in as an empty string. Escapes like \n are replaced by the
+        character, and other escapes are kept as they are.
+        """
+
+        def replace(escape: re.Match[str]) -> str:
+            number, short_number, other = escape.groups()
+            if other is not None:
+                return TEMPLATE_ESCAPES.get(other, escape.group())
+            return self.group(int(number or short_number)) or ""
+
+        return TEMPLATE_REGEX.sub(replace, template)
+
+
+class LinearPattern:
+    """A regex that is matched in time linear in the length of the text."""
+
+    def __init__(self, pattern: str, flags: int = 0) -> None:
+        """Parse and compile a regex.
+
+        :param pattern: The regex.
+        :param flags: Flags from the re module.
+
+        :raises UnsupportedPattern: Raised if the regex has lookarounds,
+            backreferences or other parts that need backtracking, or if
+            the regex parser of this Python version isn't supported.
+        :raises re.error: Raised if the regex is not valid.
+        """
+        if sre_parse is None:
+            raise UnsupportedPattern(
+                f"Regex parser of Python {sys.version_info[0]}.{sys.version_info[1]} not supported"
+            )
+        self.pattern = pattern
+        parsed = sre_parse.parse(pattern, flags)
+        self.flags: int = parsed.state.flags
+        self.groups: int = parsed.state.groups - 1
+        compiler = _Compiler()
+        compiler.emit("save", 0)
+        compiler.compile(parsed, self.flags)
+        compiler.emit("save", 1)
+        compiler.emit("match")
+        self._program = tuple(compiler.program)
+        self._match_index = len(self._program) - 1
+        self._follows: tuple[tuple[tuple[int, tuple[int, ...]], ...], ...] | None = None
+        self._closures: tuple[frozenset[int], ...] | None = None
+        if not any(instruction[0] == "assert" for instruction in self._program):
+            self._follows = tuple(self._follow(index) for index in range(len(self._program)))
+            self._closures = tuple(frozenset(target for target, _ in follow) for follow in self._follows)
+        self._thread_sets: dict[frozenset[int], _ThreadSet] = {}
+
+    def __repr__(self) -> str:
+        """Show the regex."""
+        return f"LinearPattern({self.pattern!r})"
+
+    def _follow(self, index: int) -> tuple[tuple[int, tuple[int, ...]], ...]:
+        """Follow the instructions that don't read a character from an instruction.
+
+        This is only done for patterns without anchors, for which where
+        the instructions lead doesn't depend on the text.
+
+        :return: The instructions that read a character or match that
+            are reached, in the order the backtracking engine would reach
+            them, each with the group slots saved on the way.
+        """
+        reached = []
+        seen = set()
+        stack: list[tuple[int, tuple[int, ...]]] = [(index, ())]
+        while stack:
+            index, slots = stack.pop()
+            if index in seen:
+                continue
+            seen.add(index)
+            instruction = self._program[index]
+            kind = instruction[0]
+            if kind == "jump":
+                stack.append((instruction[1], slots))
+            elif kind == "split":
+                stack.append((instruction[2], slots))
+                stack.append((instruction[1], slots))
+            elif kind == "save":
+                stack.append((index + 1, slots + (instruction[1],)))
+            else:
+                reached.append((index, slots))
+        return tuple(reached)
+
+    def _thread_set(self, threads: frozenset[int]) -> _ThreadSet:
+        """Get the remembered set of threads, forgetting the others if there are too many.
+
+        The sets are forgotten by replacing the dictionary, so that a text
+        that is being matched in another thread can keep using them.
+        """
+        thread_set = self._thread_sets.get(threads)
+        if thread_set is None:
+            if len(self._thread_sets) >= MAX_CACHED_STATES:
+                self._thread_sets = {}
+            thread_set = self._thread_sets[threads] = _ThreadSet(threads, self._match_index)
+        return thread_set
+
+    def _following(self, closures: tuple[frozenset[int], ...], thread_set: _ThreadSet, char: str) -> _ThreadSet:
+        """Get the set of threads that follows a set on a character."""
+        program = self._program
+        following = self._thread_set(
+            frozenset().union(
+                *(
+                    closures[index + 1]
+                    for index in thread_set.threads
+                    if program[index][0] == "char" and program[index][1](char)
+                )
+            )
+        )
+        thread_set.following[char] = following
+        return following
+
+    def _can_match(self, closures: tuple[frozenset[int], ...], text: str, pos: int) -> bool:
+        """Tell whether the regex matches at a position, without finding the groups."""
+        thread_set = self._thread_set(closures[0])
+        for char in text[pos:] if pos else text:
+            if thread_set.verdict:
+                return thread_set.verdict == STATE_MATCHES
+            following = thread_set.following.get(char)
+            thread_set = self._following(closures, thread_set, char) if following is None else following
+        return thread_set.verdict == STATE_MATCHES
+
+    def _add_thread(
+        self, threads: list[tuple[int, Captures]], seen: set[int], index: int, captures: Captures, text: str, at: int
+    ) -> None:
+        """Add a thread, following the instructions that don't read a character.
+
+        Threads are added in the order the backtracking engine would try
+        them. A thread that reaches an instruction an earlier thread has
+        already reached at this position is dropped, since it can't match
+        before the earlier one.
+        """
+        if self._follows is not None:
+            for target, slots in self._follows[index]:
+                if target not in seen:
+                    seen.add(target)
+                    if slots:
+                        saved = list(captures)
+                        for slot in slots:
+                            saved[slot] = at
+                        threads.append((target, tuple(saved)))
+                    else:
+                        threads.append((target, captures))
+            return
+        stack = [(index, captures)]
+        while stack:
+            index, captures = stack.pop()
+            if index in seen:
+                continue
+            seen.add(index)
+            instruction = self._program[index]
+            kind = instruction[0]
+            if kind == "jump":
+                stack.append((instruction[1], captures))
+            elif kind == "split":
+                stack.append((instruction[2], captures))
+                stack.append((instruction[1], captures))
+            elif kind == "save":
+                slot = instruction[1]
+                after = slot + 1
+                stack.append((index + 1, captures[:slot] + (at,) + captures[after:]))
+            elif kind == "assert":
+                if _position_holds(instruction[1], instruction[2], text, at):
+                    stack.append((index + 1, captures))
+            else:
+                threads.append((index, captures))
+
+    def _run(self, text: str, pos: int, anchored: bool, must_advance: bool = False) -> LinearMatch | None:
+        """Run the threads over the text from a position.
+
+        If the match must advance, an empty match at the position is
+        skipped, as re.sub does after an empty match.
+        """
+        program = self._program
+        follows = self._follows
+        no_captures = (-1,) * (2 * self.groups + 2)
+        threads: list[tuple[int, Captures]] = []
+        self._add_thread(threads, set(), 0, no_captures, text, pos)
+        found: Captures | None = None
+        for at in range(pos, len(text) + 1):
+            char = text[at] if at < len(text) else ""
+            next_threads: list[tuple[int, Captures]] = []
+            seen: set[int] = set()
+            for index, captures in threads:
+                instruction = program[index]
+                if instruction[0] == "match":
+                    if must_advance and at == pos:
+                        continue
+                    found = captures
+                    break
+                if not char or not instruction[1](char):
+                    continue
+                if follows is None:
+                    self._add_thread(next_threads, seen, index + 1, captures, text, at + 1)
+                    continue
+                # The same as _add_thread, written out since this is where
+                # most of the time is spent
+                for target, slots in follows[index + 1]:
+                    if target not in seen:
+                        seen.add(target)
+                        if slots:
+                            saved = list(captures)
+                            for slot in slots:
+                                saved[slot] = at + 1
+                            next_threads.append((target, tuple(saved)))
+                        else:
+                            next_threads.append((target, captures))
+            if not anchored and found is None and at < len(text):
+                self._add_thread(next_threads, seen, 0, no_captures, text, at + 1)
+            threads = next_threads
+            if not threads and (anchored or found is not None):
+                break
+        return LinearMatch(text, found) if found is not None else None
+
+    def match(self, text: str, pos: int = 0) -> LinearMatch | None:
+        """Match the regex at the start of the text, like re.match."""
+        if self._closures is not None and not self._can_match(self._closures, text, pos):
+            return None
+        return self._run(text, pos, anchored=True)
+
+    def search(self, text: str, pos: int = 0) -> LinearMatch | None:
+        """Find the first match of the regex in the text, like re.search."""
+        return self._run(text, pos, anchored=False)
+
+    def sub(self, template: str, text: str) -> str:
+        r"""Replace each match in the text with a template, like re.sub.
+
+        :param template: The replacement, with groups written as \1.
+        :param text: The text to replace matches in.
+        """
+        pieces = []
+        pos = 0
+        must_advance = False
+        while True:
+            found = self._run(text, pos, anchored=False, must_advance=must_advance)
+            if found is None:
+                break
+            start, end = found.span()
+            pieces.append(text[pos:start])
+            pieces.append(found.expand(template))
+            must_advance = start == end
+            pos = end
+        pieces.append(text[pos:])
+        return "".join(pieces)
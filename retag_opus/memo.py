@@ -0,0 +1,118 @@
+"""Module for remembering the results of helpers called with the same strings.
+
+Artist credits, titles and whole credit blocks of descriptions repeat
+across the tracks of an album and across the sources of each song, so
+the helpers that split, prune and match them keep their latest results
+in bounded LRU caches. Each memo counts
+its hits and misses, which are reported with --profile.
+
+Every process has its own memos. Analyses made in worker processes
+carry the hits and misses counted while they were made, like their
+timings, so that the counts can be reported by the main process.
+"""
+import functools
+import threading
+from typing import Any, Callable, Final, Generic, TypeVar
+
+V = TypeVar("V")
+
+DEFAULT_MEMO_SIZE: Final[int] = 4096
+"""Number of results each memo keeps by default."""
+
+MemoCounts = dict[str, tuple[int, int]]
+
+
+class Memo(Generic[V]):
+    """Bounded LRU cache of the results of a function of one string.
+
+    The results are shared by every caller, so they must not be changed:
+    functions that make lists should return tuples, to be copied by the
+    caller.
+    """
+
+    def __init__(self, name: str, function: Callable[[str], V], size: int = DEFAULT_MEMO_SIZE) -> None:
+        """Create a memo and register it.
+
+        :param name: Name to report the hits and misses under. The hits
+            and misses of memos with the same name are added up.
+        :param function: The function whose results are remembered.
+        :param size: Number of results to keep. 0 turns the memo off.
+        """
+        self.name = name
+        self._function = function
+        self._lock = threading.Lock()
+        self._earlier_hits = 0
+        self._earlier_misses = 0
+        self.size = size
+        self._cached = functools.lru_cache(maxsize=size)(function)
+        MEMOS.append(self)
+
+    def __call__(self, key: str) -> V:
+        """Get the result of the function for a string."""
+        return self._cached(key)
+
+    def resize(self, size: int) -> None:
+        """Change the number of results to keep, forgetting those kept."""
+        if size != self.size:
+            self.clear(size)
+
+    def clear(self, size: int | None = None) -> None:
+        """Forget the results kept, keeping the hits and misses.
+
+        :param size: Number of results to keep from now on, if it should
+            change.
+        """
+        with self._lock:
+            info = self._cached.cache_info()
+            self._earlier_hits += info.hits
+            self._earlier_misses += info.misses
+            if size is not None:
+                self.size = size
+            self._cached = functools.lru_cache(maxsize=self.size)(self._function)
+
+    def counts(self) -> tuple[int, int]:
+        """Get the number of hits and misses since the memo was created."""
+        with self._lock:
+            info = self._cached.cache_info()
+            return self._earlier_hits + info.hits, self._earlier_misses + info.misses
+
+
+MEMOS: list[Memo[Any]] = []
+"""Every memo of the app."""
+
+
+def resize_memos(size: int) -> None:
+    """Change the number of results every memo keeps."""
+    for memo in MEMOS:
+        memo.resize(size)
+
+
+def clear_memos() -> None:
+    """Forget the results kept by every memo."""
+    for memo in MEMOS:
+        memo.clear()
+
+
+def memo_counts() -> MemoCounts:
+    """Get the hits and misses so far of the memos with each name."""
+    counts: MemoCounts = {}
+    for memo in MEMOS:
+        hits, misses = memo.counts()
+        earlier_hits, earlier_misses = counts.get(memo.name, (0, 0))
+        counts[memo.name] = (earlier_hits + hits, earlier_misses + misses)
+    return counts
+
+
+def counts_since(earlier: MemoCounts) -> MemoCounts:
+    """Get the hits and misses of every memo since earlier counts.
+
+    :param earlier: Counts returned by memo_counts.
+
+    :return: The hits and misses since then, for the memos that were used.
+    """
+    counts: MemoCounts = {}
+    for name, (hits, misses) in memo_counts().items():
+        earlier_hits, earlier_misses = earlier.get(name, (0, 0))
+        if hits != earlier_hits or misses != earlier_misses:
+            counts[name] = (hits - earlier_hits, misses - earlier_misses)
+    return counts
@@ -1,17 +1,18 @@
 """Module for storing tags from different sources and printing them."""
 import re
-from copy import deepcopy
-from typing import Final
+from typing import Callable, Final, Mapping
 
 from colorama import Fore
 from simple_term_menu import TerminalMenu
 
 from retag_opus import colors, constants
+from retag_opus.custom_rules import TagRule
 from retag_opus.exceptions import UserExitException
+from retag_opus.resolution_policy import ResolutionPolicy
+from retag_opus.tag_store import TagSource, TagStore
+from retag_opus.tag_table import get_table
 from retag_opus.utils import Utils
 
-Tags = dict[str, list[str]]
-
 REMOVED_TAG: Final[list[str]] = ["[Removed]"]
 
 
@@ -20,28 +21,42 @@ class MusicTags:
 
     Stores tags for one song as a dictionary on the same format as the
     one provided by the OggOpus object.
+
+    The tags of each source are kept in a TagStore, and any mapping of
+    tags assigned to a source is converted to one. The resolved tags
+    start out as a copy of the original tags that shares their entries
+    until either is changed.
     """
 
-    def __init__(self, manual_album_set: bool = False) -> None:
-        """Create empty attributes for each source."""
-        self.base_patterns = deepcopy(constants.all_tags)
-        self.performer_patterns = deepcopy(constants.performer_tags)
-        if manual_album_set:
-            self.base_patterns["discsubtitle"] = self.base_patterns["album"].copy()
-            self.base_patterns["discsubtitle"]["print"] = "Disc subtitle"
-            self.base_patterns["album"]["pattern"] = []
-        self.original: Tags = {}
-        self.youtube: Tags = {}
-        self.fromtags: Tags = {}
-        self.fromdesc: Tags = {}
-        self.resolved: Tags = {}
+    __slots__ = ("table", "_original", "_youtube", "_fromtags", "_fromdesc", "_resolved")
+
+    original = TagSource()
+    youtube = TagSource()
+    fromtags = TagSource()
+    fromdesc = TagSource()
+    resolved = TagSource()
+
+    def __init__(self, manual_album_set: bool = False, custom_rules: tuple[TagRule, ...] = ()) -> None:
+        """Create empty attributes for each source.
+
+        :param manual_album_set: Whether the album is set manually, which
+            adds the disc subtitle to the tags that are printed.
+        :param custom_rules: Rules from the config file, which can add
+            tags that are printed.
+        """
+        self.table = get_table(manual_album_set, custom_rules)
+        self.original = TagStore()
+        self.youtube = TagStore()
+        self.fromtags = TagStore()
+        self.fromdesc = TagStore()
+        self.resolved = TagStore()
 
     def print_metadata_key(
         self,
         key_type: str,
         key: str,
         key_col: str,
-        data: Tags,
+        data: Mapping[str, list[str]],
     ) -> None:
         """Print a single metadata key in specified color.
 
@@ -56,19 +71,19 @@ class MusicTags:
         key_col = key_col if data.get(key) else Fore.BLACK
         print("  " + key_type + ": " + key_col + value + Fore.RESET)
 
-    def print_metadata(self, metadata: Tags, col: str) -> None:
+    def print_metadata(self, metadata: Mapping[str, list[str]], col: str) -> None:
         """Print metadata of given set of tags in specifed color.
 
         :param metadata: The set of tags to print.
         :param col: The color to print the tags in.
         """
-        if any(t in self.performer_patterns.keys() for t in metadata.keys()):
+        if any(t in self.table.performer_names for t in metadata.keys()):
             print("  Performers:")
-            for tag_id, tag_data in self.performer_patterns.items():
+            for tag_id, tag_name in self.table.performer_names.items():
                 if tag_id in metadata and metadata[tag_id] is not None:
-                    self.print_metadata_key(tag_data["print"], tag_id, col, metadata)
-        for tag_id, tag_data in self.base_patterns.items():
-            self.print_metadata_key(tag_data["print"], tag_id, col, metadata)
+                    self.print_metadata_key(tag_name, tag_id, col, metadata)
+        for tag_id, tag_name in self.table.base_names.items():
+            self.print_metadata_key(tag_name, tag_id, col, metadata)
         print("")
 
     def get_tag_data(self, tag_id: str) -> list[str]:
@@ -107,20 +122,20 @@ class MusicTags:
         """
         performer_block = []
         there_are_tags = False
-        for tag_id, tag_data in self.performer_patterns.items():
+        for tag_id, tag_name in self.table.performer_names.items():
             tag_all_values = self.get_tag_data(tag_id)
             if len(tag_all_values) > 0:
                 there_are_tags = True
-                performer_block.append(tag_data["print"] + ": " + " | ".join(tag_all_values))
+                performer_block.append(tag_name + ": " + " | ".join(tag_all_values))
 
         main_block = []
-        for tag_id, tag_data in self.base_patterns.items():
+        for tag_id, tag_name in self.table.base_names.items():
             tag_all_values = self.get_tag_data(tag_id)
             if len(tag_all_values) > 0:
                 there_are_tags = True
-                main_block.append(tag_data["print"] + ": " + " | ".join(tag_all_values))
+                main_block.append(tag_name + ": " + " | ".join(tag_all_values))
             else:
-                main_block.append(tag_data["print"] + ": " + Fore.BLACK + "Not set" + Fore.RESET)
+                main_block.append(tag_name + ": " + Fore.BLACK + "Not set" + Fore.RESET)
 
         if there_are_tags:
             if len(performer_block) > 0:
@@ -173,7 +188,7 @@ class MusicTags:
         """
         other_tags: list[str] = []
         for tag_id in self.resolved.keys():
-            if tag_id not in self.base_patterns and tag_id not in self.performer_patterns:
+            if not self.table.is_known(tag_id):
                 other_tags.append(tag_id)
         if other_tags:
             print("  Other tags:")
@@ -191,31 +206,31 @@ class MusicTags:
 
         if "performer:" in " ".join(self.resolved.keys()):
             print("  Performers:")
-            for tag_id, tag_data in self.performer_patterns.items():
+            for tag_id, tag_name in self.table.performer_names.items():
                 resolved_tag = self.resolved.get(tag_id, [])
                 all_sources_tag = self.get_tag_data(tag_id)
                 # If the user chose to remove a tag that existed before
                 if resolved_tag == REMOVED_TAG:
-                    self.print_metadata_key(tag_data["print"], tag_id, Fore.RED, self.original)
+                    self.print_metadata_key(tag_name, tag_id, Fore.RED, self.original)
                 # If the resolved tag differs from the original tag
                 elif resolved_tag != self.original.get(tag_id, []) and self.resolved.get(tag_id) is not None:
-                    self.print_metadata_key(tag_data["print"], tag_id, Fore.GREEN, self.resolved)
+                    self.print_metadata_key(tag_name, tag_id, Fore.GREEN, self.resolved)
                 # original and resolved are equal, but other tags exist
                 elif len(all_sources_tag) > 0 and print_all:
-                    print("  " + tag_data["print"] + ": " + " | ".join(all_sources_tag))
+                    print("  " + tag_name + ": " + " | ".join(all_sources_tag))
                 else:
-                    self.print_metadata_key(tag_data["print"], tag_id, colors.md_col, self.resolved)
-        for tag_id, tag_data in self.base_patterns.items():
+                    self.print_metadata_key(tag_name, tag_id, colors.md_col, self.resolved)
+        for tag_id, tag_name in self.table.base_names.items():
             resolved_tag = self.resolved.get(tag_id, [])
             all_sources_tag = self.get_tag_data(tag_id)
             if resolved_tag == REMOVED_TAG:
-                self.print_metadata_key(tag_data["print"], tag_id, Fore.RED, self.original)
+                self.print_metadata_key(tag_name, tag_id, Fore.RED, self.original)
             elif resolved_tag != self.original.get(tag_id, []) and self.resolved.get(tag_id) is not None:
-                self.print_metadata_key(tag_data["print"], tag_id, Fore.GREEN, self.resolved)
+                self.print_metadata_key(tag_name, tag_id, Fore.GREEN, self.resolved)
             elif len(all_sources_tag) > 0 and print_all:
-                print("  " + tag_data["print"] + ": " + " | ".join(all_sources_tag))
+                print("  " + tag_name + ": " + " | ".join(all_sources_tag))
             else:
-                self.print_metadata_key(tag_data["print"], tag_id, colors.md_col, self.resolved)
+                self.print_metadata_key(tag_name, tag_id, colors.md_col, self.resolved)
 
         print("")
 
@@ -290,7 +305,7 @@ class MusicTags:
         """
         tags_in_resolved = []
         for tag in self.resolved.keys():
-            if tag in self.base_patterns.keys() or tag in self.performer_patterns.keys():
+            if self.table.is_known(tag):
                 if self.resolved[tag] != REMOVED_TAG:
                     tags_in_resolved.append(tag)
 
@@ -320,10 +335,10 @@ class MusicTags:
                 print(Fore.YELLOW + "Returning without removing anything" + Fore.RESET)
                 return
 
+            remaining_items = self.resolved[selected_tag]
             for item in items_to_remove:
-                self.resolved[selected_tag].remove(items_in_tag[item])
-                if len(self.resolved[selected_tag]) == 0:
-                    self.resolved[selected_tag] = REMOVED_TAG
+                remaining_items.remove(items_in_tag[item])
+            self.resolved[selected_tag] = remaining_items if remaining_items else REMOVED_TAG
 
     def check_any_new_data_exists(self) -> bool:
         """Check whether there are new tags in the sources.
@@ -358,13 +373,24 @@ class MusicTags:
 
         return new_content_exists
 
-    def determine_album_artist(self) -> None:
-        """Choose value to use for albumartist tag."""
+    def determine_album_artist(self, policy: ResolutionPolicy | None = None) -> None:
+        """Choose value to use for albumartist tag.
+
+        :param policy: If given, never ask the user to select the album
+            artist. Keep any album artist that has already been resolved
+            or that exists in the original tags, and otherwise use the
+            first resolved or original artist.
+        """
         all_artists = self.get_field("artist")
         resolved_artist = self.resolved.get("artist")
         original_artist = self.original.get("artist")
 
-        if len(all_artists) > 1:
+        if policy is not None:
+            if not self.resolved.get("albumartist") and not self.original.get("albumartist"):
+                artist = resolved_artist or original_artist
+                if artist:
+                    self.resolved["albumartist"] = [artist[0]]
+        elif len(all_artists) > 1:
             print("-----------------------------------------------")
             self.print_resolved(print_all=True)
             print(Fore.BLUE + "Select the album artist:")
@@ -457,9 +483,7 @@ class MusicTags:
                     print(Fore.RED + "Invalid choice, try again")
                     return True
 
-                self.resolved[tag_name] = []
-                for item in items:
-                    self.resolved[tag_name].append(available_tags[item])
+                self.resolved[tag_name] = [available_tags[item] for item in items]
 
                 return False
             case "[r] Remove field":
@@ -469,7 +493,9 @@ class MusicTags:
                 print("Going back to previous menu")
                 return True
 
-    def resolve_metadata(self) -> None:
+    def resolve_metadata(
+        self, policy: ResolutionPolicy | None = None, messages: list[str] | None = None
+    ) -> dict[str, dict[str, list[str]]]:
         """Merge the metadata from the different sources.
 
         Use the acquired metadata from all sources to produce a set of
@@ -478,9 +504,20 @@ class MusicTags:
         menus where the selection happens. It's also possible to make
         manual edits to the tags.
 
+        :param policy: If given, conflicts are resolved with the policy
+            instead of by asking the user.
+        :param messages: If given, the messages about tags that are
+            resolved without asking are added to it instead of printed.
+
         :raises UserExitException: Raised when the user chooses to quit
             the app.
+
+        :return: The tags whose new values conflict with the existing
+            metadata, with the value of each source: "youtube",
+            "fromdesc", "fromtags" and "existing".
         """
+        report: Callable[[str], None] = print if messages is None else messages.append
+        conflicts: dict[str, dict[str, list[str]]] = {}
         all_tags_with_new_data = [tag_name for tag_name in self.youtube.keys()]
         all_tags_with_new_data += [tag_name for tag_name in self.fromdesc.keys()]
         all_tags_with_new_data += [tag_name for tag_name in self.fromtags.keys()]
@@ -500,23 +537,45 @@ class MusicTags:
                     self.resolved[tag_name] = from_tags_value
                 else:  # len(from_desc_value) > 0:
                     self.resolved[tag_name] = from_desc_value
-                print(
+                report(
                     Fore.YELLOW + f"{tag_name.title()}: No value exists in metadata. Using parsed data: "
                     f"{self.resolved[tag_name]}." + Fore.RESET
                 )
             elif Utils.is_equal_when_stripped(yt_value, old_value) and len(old_value) > 0:
-                print(Fore.GREEN + f"{tag_name.title()}: Metadata matches YouTube description tags." + Fore.RESET)
+                report(Fore.GREEN + f"{tag_name.title()}: Metadata matches YouTube description tags." + Fore.RESET)
                 self.resolved[tag_name] = [v.strip() for v in old_value]
                 continue
             elif Utils.is_equal_when_stripped(from_desc_value, old_value) and len(old_value) > 0:
-                print(Fore.GREEN + f"{tag_name.title()}: Metadata matches tags parsed from YouTube tags." + Fore.RESET)
+                report(Fore.GREEN + f"{tag_name.title()}: Metadata matches tags parsed from YouTube tags." + Fore.RESET)
                 self.resolved[tag_name] = [v.strip() for v in old_value]
                 continue
             elif Utils.is_equal_when_stripped(from_tags_value, old_value) and len(old_value) > 0:
-                print(Fore.GREEN + f"{tag_name.title()}: Metadata matches tags parsed from original tags." + Fore.RESET)
+                report(
+                    Fore.GREEN + f"{tag_name.title()}: Metadata matches tags parsed from original tags." + Fore.RESET
+                )
                 self.resolved[tag_name] = [v.strip() for v in old_value]
                 continue
+            elif policy is not None:
+                conflicts[tag_name] = {
+                    "youtube": yt_value,
+                    "fromdesc": from_desc_value,
+                    "fromtags": from_tags_value,
+                    "existing": old_value,
+                }
+                source, value = policy.choose(tag_name, conflicts[tag_name])
+                if value:
+                    self.resolved[tag_name] = value
+                report(
+                    Fore.YELLOW + f"{tag_name.title()}: Mismatch between values in description and metadata. "
+                    f"Using {source.lower()}: {value}." + Fore.RESET
+                )
             else:
+                conflicts[tag_name] = {
+                    "youtube": yt_value,
+                    "fromdesc": from_desc_value,
+                    "fromtags": from_tags_value,
+                    "existing": old_value,
+                }
                 redo = True
                 print("-----------------------------------------------")
                 self.print_resolved(print_all=True)
@@ -570,4 +629,5 @@ class MusicTags:
                         case _:
                             raise UserExitException("Skipping this and all later songs")
 
-        self.determine_album_artist()
+        self.determine_album_artist(policy)
+        return conflicts
@@ -0,0 +1,115 @@
+"""Module for reading the tags of Opus files without parsing the whole file.
+
+The tags of an Ogg Opus file are in the comment header, which is the
+second packet of the stream and follows the identification header on
+the first pages of the file. Only those pages are read here, so reading
+the tags of a long recording costs a few kilobytes of I/O instead of a
+pass over every page of the file, as mutagen does to find the length of
+the stream. Files with a header that is unusual in any way are read
+with mutagen instead.
+"""
+import struct
+from pathlib import Path
+from typing import BinaryIO, Final
+
+from mutagen.ogg import OggPage
+from mutagen.ogg import error as OggError
+from mutagen.oggopus import OggOpus
+
+from retag_opus.exceptions import OpusHeaderException
+
+Tags = dict[str, list[str]]
+
+OPUS_HEAD_MAGIC: Final[bytes] = b"OpusHead"
+OPUS_TAGS_MAGIC: Final[bytes] = b"OpusTags"
+
+
+def read_header_packets(fileobj: BinaryIO) -> tuple[list[OggPage], list[bytes]]:
+    """Read the identification and comment header packets of a stream.
+
+    Pages are read from the start of the file until both packets are
+    complete.
+
+    :param fileobj: The opened Ogg Opus file.
+
+    :raises OpusHeaderException: If the headers can't be read.
+
+    :return: The pages the headers are on, and the two header packets.
+    """
+    pages: list[OggPage] = []
+    finished_packets = 0
+    try:
+        while finished_packets < 2:
+            page = OggPage(fileobj)  # type: ignore
+            if pages and page.serial != pages[0].serial:
+                raise OpusHeaderException("Headers are interleaved with another stream")
+            pages.append(page)
+            finished_packets += len(page.packets) - (0 if page.complete else 1)
+    except (OggError, EOFError, struct.error) as e:
+        raise OpusHeaderException(f"Unable to read Ogg page: {e}") from e
+
+    packets: list[bytes] = OggPage.to_packets(pages, strict=False)  # type: ignore
+    if len(packets) < 2 or not packets[0].startswith(OPUS_HEAD_MAGIC) or not packets[1].startswith(OPUS_TAGS_MAGIC):
+        raise OpusHeaderException("Not an Opus stream")
+    return pages, packets[:2]
+
+
+def parse_comment_packet(packet: bytes) -> Tags:
+    """Parse the Vorbis comments in an OpusTags packet.
+
+    Keys are lowercased and the values of repeated keys are collected in
+    the order they appear, as mutagen does.
+
+    :param packet: The comment header packet.
+
+    :raises OpusHeaderException: If the packet is malformed or has
+        comments mutagen would have to repair.
+
+    :return: The tags in the packet.
+    """
+    tags: Tags = {}
+    try:
+        offset = len(OPUS_TAGS_MAGIC)
+        (vendor_length,) = struct.unpack_from("<I", packet, offset)
+        offset += 4 + vendor_length
+        (count,) = struct.unpack_from("<I", packet, offset)
+        offset += 4
+        for _ in range(count):
+            (length,) = struct.unpack_from("<I", packet, offset)
+            offset += 4
+            end = offset + length
+            if end > len(packet):
+                raise OpusHeaderException("Comment runs past the end of the packet")
+            comment = packet[offset:end].decode("utf-8", "replace")
+            offset = end
+            key, separator, value = comment.partition("=")
+            if not separator or not key or not all(" " <= c <= "}" for c in key):
+                raise OpusHeaderException(f"Invalid comment: {comment[:40]!r}")
+            tags.setdefault(key.lower(), []).append(value)
+    except struct.error as e:
+        raise OpusHeaderException(f"Comment header is truncated: {e}") from e
+    return tags
+
+
+def read_tags(file_path: Path) -> Tags:
+    """Read the tags of an Opus file.
+
+    Only the header pages are read when possible. Otherwise the file is
+    read with mutagen, which also reports any error opening the file.
+
+    :param file_path: The music file.
+
+    :return: The tags of the file.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            _, packets = read_header_packets(f)
+        return parse_comment_packet(packets[1])
+    except (OpusHeaderException, OSError):
+        pass
+
+    metadata: OggOpus = OggOpus(file_path)  # type: ignore
+    tags: Tags = {}
+    for key, val in metadata.items():  # type: ignore
+        tags[key] = val
+    return tags
@@ -0,0 +1,109 @@
+"""Module for saving the tags of Opus files.
+
+The comment header of an Opus file may be followed by padding, which is
+space that is reserved for the tags to grow into. As long as the new
+comment header fits in the old one with its padding, it is written over
+the old one in place, which leaves the rest of the file untouched. When
+it doesn't fit, the header is rewritten with new padding reserved for
+later changes, and the rest of the file is moved and renumbered. Files
+with an unusual header are saved with mutagen.
+"""
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Final, Iterable, MutableMapping
+
+from mutagen import MutagenError
+from mutagen._vorbis import VCommentDict
+from mutagen.ogg import OggPage
+from mutagen.oggopus import OggOpus
+
+from retag_opus.exceptions import OpusHeaderException
+from retag_opus.opus_reader import OPUS_TAGS_MAGIC, read_header_packets
+
+Tags = dict[str, list[str]]
+
+DEFAULT_COMMENT_PADDING: Final[int] = 4096
+"""Number of bytes reserved for the tags to grow when the header grows."""
+
+
+def _update_tags(comments: MutableMapping[str, list[str]], new_tags: Tags, deleted_tags: Iterable[str]) -> None:
+    """Set and delete tags in the comments of a file."""
+    for tag, data in new_tags.items():
+        comments[tag] = data
+    for tag in deleted_tags:
+        try:
+            del comments[tag]
+        except KeyError:
+            pass
+
+
+def save_tags(
+    file_path: Path,
+    new_tags: Tags,
+    deleted_tags: Iterable[str] = (),
+    padding: int = DEFAULT_COMMENT_PADDING,
+) -> bool:
+    """Write tags to an Opus file.
+
+    Tags that are neither set nor deleted are kept as they are.
+
+    :param file_path: The music file.
+    :param new_tags: Tags to set, replacing any values they have.
+    :param deleted_tags: Tags to remove from the file.
+    :param padding: Number of bytes to reserve after the tags if the
+        comment header has to grow.
+
+    :return: Whether the comment header was written in place.
+    """
+    try:
+        with open(file_path, "r+b") as f:
+            return _save_header(f, new_tags, deleted_tags, padding)
+    except OpusHeaderException:
+        pass
+
+    metadata: OggOpus = OggOpus(file_path)  # type: ignore
+    _update_tags(metadata, new_tags, deleted_tags)  # type: ignore
+    metadata.save(padding=lambda _: padding)
+    return False
+
+
+def _save_header(f: BinaryIO, new_tags: Tags, deleted_tags: Iterable[str], padding: int) -> bool:
+    """Write the comment header of an opened Opus file.
+
+    :raises OpusHeaderException: If the headers aren't laid out as the
+        Opus specification says, with each header on pages of its own.
+
+    :return: Whether the comment header was written in place.
+    """
+    pages, packets = read_header_packets(f)
+    comment_pages = pages[1:]
+    if len(pages[0].packets) != 1 or not pages[0].complete or not comment_pages or comment_pages[0].continued:
+        raise OpusHeaderException("Headers share pages")
+    if not comment_pages[-1].complete or len(OggPage.to_packets(comment_pages)) != 1:  # type: ignore
+        raise OpusHeaderException("The comment header shares a page with audio")
+
+    old_packet = packets[1]
+    magic_length = len(OPUS_TAGS_MAGIC)
+    header_data = BytesIO(old_packet[magic_length:])
+    try:
+        comments = VCommentDict(header_data, framing=False)  # type: ignore
+    except MutagenError as e:
+        raise OpusHeaderException(f"Invalid comment header: {e}") from e
+    # If the lowest bit of the byte after the comments is set, the rest
+    # of the packet is data that has to be kept. Otherwise it's padding.
+    trailing_data = header_data.read()
+    kept_data = trailing_data if trailing_data and trailing_data[0] & 0x1 else b""
+    _update_tags(comments, new_tags, deleted_tags)  # type: ignore
+    new_packet = OPUS_TAGS_MAGIC + comments.write(framing=False) + kept_data  # type: ignore
+
+    in_place = len(new_packet) <= len(old_packet)
+    if in_place:
+        # Same packet size gives the same page layout and page sizes
+        new_packet += b"\x00" * (len(old_packet) - len(new_packet))
+        new_pages = OggPage._from_packets_try_preserve([new_packet], comment_pages)  # type: ignore
+    else:
+        if not kept_data:
+            new_packet += b"\x00" * padding
+        new_pages = OggPage.from_packets([new_packet], comment_pages[0].sequence)  # type: ignore
+    OggPage.replace(f, comment_pages, new_pages)  # type: ignore
+    return in_place
@@ -0,0 +1,277 @@
+"""Module for matching description lines against the tag patterns.
+
+The patterns in the constants module are compiled once, when this
+module is imported. Each line of a YouTube description is first checked
+for the keywords the patterns hinge on, and the patterns that could
+match are then tried with a single call into the regex engine instead
+of one call per pattern.
+"""
+import re
+from typing import Final, Iterable, Iterator, Sequence
+
+from retag_opus import constants
+from retag_opus.custom_rules import TagRule
+from retag_opus.linear_regex import (
+    BACKTRACKING_MATCH_LENGTH,
+    LINEAR_MATCH_LENGTH,
+    LinearPattern,
+    UnsupportedPattern,
+)
+from retag_opus.memo import Memo
+from retag_opus.tag_table import TagPattern, get_table
+
+GLOBAL_FLAGS_REGEX: Final[re.Pattern[str]] = re.compile(r"^(?:\(\?[aiLmsux]+\))+")
+COPYRIGHT_DATE_KEYWORD: Final[str] = "\u2117"
+COPYRIGHT_DATE_PATTERN: Final[re.Pattern[str]] = re.compile(r"\u2117 (\d\d\d\d)\s")
+
+BACKTRACKING_PATTERNS: Final[frozenset[str]] = frozenset(constants.performer_tags["performer:guitar"]["pattern"])
+"""Built-in description patterns that retag-audit finds slow on lines
+shorter than LINEAR_MATCH_LENGTH, which are matched with LinearPattern on
+lines longer than BACKTRACKING_MATCH_LENGTH."""
+
+
+def linear_match_length(pattern: str) -> int:
+    """Get the length of the longest lines a pattern is matched against with the re module."""
+    return BACKTRACKING_MATCH_LENGTH if pattern in BACKTRACKING_PATTERNS else LINEAR_MATCH_LENGTH
+
+
+class PatternEngine:
+    """Match lines against a fixed, ordered set of tag patterns.
+
+    Every pattern is wrapped in an optional lookahead followed by an
+    empty sentinel group and the patterns are joined into one regex.
+    Since a lookahead at the start of the line behaves exactly like
+    re.match with the pattern on its own, the captured groups are the
+    same as when matching the patterns one by one, and the sentinel
+    group tells whether a given pattern matched at all.
+
+    Before matching, the lowercased line is checked for the keywords of
+    each pattern. Only the patterns whose keywords are found in the line
+    are joined into the regex used for that line, and lines without any
+    keyword are not matched at all. The regexes are cached by the set of
+    patterns they contain.
+
+    Lines longer than LINEAR_MATCH_LENGTH, or than BACKTRACKING_MATCH_LENGTH
+    for the patterns in BACKTRACKING_PATTERNS, are matched pattern by
+    pattern, with LinearPattern for the patterns that could backtrack
+    badly on them, so that they can't stall. Patterns that LinearPattern
+    can't match, e.g. ones with lookaheads, are still matched with the
+    re module.
+
+    The tags found in each line are also remembered, in a memo, so that
+    lines repeated across descriptions, like the credits shared by the
+    tracks of an album, are only matched once.
+    """
+
+    def __init__(self, tag_patterns: Iterable[tuple[str, str, Sequence[str]]]) -> None:
+        """Compile the patterns and build the keyword index.
+
+        :param tag_patterns: Triples of tag name, regex and keywords, in
+            the order the matches should be reported. A pattern without
+            keywords is tried on every line.
+
+        :raises ValueError: Raised if a pattern has no capture group to
+            take the tag value from.
+        """
+        patterns: list[tuple[str, re.Pattern[str]]] = []
+        keyword_index: dict[str, list[int]] = {}
+        unanchored: list[int] = []
+        for pattern_index, (tag_id, pattern, keywords) in enumerate(tag_patterns):
+            compiled = re.compile(pattern)
+            if compiled.groups == 0:
+                raise ValueError(f"Pattern for '{tag_id}' has no group to get the value from: {pattern}")
+            patterns.append((tag_id, compiled))
+            if not keywords:
+                unanchored.append(pattern_index)
+            for keyword in keywords:
+                keyword_index.setdefault(keyword.lower(), []).append(pattern_index)
+
+        self.patterns: tuple[tuple[str, re.Pattern[str]], ...] = tuple(patterns)
+        self._keyword_index: tuple[tuple[str, tuple[int, ...]], ...] = tuple(
+            (keyword, tuple(indices)) for keyword, indices in keyword_index.items()
+        )
+        self._unanchored: frozenset[int] = frozenset(unanchored)
+        self._combined_cache: dict[frozenset[int], tuple[re.Pattern[str], tuple[tuple[str, int, int], ...]]] = {}
+        self._linear_patterns: dict[int, LinearPattern | None] = {}
+        self._linear_lengths: tuple[int, ...] = tuple(
+            linear_match_length(compiled.pattern) for _, compiled in self.patterns
+        )
+        self._shortest_linear_length = min(self._linear_lengths, default=LINEAR_MATCH_LENGTH)
+        self._line_tags: Memo[tuple[tuple[str, str], ...]] = Memo("description_line", self._match_tuple)
+
+    @staticmethod
+    def _scope_global_flags(pattern: str) -> str:
+        """Turn leading global flags into flags scoped to the pattern.
+
+        Global flags such as (?i) are only allowed at the very start of
+        a regex, so they can't be kept as they are when the pattern is
+        embedded in the combined regex. Every leading group of flags is
+        moved into the scoped group, and in verbose patterns the group
+        is closed on a new line, so that a comment at the end of the
+        pattern can't swallow it.
+        """
+        flags_match = GLOBAL_FLAGS_REGEX.match(pattern)
+        if flags_match:
+            flags = "".join(dict.fromkeys(re.sub(r"[(?)]", "", flags_match.group())))
+            end = "\n)" if "x" in flags else ")"
+            return f"(?{flags}:{pattern[flags_match.end():]}{end}"
+        return pattern
+
+    @classmethod
+    def wrap(cls, pattern: str) -> str:
+        """Wrap a pattern the way it is embedded in the combined regex.
+
+        The wrapped pattern is an optional lookahead for the pattern
+        followed by the sentinel group.
+        """
+        return f"(?:(?=(?:{cls._scope_global_flags(pattern)})()))?"
+
+    @property
+    def tag_ids(self) -> tuple[str, ...]:
+        """Names of the tags in the order their patterns are matched."""
+        return tuple(tag_id for tag_id, _ in self.patterns)
+
+    def candidates(self, line: str) -> frozenset[int]:
+        """Get the indices of the patterns that could match the line.
+
+        :param line: A single line of a description.
+
+        :return: Indices of the patterns that have a keyword in the line
+            or that have no keywords at all.
+        """
+        lowercase_line = line.lower()
+        candidates = set(self._unanchored)
+        for keyword, pattern_indices in self._keyword_index:
+            if keyword in lowercase_line:
+                candidates.update(pattern_indices)
+        return frozenset(candidates)
+
+    def _combined(self, pattern_indices: frozenset[int]) -> tuple[re.Pattern[str], tuple[tuple[str, int, int], ...]]:
+        """Get the combined regex for the given set of patterns.
+
+        :param pattern_indices: Indices of the patterns to include.
+
+        :return: The combined regex, and for each included pattern the
+            tag name and the indices of its value group and its sentinel
+            group in Match.groups().
+        """
+        cached = self._combined_cache.get(pattern_indices)
+        if cached is not None:
+            return cached
+        parts: list[str] = []
+        dispatch: list[tuple[str, int, int]] = []
+        group_count = 0
+        for pattern_index in sorted(pattern_indices):
+            tag_id, compiled = self.patterns[pattern_index]
+            parts.append(self.wrap(compiled.pattern))
+            value_index = group_count + compiled.groups - 1
+            sentinel_index = group_count + compiled.groups
+            dispatch.append((tag_id, value_index, sentinel_index))
+            group_count = sentinel_index + 1
+        combined = (re.compile("".join(parts)), tuple(dispatch))
+        self._combined_cache[pattern_indices] = combined
+        return combined
+
+    def _linear(self, pattern_index: int) -> LinearPattern | None:
+        """Get a pattern compiled for linear-time matching, if it can be.
+
+        The patterns are compiled the first time a long line needs them.
+        """
+        if pattern_index not in self._linear_patterns:
+            try:
+                linear_pattern: LinearPattern | None = LinearPattern(self.patterns[pattern_index][1].pattern)
+            except UnsupportedPattern:
+                linear_pattern = None
+            self._linear_patterns[pattern_index] = linear_pattern
+        return self._linear_patterns[pattern_index]
+
+    def _match_long_line(self, line: str, pattern_indices: frozenset[int]) -> Iterator[tuple[str, str]]:
+        """Match the patterns one by one against a long line.
+
+        LinearPattern is used for the patterns that the line is too long
+        for to match with the re module.
+        """
+        for pattern_index in sorted(pattern_indices):
+            tag_id, compiled = self.patterns[pattern_index]
+            linear_pattern = self._linear(pattern_index) if len(line) > self._linear_lengths[pattern_index] else None
+            pattern_match = (linear_pattern or compiled).match(line)
+            value = pattern_match.group(compiled.groups) if pattern_match else None
+            if value is not None:
+                yield tag_id, value.strip()
+
+    def match(self, line: str) -> Iterator[tuple[str, str]]:
+        """Match the patterns against the start of the line.
+
+        :param line: A single line of a description.
+
+        :return: Iterator with the tag name and the stripped value of
+            the last group, for every pattern that matched, in pattern
+            order.
+        """
+        pattern_indices = self.candidates(line)
+        if not pattern_indices:
+            return
+        if len(line) > self._shortest_linear_length and any(
+            len(line) > self._linear_lengths[pattern_index] for pattern_index in pattern_indices
+        ):
+            yield from self._match_long_line(line, pattern_indices)
+            return
+        combined, dispatch = self._combined(pattern_indices)
+        combined_match = combined.match(line)
+        if combined_match is None:
+            return
+        groups = combined_match.groups()
+        for tag_id, value_index, sentinel_index in dispatch:
+            if groups[sentinel_index] is not None and groups[value_index] is not None:
+                yield tag_id, groups[value_index].strip()
+
+    def _match_tuple(self, line: str) -> tuple[tuple[str, str], ...]:
+        """Get every match in the line, to be remembered."""
+        return tuple(self.match(line))
+
+    def cached_match(self, line: str) -> tuple[tuple[str, str], ...]:
+        """Match the patterns against a line, or remember the tags found in it.
+
+        :param line: A single line of a description.
+
+        :return: The tag name and value of every pattern that matched,
+            as for match.
+        """
+        return self._line_tags(line)
+
+
+def tag_patterns(manual_album_set: bool = False, custom_rules: tuple[TagRule, ...] = ()) -> tuple[TagPattern, ...]:
+    """List tag names and patterns in the order they should be matched.
+
+    When the album is set manually, the patterns for the album are used
+    for the discsubtitle tag instead, which is matched after the other
+    base tags.
+
+    :param manual_album_set: Whether the album is set manually.
+    :param custom_rules: Rules from the config file.
+
+    :return: Triples of tag name, regex and keywords.
+    """
+    return get_table(manual_album_set, custom_rules).patterns
+
+
+STANDARD_ENGINE: Final[PatternEngine] = PatternEngine(tag_patterns())
+MANUAL_ALBUM_ENGINE: Final[PatternEngine] = PatternEngine(tag_patterns(manual_album_set=True))
+
+
+_custom_engines: dict[tuple[bool, tuple[TagRule, ...]], PatternEngine] = {}
+
+
+def get_engine(manual_album_set: bool = False, custom_rules: tuple[TagRule, ...] = ()) -> PatternEngine:
+    """Get the precompiled engine for the given parsing mode and rules.
+
+    Engines with custom rules are compiled the first time they are
+    needed in each process, and then kept.
+    """
+    if not custom_rules:
+        return MANUAL_ALBUM_ENGINE if manual_album_set else STANDARD_ENGINE
+    key = (manual_album_set, custom_rules)
+    engine = _custom_engines.get(key)
+    if engine is None:
+        engine = _custom_engines[key] = PatternEngine(tag_patterns(manual_album_set, custom_rules))
+    return engine
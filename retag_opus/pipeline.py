@@ -0,0 +1,102 @@
+"""Module with the library API for analysing music files and proposing their tags.
+
+The analysis of each file, the tags proposed for it and the conflicts
+resolved to get them are yielded one file at a time, as the files are
+given, so that a service can feed the files in as they are downloaded
+and handle each result as soon as it is ready. Only a limited number of
+files are analysed ahead of the consumer, so memory use doesn't grow
+with the number of files. A file that can't be read or parsed is
+yielded with the error, and doesn't stop the others. Nothing is printed
+and nothing is saved:
+
+    for analysis in pipeline.analyze(downloaded_files()):
+        if analysis.resolved is not None:
+            save(analysis.file_path, analysis.resolved)
+
+The command line app consumes the same generator in batch and plan
+mode, and with proposals turned off in the interactive mode, where the
+user resolves the tags.
+"""
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from retag_opus.analysis import AnalysisOptions, FileAnalysis, analyze_files
+from retag_opus.profiling import STAGE_RESOLVE, STAGE_WAIT_FOR_ANALYSIS, Profiler
+from retag_opus.resolution_policy import ResolutionPolicy
+
+if TYPE_CHECKING:
+    from retag_opus.cache import AnalysisCache
+
+
+def needs_resolving(analysis: FileAnalysis, options: AnalysisOptions) -> bool:
+    """Check whether the tags of an analysed file should be resolved.
+
+    Files with a status from an earlier run are unchanged since, and
+    files without new data are left as they are, unless the album is set
+    manually. Files that couldn't be analysed are left as they are too.
+    """
+    return (
+        analysis.error is None and analysis.status is None and (analysis.new_data_exists or bool(options.manual_album))
+    )
+
+
+def propose(analysis: FileAnalysis, policy: ResolutionPolicy) -> None:
+    """Resolve the tags of an analysed file with a policy, without asking.
+
+    The resolved tags, the conflicts and the messages about the resolved
+    tags are stored in the analysis, and the time it took is added to
+    its timings.
+    """
+    start = time.perf_counter()
+    analysis.conflicts = analysis.tags.resolve_metadata(policy, analysis.messages)
+    analysis.resolved = analysis.tags.resolved
+    analysis.timings[STAGE_RESOLVE] = analysis.timings.get(STAGE_RESOLVE, 0.0) + time.perf_counter() - start
+
+
+def analyze(
+    file_paths: Iterable[Path],
+    options: AnalysisOptions | None = None,
+    policy: ResolutionPolicy | None = None,
+    propose_tags: bool = True,
+    jobs: int = 1,
+    prefetch: int = 0,
+    cache: "AnalysisCache | None" = None,
+    profiler: Profiler | None = None,
+) -> Iterator[FileAnalysis]:
+    """Analyse music files and propose the tags to save them with.
+
+    The files are read from file_paths only as they are needed, and the
+    results are yielded in the same order.
+
+    :param file_paths: The music files to analyse.
+    :param options: Settings for the analysis. By default, nothing is
+        deleted and no custom rules are used.
+    :param policy: Policy for resolving conflicts. By default, the
+        values from the YouTube description are preferred.
+    :param propose_tags: Whether to resolve the tags of the files with
+        new data. If not, the analyses are yielded as they are.
+    :param jobs: Number of worker processes to use.
+    :param prefetch: Number of files to analyse ahead of the one that
+        was last yielded.
+    :param cache: Cache of analyses from earlier runs.
+    :param profiler: Profiler that the time spent waiting for each
+        analysis, and the timings and memo counts of the analysis, are
+        added to.
+
+    :return: Iterator with the analysis of each file, whose resolved
+        tags are set if they were proposed, and whose error is set if it
+        couldn't be read or parsed.
+    """
+    options = options or AnalysisOptions()
+    policy = policy or ResolutionPolicy()
+    analyses = analyze_files(file_paths, options, jobs, prefetch, cache)
+    if profiler is not None:
+        analyses = profiler.iterate(STAGE_WAIT_FOR_ANALYSIS, analyses)
+    for analysis in analyses:
+        if propose_tags and needs_resolving(analysis, options):
+            propose(analysis, policy)
+        if profiler is not None:
+            profiler.add_all(analysis.timings)
+            profiler.add_memo_counts(analysis.memo_counts)
+        yield analysis
@@ -0,0 +1,107 @@
+"""Module for change plans, which separate analysing songs from saving them.
+
+A plan is a file with a line of JSON for each song. It has the tags of
+the song from all sources, the tags they were resolved to, and the
+changes that saving the song would make. Applying a plan makes exactly
+those changes, without parsing anything again, to the songs that are
+unchanged since the plan was made.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+from retag_opus.analysis import FileAnalysis
+from retag_opus.exceptions import InvalidPlanException
+from retag_opus.music_tags import REMOVED_TAG
+
+Tags = dict[str, list[str]]
+
+
+def plan_record(analysis: FileAnalysis, resolved: Mapping[str, list[str]] | None) -> dict[str, Any]:
+    """Describe the planned changes to a song.
+
+    :param analysis: The analysis of the song.
+    :param resolved: The tags the song would be saved with, or None if
+        it wouldn't be saved.
+
+    :raises OSError: If the song can no longer be found, e.g. because
+        it was moved after it was analysed.
+
+    :return: The plan for the song, which can be serialised as JSON.
+    """
+    stat = os.stat(analysis.file_path)
+    tags = analysis.tags
+    new_tags: Tags = {}
+    deleted_tags: list[str] = []
+    for tag, data in (resolved or {}).items():
+        if data == REMOVED_TAG:
+            if tag in tags.original:
+                deleted_tags.append(tag)
+        elif data != tags.original.get(tag):
+            new_tags[tag] = data
+    return {
+        "path": str(analysis.file_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "status": analysis.status,
+        "original": tags.original.as_dict(),
+        "candidates": {
+            "youtube": tags.youtube.as_dict(),
+            "fromtags": tags.fromtags.as_dict(),
+            "fromdesc": tags.fromdesc.as_dict(),
+        },
+        "resolved": None if resolved is None else dict(resolved),
+        "changes": {"set": new_tags, "delete": deleted_tags},
+    }
+
+
+class PlannedChange:
+    """The changes planned for one song."""
+
+    def __init__(self, record: dict[str, Any]) -> None:
+        """Read the changes from the plan of a song.
+
+        :param record: The plan for the song.
+        """
+        self.file_path = Path(record["path"])
+        self.size = int(record["size"])
+        self.mtime_ns = int(record["mtime_ns"])
+        self.new_tags: Tags = record["changes"]["set"]
+        self.deleted_tags: list[str] = record["changes"]["delete"]
+
+    @property
+    def resolved(self) -> Tags:
+        """Get the changes on the format of resolved tags."""
+        return self.new_tags | {tag: REMOVED_TAG for tag in self.deleted_tags}
+
+    def is_empty(self) -> bool:
+        """Check whether the plan changes nothing."""
+        return not self.new_tags and not self.deleted_tags
+
+    def is_current(self) -> bool:
+        """Check whether the song is unchanged since the plan was made."""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == (self.size, self.mtime_ns)
+
+
+def read_plan(plan_path: Path) -> Iterator[PlannedChange]:
+    """Read the planned changes from a plan file.
+
+    :param plan_path: The plan file.
+
+    :raises InvalidPlanException: If a line of the plan is invalid.
+
+    :return: Iterator with the changes planned for each song.
+    """
+    with open(plan_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield PlannedChange(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                raise InvalidPlanException(f"Invalid plan on line {line_number}: {e}") from e
@@ -0,0 +1,177 @@
+"""Module for timing the stages of a run.
+
+The time spent in each stage, such as reading files or parsing
+descriptions, is collected by a profiler that is turned on with
+--profile and summarised when the app exits. Stages that run in worker
+processes are timed there and added to the profiler when their results
+are handled, together with the hits and misses of the memos of the split
+and prune helpers during the analysis of each file.
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Final, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+STAGE_READ: Final[str] = "read"
+STAGE_PARSE_TAGS: Final[str] = "parse_tags"
+STAGE_PARSE_DESCRIPTION: Final[str] = "parse_description"
+STAGE_PRUNE: Final[str] = "prune"
+STAGE_WAIT_FOR_ANALYSIS: Final[str] = "wait_for_analysis"
+STAGE_RESOLVE: Final[str] = "resolve"
+STAGE_MENU: Final[str] = "menu"
+STAGE_SAVE: Final[str] = "save"
+STAGE_SYNC: Final[str] = "sync"
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Get a percentile of sorted values with the nearest-rank method."""
+    rank = max(1, math.ceil(len(sorted_values) * fraction))
+    return sorted_values[rank - 1]
+
+
+def format_rows(table: list[tuple[str, ...]]) -> str:
+    """Format rows as a table, with the first column aligned left."""
+    widths = [max(len(table_row[column]) for table_row in table) for column in range(len(table[0]))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if column == 0 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(table_row, widths))
+        )
+        for table_row in table
+    )
+
+
+class Profiler:
+    """Collect the duration of each run of each stage."""
+
+    def __init__(self) -> None:
+        """Create a profiler, which is off until it is enabled."""
+        self.enabled = False
+        self.durations: dict[str, list[float]] = {}
+        self.memo_counts: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        """Start collecting durations, forgetting any collected before."""
+        self.enabled = True
+        self.durations = {}
+        self.memo_counts = {}
+
+    def disable(self) -> None:
+        """Stop collecting durations, keeping those collected."""
+        self.enabled = False
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add the duration of a run of a stage, if the profiler is on."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def add_all(self, timings: dict[str, float]) -> None:
+        """Add durations that were measured elsewhere, by stage."""
+        for stage, seconds in timings.items():
+            self.add(stage, seconds)
+
+    def add_memo_counts(self, counts: dict[str, tuple[int, int]]) -> None:
+        """Add hits and misses of memos, by name, if the profiler is on."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, (hits, misses) in counts.items():
+                total_hits, total_misses = self.memo_counts.get(name, (0, 0))
+                self.memo_counts[name] = (total_hits + hits, total_misses + misses)
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time the code in a with statement as a run of a stage."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def iterate(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Time how long each item of an iterator takes to get."""
+        iterator = iter(items)
+        while True:
+            with self.stage(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Summarise the durations of each stage.
+
+        :return: For each stage, in order of total time, the number of
+            runs and the total, median, 95th percentile and longest
+            duration in seconds.
+        """
+        rows = []
+        with self._lock:
+            durations = {stage: sorted(values) for stage, values in self.durations.items()}
+        for stage, values in durations.items():
+            rows.append(
+                {
+                    "stage": stage,
+                    "count": len(values),
+                    "total": sum(values),
+                    "p50": percentile(values, 0.5),
+                    "p95": percentile(values, 0.95),
+                    "max": values[-1],
+                }
+            )
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def memo_summary(self) -> list[dict[str, Any]]:
+        """Summarise the hits and misses of each memo, by name."""
+        with self._lock:
+            memo_counts = sorted(self.memo_counts.items())
+        return [
+            {"memo": name, "hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+            for name, (hits, misses) in memo_counts
+        ]
+
+    def format_table(self) -> str:
+        """Format the summary as a table, with durations in milliseconds.
+
+        The hits and misses of the memos follow in a second table, if
+        any memo was used.
+        """
+        table: list[tuple[str, ...]] = [("stage", "count", "total ms", "p50 ms", "p95 ms", "max ms")]
+        for row in self.summary():
+            table.append(
+                (
+                    row["stage"],
+                    str(row["count"]),
+                    *(f"{row[column] * 1000:.2f}" for column in ("total", "p50", "p95", "max")),
+                )
+            )
+        memo_rows = self.memo_summary()
+        if not memo_rows:
+            return format_rows(table)
+        memo_table: list[tuple[str, ...]] = [("memo", "hits", "misses", "hit rate")]
+        for memo_row in memo_rows:
+            memo_table.append(
+                (memo_row["memo"], str(memo_row["hits"]), str(memo_row["misses"]), f"{memo_row['hit_rate']:.1%}")
+            )
+        return format_rows(table) + "\n\n" + format_rows(memo_table)
+
+    def write_json(self, json_path: Path) -> None:
+        """Write the summary to a file as JSON."""
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"unit": "seconds", "stages": self.summary(), "memos": self.memo_summary()}, f, indent=2)
+
+
+PROFILER: Final[Profiler] = Profiler()
+"""The profiler of the app."""
@@ -0,0 +1,232 @@
+"""Audit of the tag patterns for catastrophic backtracking, run with the retag-audit command.
+
+Every title pattern, built-in description pattern and pattern of the
+rules in the config file is matched against lines made to be slow for a
+backtracking regex engine: a keyword, so that the pattern is tried,
+followed by repeated text such as spaces, " - " or "(a", and an ending
+that makes the pattern fail only after it has tried every way to match
+the rest.
+
+Titles and description lines longer than LINEAR_MATCH_LENGTH are matched
+with LinearPattern, and so are lines longer than BACKTRACKING_MATCH_LENGTH
+for the built-in patterns in BACKTRACKING_PATTERNS. A pattern that
+LinearPattern can match therefore only slows parsing down if it is slow
+on the shorter lines. Such a pattern is reported as guarded if it is
+slow only on longer lines.
+"""
+import argparse
+import re
+import time
+import tomllib
+from pathlib import Path
+from typing import Final, Sequence
+
+from retag_opus import constants
+from retag_opus.custom_rules import TagRule, rules_from_config
+from retag_opus.exceptions import InvalidConfigException
+from retag_opus.linear_regex import LinearPattern, UnsupportedPattern
+from retag_opus.pattern_engine import linear_match_length
+from retag_opus.tag_table import STANDARD_TABLE
+
+BACKTRACKING_LIMIT: Final[float] = 0.01
+"""Seconds a pattern may take to match a line of the test corpus."""
+
+BACKTRACKING_LENGTHS: Final[tuple[int, ...]] = (*range(8, 33, 2), 48, 64, 128, 256, 512, 1024)
+"""Lengths of the test lines, growing slowly at first so that a pattern
+that is exponential in the length is caught before it takes long."""
+
+BACKTRACKING_PREFIXES: Final[tuple[str, ...]] = ("", "(", "[", " - ")
+"""Text put before the keyword, like the brackets around versions in titles."""
+
+BACKTRACKING_UNITS: Final[tuple[str, ...]] = (
+    "a",
+    " ",
+    "a ",
+    ", ",
+    "a,",
+    "1",
+    ": ",
+    ".",
+    "a:",
+    " - ",
+    " (",
+    "(a",
+    "[a",
+)
+"""Text repeated to make the test lines, like the credits in descriptions
+and the brackets and dashes in titles."""
+
+BACKTRACKING_TAILS: Final[tuple[str, ...]] = ("", "!", ":", " ", ")", "]")
+"""Endings of the test lines, which make patterns fail at the very end."""
+
+SOURCE_TITLE: Final[str] = "title"
+SOURCE_DESCRIPTION: Final[str] = "description"
+SOURCE_RULE: Final[str] = "rule"
+
+
+def backtracking_lines(keywords: tuple[str, ...], length: int) -> list[str]:
+    """Make the lines of the test corpus with the given length.
+
+    The lines have a keyword near the start, so that the pattern would
+    be tried on them, followed by repeated text and an ending that the
+    pattern may fail on after trying every way to match the rest.
+    """
+    keyword = keywords[0] if keywords else ""
+    return [
+        prefix + keyword + unit * (length // len(unit)) + tail
+        for prefix in BACKTRACKING_PREFIXES
+        for unit in BACKTRACKING_UNITS
+        for tail in BACKTRACKING_TAILS
+    ]
+
+
+def find_slow_match(pattern: str, keywords: tuple[str, ...], longest: int | None = None) -> tuple[float, int] | None:
+    """Check whether a pattern backtracks catastrophically.
+
+    The pattern is matched against the lines of the test corpus, from the
+    shortest to the longest, and the check stops at the first line that
+    takes longer than BACKTRACKING_LIMIT to match, which is timed twice
+    so that a pause of the interpreter isn't taken for backtracking.
+
+    :param pattern: The regex to check.
+    :param keywords: The keywords of the pattern.
+    :param longest: Length of the longest lines to check, or None to
+        check all of them.
+
+    :return: The seconds it took to match the first slow line and the
+        length of the line, or None if no line is slow.
+    """
+    compiled = re.compile(pattern)
+    for length in BACKTRACKING_LENGTHS:
+        if longest is not None and length > longest:
+            break
+        for line in backtracking_lines(keywords, length):
+            seconds = float("inf")
+            for _ in range(2):
+                start = time.perf_counter()
+                compiled.match(line)
+                seconds = min(seconds, time.perf_counter() - start)
+                if seconds <= BACKTRACKING_LIMIT:
+                    break
+            if seconds > BACKTRACKING_LIMIT:
+                return seconds, len(line)
+    return None
+
+
+def is_linear(pattern: str) -> bool:
+    """Check whether a pattern can be matched with LinearPattern."""
+    try:
+        LinearPattern(pattern)
+    except UnsupportedPattern:
+        return False
+    return True
+
+
+class PatternAudit:
+    """The result of checking one pattern for catastrophic backtracking."""
+
+    def __init__(
+        self, source: str, tag: str, pattern: str, keywords: tuple[str, ...], check_long_lines: bool = True
+    ) -> None:
+        """Check a pattern.
+
+        :param source: Where the pattern comes from: SOURCE_TITLE,
+            SOURCE_DESCRIPTION or SOURCE_RULE.
+        :param tag: The name of the title pattern, or the tag that the
+            description pattern finds.
+        :param pattern: The regex.
+        :param keywords: The keywords of the pattern.
+        :param check_long_lines: Whether to also check the lines longer
+            that are matched with LinearPattern for a pattern that it can
+            match, to tell whether it is guarded.
+        """
+        self.source = source
+        self.tag = tag
+        self.pattern = pattern
+        self.linear = is_linear(pattern)
+        self.linear_length = linear_match_length(pattern)
+        self.slow_match = find_slow_match(pattern, keywords, self.linear_length if self.linear else None)
+        self.guarded_slow_match = None
+        if self.linear and self.slow_match is None and check_long_lines:
+            self.guarded_slow_match = find_slow_match(pattern, keywords)
+
+    @property
+    def is_slow(self) -> bool:
+        """Check whether the pattern could make parsing very slow."""
+        return self.slow_match is not None
+
+    def describe(self) -> str:
+        """Describe the result in a line."""
+        name = f"{self.source} {self.tag}: {self.pattern}"
+        if self.slow_match is not None:
+            seconds, length = self.slow_match
+            return f"slow     {name}\n  {seconds * 1000:.0f} ms to match a line of {length} characters"
+        if self.guarded_slow_match is not None:
+            seconds, length = self.guarded_slow_match
+            return (
+                f"guarded  {name}\n  {seconds * 1000:.0f} ms to match a line of {length} characters with the re"
+                f" module, but lines over {self.linear_length} characters are matched in linear time"
+            )
+        return f"ok       {name}"
+
+
+def audit_rules(custom_rules: tuple[TagRule, ...], check_long_lines: bool = True) -> list[PatternAudit]:
+    """Check the patterns of the rules from the config file."""
+    return [
+        PatternAudit(SOURCE_RULE, rule.tag, pattern, rule.keywords, check_long_lines)
+        for rule in custom_rules
+        for pattern in rule.patterns
+    ]
+
+
+def audit_patterns(custom_rules: tuple[TagRule, ...] = ()) -> list[PatternAudit]:
+    """Check the title patterns, the description patterns and the rules.
+
+    :param custom_rules: Rules from the config file.
+
+    :return: The result for each pattern, in the order they are matched.
+    """
+    audits = [
+        PatternAudit(SOURCE_TITLE, name, pattern, tuple(constants.tag_parse_keywords[name]))
+        for name, pattern in constants.tag_parse_patterns.items()
+    ]
+    audits += [
+        PatternAudit(SOURCE_DESCRIPTION, tag_id, pattern, keywords)
+        for tag_id, pattern, keywords in STANDARD_TABLE.patterns
+    ]
+    return audits + audit_rules(custom_rules)
+
+
+def run(argv: Sequence[str] | None = None) -> int:
+    """Audit the patterns and report the ones that are slow."""
+    from retag_opus.app import CONFIG_PATH
+
+    parser = argparse.ArgumentParser(prog="retag-audit", description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--config",
+        default=str(CONFIG_PATH),
+        metavar="FILE",
+        help=f"Config file with the rules to check. Default: {CONFIG_PATH}",
+    )
+    parser.add_argument("--all", action="store_true", help="Also list the patterns that are not slow or guarded")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.config, "rb") as f:
+            config = tomllib.load(f)
+    except FileNotFoundError:
+        config = {}
+    try:
+        custom_rules = rules_from_config(config)
+    except InvalidConfigException as e:
+        print(f"Invalid configuration in {Path(args.config)}: {e}")
+        return 2
+
+    audits = audit_patterns(custom_rules)
+    for audit in audits:
+        if audit.is_slow or audit.guarded_slow_match is not None or args.all:
+            print(audit.describe())
+    slow_count = sum(1 for audit in audits if audit.is_slow)
+    guarded_count = sum(1 for audit in audits if audit.guarded_slow_match is not None)
+    print(f"{len(audits)} patterns checked: {slow_count} slow, {guarded_count} guarded")
+    return 1 if slow_count else 0
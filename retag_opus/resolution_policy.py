@@ -0,0 +1,99 @@
+"""Module for resolving conflicting tags without user interaction."""
+from typing import Any, Final, Mapping
+
+from retag_opus.exceptions import InvalidConfigException
+
+Tags = dict[str, list[str]]
+
+POLICIES: Final[dict[str, tuple[str, ...]]] = {
+    "youtube": ("youtube", "fromdesc", "fromtags", "existing"),
+    "existing": ("existing", "fromtags", "youtube", "fromdesc"),
+    "fromtags": ("fromtags", "existing", "youtube", "fromdesc"),
+}
+"""Order in which the sources are tried for each policy."""
+
+SOURCE_NAMES: Final[dict[str, str]] = {
+    "youtube": "YouTube description",
+    "fromdesc": "Parsed from YouTube tags",
+    "fromtags": "Parsed from original tags",
+    "existing": "Existing metadata",
+}
+
+
+class ResolutionPolicy:
+    """Choose between conflicting tag values from different sources.
+
+    The policy says which source to prefer when the sources disagree.
+    If the preferred source has no value for the tag, the next source
+    of the policy is used, and so on.
+    """
+
+    def __init__(self, default_policy: str = "youtube", tag_policies: Mapping[str, str] | None = None) -> None:
+        """Set the default policy and the policies for specific tags.
+
+        :param default_policy: Policy used for tags without a specific
+            policy.
+        :param tag_policies: Mapping from tag name to the policy to use
+            for that tag.
+
+        :raises InvalidConfigException: Raised if any of the policies
+            doesn't exist.
+        """
+        self.tag_policies: dict[str, str] = dict(tag_policies or {})
+        for policy in [default_policy, *self.tag_policies.values()]:
+            if policy not in POLICIES:
+                raise InvalidConfigException(
+                    f"Unknown resolution policy '{policy}'. Valid policies are: {', '.join(POLICIES)}"
+                )
+        self.default_policy = default_policy
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any], default_policy: str | None = None) -> "ResolutionPolicy":
+        """Create the policy from the batch section of the config file.
+
+        The config file can set the default policy with the key 'policy'
+        and policies for specific tags in the table 'tag_policies', in
+        the section 'batch':
+
+            [batch]
+            policy = "youtube"
+
+            [batch.tag_policies]
+            artist = "existing"
+
+        :param config: The whole parsed config file.
+        :param default_policy: Policy to use instead of the configured
+            default policy, e.g. from the command line.
+
+        :raises InvalidConfigException: Raised if the batch section is
+            malformed or contains unknown policies.
+        """
+        batch_config = config.get("batch", {})
+        if not isinstance(batch_config, dict):
+            raise InvalidConfigException("The 'batch' section of the config file must be a table")
+        tag_policies = batch_config.get("tag_policies", {})
+        if not isinstance(tag_policies, dict):
+            raise InvalidConfigException("The 'batch.tag_policies' section of the config file must be a table")
+        if default_policy is None:
+            default_policy = batch_config.get("policy", "youtube")
+        return cls(str(default_policy), {str(tag): str(policy) for tag, policy in tag_policies.items()})
+
+    def policy_for(self, tag_name: str) -> str:
+        """Get the name of the policy to use for the given tag."""
+        return self.tag_policies.get(tag_name, self.default_policy)
+
+    def choose(self, tag_name: str, candidates: Mapping[str, list[str]]) -> tuple[str, list[str]]:
+        """Choose which value to use for a tag.
+
+        :param tag_name: The tag that should be resolved.
+        :param candidates: Mapping from source to the value that source
+            has for the tag.
+
+        :return: Printable name of the chosen source, and its value. If
+            no source has a value, the value is an empty list.
+        """
+        for source in POLICIES[self.policy_for(tag_name)]:
+            value = candidates.get(source, [])
+            if len(value) > 0:
+                return SOURCE_NAMES[source], value
+        return SOURCE_NAMES["existing"], []
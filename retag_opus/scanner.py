@@ -0,0 +1,59 @@
+"""Module for finding the music files to retag."""
+import os
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Final, Iterator, Sequence
+
+DEFAULT_INCLUDE: Final[tuple[str, ...]] = ("*.opus",)
+
+
+def _matches_any(relative_path: str, name: str, patterns: Sequence[str]) -> bool:
+    """Check whether a glob pattern matches the path or the name."""
+    return any(fnmatchcase(relative_path, pattern) or fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def scan_music_files(
+    music_dir: Path,
+    recursive: bool = False,
+    include: Sequence[str] = DEFAULT_INCLUDE,
+    exclude: Sequence[str] = (),
+) -> Iterator[Path]:
+    """Find music files in a directory, one directory at a time.
+
+    The entries of each directory are sorted by name. The file type
+    information that comes with the directory listing is used, so no
+    extra system call is needed for each entry, except for symbolic
+    links to files.
+
+    :param music_dir: Directory to look for music files in.
+    :param recursive: Whether to also look in subdirectories.
+    :param include: Glob patterns of which a file name must match one.
+    :param exclude: Glob patterns for files and directories to leave
+        out. They are matched against both the name and the path
+        relative to music_dir. Files in excluded directories are left
+        out too.
+
+    :return: Iterator with the paths of the music files.
+    """
+    pending_dirs: list[tuple[Path, str]] = [(music_dir, "")]
+    while pending_dirs:
+        directory, relative_dir = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as entries:
+                sorted_entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs: list[tuple[Path, str]] = []
+        for entry in sorted_entries:
+            relative_path = f"{relative_dir}{entry.name}"
+            if _matches_any(relative_path, entry.name, exclude):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirs.append((Path(entry.path), f"{relative_path}/"))
+            elif entry.is_file() and any(fnmatchcase(entry.name, pattern) for pattern in include):
+                yield Path(entry.path)
+
+        # Reversed, since the last directory added is the first one popped
+        pending_dirs.extend(reversed(subdirs))
@@ -0,0 +1,453 @@
+"""Module for a session of retagging songs, or making or applying a plan.
+
+This is where the songs are analysed, the user resolves their tags,
+and the resolved tags are saved.
+"""
+import itertools
+import json
+import tomllib
+from argparse import Namespace
+from pathlib import Path
+from typing import Iterable
+
+from colorama import Fore, init
+from simple_term_menu import TerminalMenu
+
+from retag_opus import colors, pipeline
+from retag_opus.analysis import AnalysisOptions, FileAnalysis, analyze_file
+from retag_opus.atomic_save import SaveJournal
+from retag_opus.cache import AnalysisCache
+from retag_opus.constants import STATUS_PASSED, STATUS_SAVED, STATUS_SKIPPED
+from retag_opus.custom_rules import TagRule, rules_from_config
+from retag_opus.exceptions import InvalidConfigException, InvalidPlanException, UserExitException
+from retag_opus.journal import SessionJournal
+from retag_opus.opus_writer import DEFAULT_COMMENT_PADDING
+from retag_opus.plan import plan_record, read_plan
+from retag_opus.profiling import PROFILER, STAGE_MENU, STAGE_RESOLVE
+from retag_opus.regex_audit import audit_rules
+from retag_opus.resolution_policy import ResolutionPolicy
+from retag_opus.scanner import DEFAULT_INCLUDE, scan_music_files
+from retag_opus.utils import Utils
+from retag_opus.write_queue import WriteQueue, WriteResult
+
+init(autoreset=True)
+
+
+def record_status(
+    file_path: Path,
+    status: str,
+    analysis_options: AnalysisOptions,
+    cache: AnalysisCache | None,
+    journal: SessionJournal,
+) -> None:
+    """Record what was done with a file in the journal and the cache."""
+    journal.record(file_path, status)
+    if cache is not None:
+        cache.set_status(file_path, analysis_options, status)
+
+
+def record_saved_files(
+    results: list[WriteResult],
+    analysis_options: AnalysisOptions,
+    cache: AnalysisCache | None,
+    journal: SessionJournal,
+) -> None:
+    """Report finished saves and record the files that were saved."""
+    for result in results:
+        if result.error is None:
+            print(Fore.GREEN + f"Metadata saved for file: {result.song_name}" + Fore.RESET)
+            record_status(result.file_path, STATUS_SAVED, analysis_options, cache, journal)
+        else:
+            print(Fore.RED + f"Failed to save metadata for file: {result.song_name}: {result.error}" + Fore.RESET)
+
+
+def warn_about_slow_rules(custom_rules: tuple[TagRule, ...]) -> None:
+    """Warn about patterns of custom rules that backtrack catastrophically."""
+    for audit in audit_rules(custom_rules, check_long_lines=False):
+        if audit.slow_match is not None:
+            seconds, length = audit.slow_match
+            print(
+                Fore.YELLOW
+                + f"Warning: a pattern for '{audit.tag}' took {seconds * 1000:.0f} ms to match a line of {length}"
+                + f" characters and could make parsing very slow: {audit.pattern}"
+                + Fore.RESET
+            )
+
+
+def run_session(args: Namespace, config_path: Path, cache_path: Path, state_dir: Path) -> int:
+    """Retag the songs or apply a plan, as set by the arguments.
+
+    :param args: The parsed command line arguments.
+    :param config_path: The configuration file.
+    :param cache_path: The database of the cache.
+    :param state_dir: Directory for journals.
+
+    :return: Exit code of the app.
+    """
+    try:
+        with open(config_path, "rb") as f:
+            config = tomllib.load(f)
+    except FileNotFoundError:
+        config = {}
+    try:
+        policy = ResolutionPolicy.from_config(config, args.policy) if args.batch or args.plan else None
+        custom_rules = rules_from_config(config)
+    except InvalidConfigException as e:
+        print(Fore.RED + f"Invalid configuration in {config_path}: {e}")
+        return 1
+    warn_about_slow_rules(custom_rules)
+    comment_padding = config.get("comment_padding", DEFAULT_COMMENT_PADDING)
+    if not isinstance(comment_padding, int) or isinstance(comment_padding, bool) or comment_padding < 0:
+        print(Fore.RED + f"Invalid configuration in {config_path}: comment_padding must be a non-negative integer")
+        return 1
+    stop_tags = config.get("description_stop_tags", [])
+    if not isinstance(stop_tags, list) or not all(isinstance(tag, str) and tag for tag in stop_tags):
+        print(Fore.RED + f"Invalid configuration in {config_path}: description_stop_tags must be a list of tag names")
+        return 1
+
+    finished_saves, undone_saves = SaveJournal.recover(state_dir)
+    if finished_saves or undone_saves:
+        print(Fore.BLUE + f"Recovered interrupted saves: {finished_saves} finished, {undone_saves} undone" + Fore.RESET)
+
+    if args.apply:
+        return apply_plan(Path(args.apply).resolve(), args, comment_padding, state_dir)
+
+    music_dir = Path(args.dir).resolve()
+    if not music_dir.is_dir():
+        print(Fore.RED + f"{args.dir} is not a directory!")
+        return 1
+
+    # The files are analysed as they are found, so only the first one is
+    # looked for before starting
+    found_files = scan_music_files(
+        music_dir,
+        recursive=args.recursive,
+        include=args.include or DEFAULT_INCLUDE,
+        exclude=args.exclude or [],
+    )
+    first_file = next(found_files, None)
+    if first_file is None:
+        print(Fore.YELLOW + f"There appears to be no .opus files in the provided directory {args.dir}")
+        return 0
+    all_files: Iterable[Path] = itertools.chain([first_file], found_files)
+
+    analysis_options = AnalysisOptions(
+        manual_album=args.manual_album,
+        tags_to_delete=config.get("tags_to_delete", []),
+        strings_to_delete_tags_based_on=config.get("strings_to_delete_tags_based_on", []),
+        custom_rules=custom_rules,
+        memo_size=args.memo_size,
+        stop_tags=tuple(tag.lower() for tag in stop_tags),
+    )
+
+    cache = None if args.no_cache else AnalysisCache(cache_path, verify_content=args.cache_verify)
+    if args.plan:
+        try:
+            return plan_files(all_files, args, analysis_options, policy, cache, Path(args.plan))
+        finally:
+            if cache is not None:
+                cache.close()
+
+    journal = SessionJournal(SessionJournal.path_for(state_dir, music_dir), resume=args.resume)
+    if args.resume:
+        print(Fore.BLUE + f"Resuming previous session: {len(journal.completed)} songs already handled" + Fore.RESET)
+        all_files = (file_path for file_path in all_files if not journal.is_completed(file_path))
+
+    save_journal = SaveJournal(SaveJournal.path_for(state_dir)) if args.atomic else None
+    write_queue = WriteQueue(args.sync, args.writers, comment_padding, save_journal)
+    try:
+        exit_code = retag_files(all_files, args, analysis_options, policy, cache, journal, write_queue)
+    finally:
+        record_saved_files(write_queue.close(), analysis_options, cache, journal)
+        if save_journal is not None:
+            save_journal.close()
+        journal.close()
+        if cache is not None:
+            cache.close()
+
+    return report_saves(write_queue, exit_code)
+
+
+def print_read_failure(song_name: str, error: Exception) -> None:
+    """Report a song that couldn't be read or parsed, and is skipped."""
+    print(Fore.RED + f"Failed to read metadata for file: {song_name}: {error}. Skipping song." + Fore.RESET)
+
+
+def report_saves(write_queue: WriteQueue, exit_code: int) -> int:
+    """Print how many songs were saved and which couldn't be saved.
+
+    :param write_queue: The closed queue the songs were saved with.
+    :param exit_code: Exit code of the app if all songs were saved.
+
+    :return: Exit code of the app.
+    """
+    if write_queue.saved:
+        print(Fore.GREEN + f"Saved metadata for {write_queue.saved} songs" + Fore.RESET)
+    if write_queue.failed:
+        print(Fore.RED + f"Failed to save metadata for {len(write_queue.failed)} songs:" + Fore.RESET)
+        for song_name in write_queue.failed:
+            print(Fore.RED + f"  {song_name}" + Fore.RESET)
+        return 1
+    return exit_code
+
+
+def plan_files(
+    all_files: Iterable[Path],
+    args: Namespace,
+    analysis_options: AnalysisOptions,
+    policy: ResolutionPolicy | None,
+    cache: AnalysisCache | None,
+    plan_path: Path,
+) -> int:
+    """Write the changes batch mode would make to a plan, without saving.
+
+    :param all_files: The music files to go through, which are taken
+        one at a time as they are analysed.
+    :param args: The parsed command line arguments.
+    :param analysis_options: Settings for analysing the files.
+    :param policy: Policy for resolving conflicts.
+    :param cache: Cache of analyses from earlier runs, if used.
+    :param plan_path: The file to write the plan to.
+
+    :return: Exit code of the app.
+    """
+    exit_code = 0
+    planned_files = 0
+    song_count = 0
+    with open(plan_path, "w", encoding="utf-8") as f:
+        analyses = pipeline.analyze(
+            all_files,
+            analysis_options,
+            policy,
+            jobs=args.jobs,
+            prefetch=args.prefetch,
+            cache=cache,
+            profiler=PROFILER,
+        )
+        for song_count, analysis in enumerate(analyses, start=1):
+            file_name = Utils().file_path_to_song_data(analysis.file_path)
+            print("\n" + Fore.BLUE + f"Song {song_count}" + Fore.RESET)
+            print(Fore.BLUE + f"----- Song: {file_name} -----" + Fore.RESET)
+            if analysis.error is not None:
+                print_read_failure(file_name, analysis.error)
+                exit_code = 1
+                continue
+            try:
+                record = plan_record(analysis, analysis.resolved)
+            except OSError as e:
+                print_read_failure(file_name, e)
+                exit_code = 1
+                continue
+            for message in analysis.messages:
+                print(message)
+            if record["changes"]["set"] or record["changes"]["delete"]:
+                planned_files += 1
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(Fore.GREEN + f"Planned changes to {planned_files} of {song_count} songs in {plan_path}" + Fore.RESET)
+    return exit_code
+
+
+def apply_plan(plan_path: Path, args: Namespace, comment_padding: int, state_dir: Path) -> int:
+    """Save the changes in a plan to the songs that are unchanged since.
+
+    :param plan_path: The plan file.
+    :param args: The parsed command line arguments.
+    :param comment_padding: Number of bytes to reserve in the comment
+        header when it has to grow.
+    :param state_dir: Directory for journals.
+
+    :return: Exit code of the app.
+    """
+    if not plan_path.is_file():
+        print(Fore.RED + f"{args.apply} is not a file!")
+        return 1
+
+    exit_code = 0
+    analysis_options = AnalysisOptions()
+    journal = SessionJournal(SessionJournal.path_for(state_dir, plan_path), resume=args.resume)
+    save_journal = SaveJournal(SaveJournal.path_for(state_dir)) if args.atomic else None
+    write_queue = WriteQueue(args.sync, args.writers, comment_padding, save_journal)
+    try:
+        for change in read_plan(plan_path):
+            if change.is_empty() or journal.is_completed(change.file_path):
+                continue
+            file_name = Utils().file_path_to_song_data(change.file_path)
+            if not change.is_current():
+                print(Fore.YELLOW + f"Changed since the plan was made. Skipping song: {file_name}" + Fore.RESET)
+                continue
+            write_queue.stage(change.file_path, file_name, change.resolved)
+            record_saved_files(write_queue.completed(), analysis_options, None, journal)
+    except InvalidPlanException as e:
+        print(Fore.RED + f"{e}. Not applying the rest of the plan." + Fore.RESET)
+        exit_code = 1
+    finally:
+        record_saved_files(write_queue.close(), analysis_options, None, journal)
+        if save_journal is not None:
+            save_journal.close()
+        journal.close()
+
+    return report_saves(write_queue, exit_code)
+
+
+def retag_files(
+    all_files: Iterable[Path],
+    args: Namespace,
+    analysis_options: AnalysisOptions,
+    policy: ResolutionPolicy | None,
+    cache: AnalysisCache | None,
+    journal: SessionJournal,
+    write_queue: WriteQueue,
+) -> int:
+    """Improve the tags of each file, with or without user interaction.
+
+    :param all_files: The music files to go through, which are taken
+        one at a time as they are analysed.
+    :param args: The parsed command line arguments.
+    :param analysis_options: Settings for analysing the files.
+    :param policy: Policy for resolving conflicts in batch mode, or None
+        to ask the user.
+    :param cache: Cache of analyses from earlier runs, if used.
+    :param journal: Journal where decisions about files are recorded.
+    :param write_queue: Queue where the tags to save are staged.
+
+    :return: Exit code of the app.
+    """
+    analyses = pipeline.analyze(
+        all_files,
+        analysis_options,
+        policy,
+        propose_tags=policy is not None,
+        jobs=args.jobs,
+        prefetch=args.prefetch,
+        cache=cache,
+        profiler=PROFILER,
+    )
+    exit_code = 0
+    for idx, first_analysis in enumerate(analyses):
+        record_saved_files(write_queue.completed(), analysis_options, cache, journal)
+        file_path = first_analysis.file_path
+        analysis: FileAnalysis | None = first_analysis
+        redo = True
+        file_name = Utils().file_path_to_song_data(file_path)
+        if first_analysis.status is not None:
+            print("\n" + Fore.BLUE + f"Song {idx + 1}" + Fore.RESET)
+            print(Fore.BLUE + f"----- Song: {file_name} -----" + Fore.RESET)
+            print(Fore.YELLOW + f"Unchanged since it was {first_analysis.status}. Skipping song." + Fore.RESET)
+            journal.record(file_path, first_analysis.status)
+            continue
+        while redo:
+            redo = False
+            # Print info about file and progress
+            print("\n" + Fore.BLUE + f"Song {idx + 1}" + Fore.RESET)
+            print(Fore.BLUE + f"----- Song: {file_name} -----" + Fore.RESET)
+
+            # 1-4.5. Read and parse the data, unless it has already been
+            # done. The tags are modified from here on, so when starting
+            # over, the file is analysed again.
+            if analysis is None:
+                analysis = analyze_file(file_path, analysis_options)
+                PROFILER.add_all(analysis.timings)
+                PROFILER.add_memo_counts(analysis.memo_counts)
+            if analysis.error is not None:
+                print_read_failure(file_name, analysis.error)
+                exit_code = 1
+                break
+            tags = analysis.tags
+            description_lines = analysis.description_lines
+            new_data_exists = analysis.new_data_exists
+            proposed = analysis.resolved
+            messages = analysis.messages
+            analysis = None
+
+            if not new_data_exists and not args.manual_album:
+                print(Fore.YELLOW + "No new data exists. Skipping song." + Fore.RESET)
+                record_status(file_path, STATUS_SKIPPED, analysis_options, cache, journal)
+                break
+
+            if proposed is None:
+                # 4. For each field, if there are conflicts, ask user input
+                try:
+                    with PROFILER.stage(STAGE_RESOLVE):
+                        tags.resolve_metadata(policy)
+                except UserExitException as e:
+                    print(f"RetagOpus exited successfully: {e}")
+                    return 0
+            else:
+                # 4. In batch mode, the conflicts were resolved with the
+                # policy when the song was analysed
+                for message in messages:
+                    print(message)
+
+            if policy is not None:
+                write_queue.stage(file_path, file_name, tags.resolved)
+                break
+
+            # 5. Show user final result and ask if it should be saved or
+            # retried, or song skipped
+            reshow_choices = True
+
+            while reshow_choices:
+                print("Final result:")
+                tags.print_resolved()
+                reshow_choices = False
+                options = [
+                    "[p] pass",
+                    "[s] save",
+                    "[r] reset",
+                    "[m] modify tag",
+                    "[d] delete item in tag",
+                    "[y] youtube description",
+                    "[a] all metadata",
+                    "[e] resolved metadata",
+                    "[q] quit",
+                ]
+                terminal_menu = TerminalMenu(options, title="What do you want to do?")
+                with PROFILER.stage(STAGE_MENU):
+                    choice = terminal_menu.show()
+                print("-" * 40)
+
+                action = "[q] quit"
+                if choice is not None and not isinstance(choice, tuple):
+                    action = options[choice]
+
+                match action:
+                    case "[q] quit":
+                        print("RetagOpus exited successfully: Skipping this and all later songs")
+                        return 0
+                    case "[s] save":
+                        write_queue.stage(file_path, file_name, tags.resolved)
+                    case "[r] reset":
+                        print(f"Trying to improve metadata again for file: {file_name}")
+                        redo = True
+                    case "[m] modify tag":
+                        tags.modify_resolved_field()
+                        print(Fore.BLUE + "Current metadata to save:")
+                        tags.print_resolved()
+                        reshow_choices = True
+                    case "[d] delete item in tag":
+                        tags.delete_tag_item()
+                        reshow_choices = True
+                    case "[p] pass":
+                        print(Fore.YELLOW + f"Pass. Skipping song: {file_name}")
+                        record_status(file_path, STATUS_PASSED, analysis_options, cache, journal)
+                    case "[y] youtube description":
+                        if description_lines:
+                            print(Fore.BLUE + "Original YouTube description:")
+                            print(colors.yt_col + "\n".join(description_lines))
+                        else:
+                            print(Fore.RED + "No YouTube description tag for this song.")
+                        reshow_choices = True
+                    case "[a] all metadata":
+                        print(Fore.BLUE + "All old and new metadata suggested for this file:")
+                        tags.print_all()
+                        reshow_choices = True
+                    case "[e] resolved metadata":
+                        print(Fore.BLUE + "Current metadata to save:")
+                        tags.print_resolved()
+                        reshow_choices = True
+                    case _:
+                        print(Fore.RED + "Something went wrong, starting over")
+                        redo = True
+
+    return exit_code
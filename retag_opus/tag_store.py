@@ -0,0 +1,108 @@
+"""Module for storing the tags of a song compactly.
+
+The tags of a song are kept for several sources at once, and in batch
+and plan mode for many songs at once. A TagStore keeps the values of
+each tag in a tuple instead of a list, interns the tag names and short
+values, which are the same for many songs, and shares its entries with the store it was
+copied from until one of them is changed.
+"""
+import sys
+from typing import Any, Final, Iterable, Iterator, Mapping, MutableMapping
+
+INTERNED_VALUE_LENGTH: Final[int] = 64
+"""Values up to this length are interned, e.g. names, dates and genres."""
+
+
+def _compact(values: Iterable[str]) -> tuple[str, ...]:
+    """Store values in a tuple, interning the short ones."""
+    return tuple(sys.intern(value) if len(value) <= INTERNED_VALUE_LENGTH else value for value in values)
+
+
+class TagStore(MutableMapping[str, list[str]]):
+    """Mapping of tag names to lists of values, stored compactly.
+
+    Values are stored as tuples and handed out as new lists, so changing
+    a list that was read from the store doesn't change the store. Assign
+    the changed list to the tag to store it.
+    """
+
+    __slots__ = ("_data", "_shared")
+
+    def __init__(self, tags: Mapping[str, Iterable[str]] | None = None) -> None:
+        """Create a store with the given tags.
+
+        :param tags: Tag names and their values.
+        """
+        self._data: dict[str, tuple[str, ...]] = {}
+        self._shared = False
+        if tags is not None:
+            for tag, values in tags.items():
+                self._data[sys.intern(tag)] = _compact(values)
+
+    def _own(self) -> None:
+        """Stop sharing the entries before they are changed."""
+        if self._shared:
+            self._data = dict(self._data)
+            self._shared = False
+
+    def __getitem__(self, tag: str) -> list[str]:
+        """Get a copy of the values of a tag."""
+        return list(self._data[tag])
+
+    def __setitem__(self, tag: str, values: Iterable[str]) -> None:
+        """Set the values of a tag."""
+        self._own()
+        self._data[sys.intern(tag)] = _compact(values)
+
+    def __delitem__(self, tag: str) -> None:
+        """Remove a tag."""
+        self._own()
+        del self._data[tag]
+
+    def __contains__(self, tag: object) -> bool:
+        """Check whether the store has a tag."""
+        return tag in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the tag names."""
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        """Get the number of tags."""
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        """Show the tags like a dictionary."""
+        return f"TagStore({self.as_dict()!r})"
+
+    def copy(self) -> "TagStore":
+        """Copy the store, sharing the entries until either is changed."""
+        store = TagStore()
+        store._data = self._data
+        store._shared = self._shared = True
+        return store
+
+    def as_dict(self) -> dict[str, list[str]]:
+        """Get the tags as a dictionary, e.g. for serialising as JSON."""
+        return {tag: list(values) for tag, values in self._data.items()}
+
+
+class TagSource:
+    """Attribute that holds the tags of a song from one source.
+
+    Any mapping assigned to the attribute is stored as a TagStore. A
+    TagStore is copied, so that two sources never change each other.
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Store the tags in the slot named after the attribute."""
+        self.slot = f"_{name}"
+
+    def __get__(self, instance: Any, owner: type | None = None) -> TagStore:
+        """Get the tags of the source."""
+        store: TagStore = getattr(instance, self.slot)
+        return store
+
+    def __set__(self, instance: Any, tags: Mapping[str, Iterable[str]]) -> None:
+        """Replace the tags of the source."""
+        setattr(instance, self.slot, tags.copy() if isinstance(tags, TagStore) else TagStore(tags))
@@ -0,0 +1,105 @@
+"""Module for the tables of tags that are parsed and printed.
+
+The tables are built from the constants module once, when this module is
+imported, and shared by every song. There is one table for the normal
+mode and one for when the album is set manually, in which case the
+album patterns are used for the disc subtitle instead. Tables that also
+have the custom rules from the config file are built when first needed.
+"""
+from types import MappingProxyType
+from typing import Callable, Final, Mapping
+
+from retag_opus import constants
+from retag_opus.constants import ParsingReference
+from retag_opus.custom_rules import TagRule
+
+TagPattern = tuple[str, str, tuple[str, ...]]
+Section = dict[str, tuple[str, list[tuple[str, tuple[str, ...]]]]]
+
+
+def _sections(tags: Mapping[str, ParsingReference]) -> Section:
+    """Get the printed name and the patterns with keywords of each tag."""
+    return {
+        tag_id: (tag_data["print"], [(pattern, tuple(tag_data["keywords"])) for pattern in tag_data["pattern"]])
+        for tag_id, tag_data in tags.items()
+    }
+
+
+class TagTable:
+    """Read-only table of the tags that are parsed and how to print them.
+
+    The tables are shared between songs, so they can't be changed: the
+    names are read-only mappings and the patterns are tuples.
+    """
+
+    def __init__(self, manual_album_set: bool = False, custom_rules: tuple[TagRule, ...] = ()) -> None:
+        """Build the table from the tags in the constants module.
+
+        :param manual_album_set: Whether the album is set manually, in
+            which case the album patterns are used for the discsubtitle
+            tag, which is printed and matched after the other base tags.
+        :param custom_rules: Rules from the config file. Their patterns
+            are matched after the built-in patterns of the same tag, and
+            new tags come after the built-in tags.
+        """
+        base = _sections(constants.all_tags)
+        performers = _sections(constants.performer_tags)
+        for rule in custom_rules:
+            section = performers if rule.is_performer else base
+            name, rule_patterns = section.get(rule.tag, (rule.name or rule.tag, []))
+            section[rule.tag] = (
+                rule.name or name,
+                rule_patterns + [(pattern, rule.keywords) for pattern in rule.patterns],
+            )
+        if manual_album_set:
+            album_name, album_patterns = base["album"]
+            base["album"] = (album_name, [])
+            name, discsubtitle_patterns = base.pop("discsubtitle", ("Disc subtitle", []))
+            base["discsubtitle"] = (name, album_patterns + discsubtitle_patterns)
+
+        self.manual_album_set = manual_album_set
+        self.custom_rules = custom_rules
+        self.base_names: Mapping[str, str] = MappingProxyType({tag_id: name for tag_id, (name, _) in base.items()})
+        self.performer_names: Mapping[str, str] = MappingProxyType(
+            {tag_id: name for tag_id, (name, _) in performers.items()}
+        )
+        self.patterns: tuple[TagPattern, ...] = tuple(
+            (tag_id, pattern, keywords)
+            for section in (base, performers)
+            for tag_id, (_, tag_patterns) in section.items()
+            for pattern, keywords in tag_patterns
+        )
+
+    def is_known(self, tag_id: str) -> bool:
+        """Check whether a tag is one of the base or performer tags."""
+        return tag_id in self.base_names or tag_id in self.performer_names
+
+    def __reduce__(self) -> tuple[Callable[[bool, tuple[TagRule, ...]], "TagTable"], tuple[bool, tuple[TagRule, ...]]]:
+        """Pickle the table as a reference to the shared table.
+
+        Songs analysed in worker processes are pickled with their
+        table, which is then the shared one on both sides.
+        """
+        return get_table, (self.manual_album_set, self.custom_rules)
+
+
+STANDARD_TABLE: Final[TagTable] = TagTable()
+MANUAL_ALBUM_TABLE: Final[TagTable] = TagTable(manual_album_set=True)
+
+
+_custom_tables: dict[tuple[bool, tuple[TagRule, ...]], TagTable] = {}
+
+
+def get_table(manual_album_set: bool = False, custom_rules: tuple[TagRule, ...] = ()) -> TagTable:
+    """Get the shared table for the given parsing mode and custom rules.
+
+    Tables with custom rules are built the first time they are needed in
+    each process, and then kept.
+    """
+    if not custom_rules:
+        return MANUAL_ALBUM_TABLE if manual_album_set else STANDARD_TABLE
+    key = (manual_album_set, custom_rules)
+    table = _custom_tables.get(key)
+    if table is None:
+        table = _custom_tables[key] = TagTable(manual_album_set, custom_rules)
+    return table
@@ -3,10 +3,9 @@
 This module is for parsing text in the existing metadata keys, rather
 that the YouTube description.
 """
-import re
-from typing import Dict, Final, List
+from typing import Dict, Final, Iterable, List, Mapping
 
-from retag_opus import constants
+from retag_opus.title_analysis import TitleAnalysis
 from retag_opus.utils import Utils
 
 INTERPUNCT: Final[str] = "\u00b7"
@@ -21,10 +20,45 @@ class TagsParser:
     delimeters.
     """
 
-    def __init__(self, tags: Dict[str, List[str]]):
-        """Set attributes of the TagsParser."""
+    def __init__(self, tags: Mapping[str, List[str]], title_analyses: Dict[str, TitleAnalysis] | None = None):
+        """Set attributes of the TagsParser.
+
+        :param tags: The tags to parse.
+        :param title_analyses: Analyses of titles by title, shared by
+            parsers of many songs so that each title is analysed once.
+        """
         self.tags: Dict[str, List[str]] = {}
         self.original_tags = tags
+        self.title_analyses: Dict[str, TitleAnalysis] = {} if title_analyses is None else title_analyses
+
+    @staticmethod
+    def parse_many(
+        tag_sets: Iterable[Mapping[str, List[str]]], split_original: bool = False
+    ) -> List[Dict[str, List[str]]]:
+        """Parse many sets of tags, analysing each distinct title once.
+
+        :param tag_sets: The sets of tags to parse, e.g. one per song.
+        :param split_original: Whether to also split the artist and genre
+            tags, as is done for the original tags of a song.
+
+        :return: The parsed tags of each set, in the same order.
+        """
+        title_analyses: Dict[str, TitleAnalysis] = {}
+        parsed = []
+        for tags in tag_sets:
+            tags_parser = TagsParser(tags, title_analyses)
+            tags_parser.parse_tags()
+            if split_original:
+                tags_parser.split_select_original_tags()
+            parsed.append(tags_parser.tags)
+        return parsed
+
+    def analyse_title(self, title: str) -> TitleAnalysis:
+        """Get the analysis of a title, analysing it if it's new."""
+        title_analysis = self.title_analyses.get(title)
+        if title_analysis is None:
+            title_analysis = self.title_analyses[title] = TitleAnalysis(title)
+        return title_analysis
 
     def parse_tags(self) -> None:
         """Look through old tags for metadata.
@@ -46,50 +80,12 @@ class TagsParser:
         new_genre = []
 
         for title in old_title:
-            featuring_regex = constants.tag_parse_patterns["featuring"]
-            pattern_match = re.match(featuring_regex, title)
-            if pattern_match:
-                new_artist += Utils().split_tag(pattern_match.groups()[1].strip())
-
-            live_regex = constants.tag_parse_patterns["live"]
-            live_match = re.match(live_regex, title)
-            if live_match:
-                new_version.append(live_match.groups()[1].strip())
-
-            albumversion_regex = constants.tag_parse_patterns["albumversion"]
-            albumversion_match = re.match(albumversion_regex, title)
-            if albumversion_match:
-                new_version.append(albumversion_match.groups()[1].strip())
-
-            instrumental_regex = constants.tag_parse_patterns["instrumental"]
-            instrumental_match = re.match(instrumental_regex, title)
-            if instrumental_match:
-                new_genre.append("Instrumental")
-
-            instrumental2_regex = constants.tag_parse_patterns["instrumental2"]
-            instrumental2_match = re.match(instrumental2_regex, title)
-            if instrumental2_match:
-                new_genre.append("Instrumental")
-
-            remix_regex = constants.tag_parse_patterns["remix"]
-            remix_match = re.match(remix_regex, title)
-            if remix_match:
-                new_version.append(remix_match.groups()[1].strip())
-
-            remix2_regex = constants.tag_parse_patterns["remix2"]
-            remix2_match = re.match(remix2_regex, title)
-            if remix2_match:
-                new_version.append(remix2_match.groups()[1].strip())
-
-            remaster_regex = constants.tag_parse_patterns["remaster"]
-            remaster_match = re.match(remaster_regex, title)
-            if remaster_match:
-                new_version.append(remaster_match.groups()[1].strip())
-
-            remaster2_regex = constants.tag_parse_patterns["remaster2"]
-            remaster2_match = re.match(remaster2_regex, title)
-            if remaster2_match:
-                new_version.append(remaster2_match.groups()[1].strip())
+            title_analysis = self.analyse_title(title)
+            featured_artists = title_analysis.featured_artists
+            if featured_artists is not None:
+                new_artist += Utils().split_tag(featured_artists)
+            new_version += title_analysis.versions
+            new_genre += ["Instrumental"] * title_analysis.instrumental_count
 
         if set(new_version) != set(old_version) and len(new_version) > 0:
             self.tags["version"] = Utils().remove_duplicates(old_version + new_version)
@@ -101,7 +97,7 @@ class TagsParser:
             self.tags["genre"] = Utils().remove_duplicates(old_genre + new_genre)
 
         if len(old_title) > 0:
-            pruned_title = Utils().prune_title(old_title[0])
+            pruned_title = self.analyse_title(old_title[0]).pruned
             if old_title[0] != pruned_title:
                 self.tags["title"] = [pruned_title]
 
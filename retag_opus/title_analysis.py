@@ -0,0 +1,129 @@
+"""Module for analysing song titles in a single pass.
+
+A title is matched against the title patterns in the constants module
+once, and the matches are used both for finding versions, featured
+artists and genres in the title and for pruning them from it. Patterns
+whose keywords aren't in the title are skipped without calling into the
+regex engine, which for most titles means all of them.
+
+The title patterns backtrack badly on some long titles, so titles longer
+than LINEAR_MATCH_LENGTH are matched with LinearPattern instead, which
+gives the same matches in time linear in the length of the title.
+"""
+import re
+from typing import Final
+
+from retag_opus import constants
+from retag_opus.linear_regex import LINEAR_MATCH_LENGTH, LinearMatch, LinearPattern, UnsupportedPattern
+
+TitleMatch = re.Match[str] | LinearMatch
+
+TITLE_PATTERNS: Final[tuple[tuple[str, re.Pattern[str], tuple[str, ...]], ...]] = tuple(
+    (name, re.compile(pattern), constants.tag_parse_keywords[name])
+    for name, pattern in constants.tag_parse_patterns.items()
+)
+"""Name, compiled regex and keywords of the title patterns, in the order
+they are pruned in."""
+
+_linear_patterns: dict[str, LinearPattern | None] = {}
+
+VERSION_PATTERNS: Final[tuple[str, ...]] = ("live", "albumversion", "remix", "remix2", "remaster", "remaster2")
+"""Patterns that find the version of a song, in the order it's listed."""
+
+INSTRUMENTAL_PATTERNS: Final[tuple[str, ...]] = ("instrumental", "instrumental2")
+
+CASELESS_LOOKALIKES: Final[frozenset[str]] = frozenset("İıſK")
+"""Letters that match an ASCII letter of a keyword when case is ignored,
+but aren't lowercased to it, so titles with them are always matched."""
+
+PRUNED_GROUPS: Final[str] = r"\1 \3"
+
+
+def _linear(name: str, pattern: re.Pattern[str]) -> LinearPattern | None:
+    """Get a title pattern compiled for linear-time matching, if it can be.
+
+    The patterns are compiled the first time a long title needs them.
+    """
+    if name not in _linear_patterns:
+        try:
+            _linear_patterns[name] = LinearPattern(pattern.pattern)
+        except UnsupportedPattern:
+            _linear_patterns[name] = None
+    return _linear_patterns[name]
+
+
+def _match(name: str, pattern: re.Pattern[str], title: str) -> TitleMatch | None:
+    """Match a title pattern, in linear time if the title is long."""
+    linear_pattern = _linear(name, pattern) if len(title) > LINEAR_MATCH_LENGTH else None
+    return (linear_pattern or pattern).match(title)
+
+
+def _has_keyword(lowercase_title: str, keywords: tuple[str, ...]) -> bool:
+    """Check whether any of the keywords is in the lowercased title."""
+    return any(keyword in lowercase_title for keyword in keywords)
+
+
+class TitleAnalysis:
+    """What the title of a song says about the song.
+
+    The title patterns are tried once each against the title. Pruning
+    applies the patterns one after the other, so only the first pattern
+    that changes the title can reuse its match. The later patterns are
+    tried again on the changed title, if it has their keywords.
+    """
+
+    def __init__(self, title: str) -> None:
+        """Analyse a title.
+
+        :param title: The title of the song.
+        """
+        self.title = title
+        lowercase_title = title.lower()
+        match_all = not CASELESS_LOOKALIKES.isdisjoint(title)
+        self.matches: dict[str, TitleMatch | None] = {
+            name: _match(name, pattern, title) if match_all or _has_keyword(lowercase_title, keywords) else None
+            for name, pattern, keywords in TITLE_PATTERNS
+        }
+        self.pruned = self._prune()
+
+    @property
+    def featured_artists(self) -> str | None:
+        """Get the featured artists in the title, as a single string."""
+        featuring_match = self.matches["featuring"]
+        return featuring_match.groups()[1].strip() if featuring_match else None
+
+    @property
+    def versions(self) -> list[str]:
+        """Get the versions of the song mentioned in the title."""
+        versions = []
+        for name in VERSION_PATTERNS:
+            version_match = self.matches[name]
+            if version_match:
+                versions.append(version_match.groups()[1].strip())
+        return versions
+
+    @property
+    def instrumental_count(self) -> int:
+        """Get the number of instrumental patterns the title matches."""
+        return sum(1 for name in INSTRUMENTAL_PATTERNS if self.matches[name])
+
+    def _prune(self) -> str:
+        """Remove what the patterns found from the title.
+
+        This gives the same result as substituting each pattern in turn
+        with re.sub. A pattern that matches a title without line breaks
+        matches all of it, since it ends with a greedy group, so the
+        substitution is the expanded match.
+        """
+        pruned = self.title
+        multiline = "\n" in pruned
+        for name, pattern, keywords in TITLE_PATTERNS:
+            if pruned is self.title and not multiline:
+                title_match = self.matches[name]
+                if title_match:
+                    pruned = title_match.expand(PRUNED_GROUPS)
+                continue
+            if multiline or not CASELESS_LOOKALIKES.isdisjoint(pruned) or _has_keyword(pruned.lower(), keywords):
+                linear_pattern = _linear(name, pattern) if len(pruned) > LINEAR_MATCH_LENGTH else None
+                pruned = (linear_pattern or pattern).sub(PRUNED_GROUPS, pruned)
+        return pruned.strip()
@@ -7,7 +7,13 @@ from typing import List
 from colorama import Fore
 from simple_term_menu import TerminalMenu
 
-from retag_opus import constants
+from retag_opus.memo import Memo
+from retag_opus.title_analysis import TitleAnalysis
+
+_pruned_titles: Memo[str] = Memo("prune_title", lambda title: TitleAnalysis(title).pruned)
+_split_tags: Memo[tuple[str, ...]] = Memo(
+    "split_tag", lambda tag: tuple(t.strip() for t in re.split(", | and | & |; ", tag))
+)
 
 
 class Utils:
@@ -26,17 +32,12 @@ class Utils:
         artist information from the title of a song, and remove leading
         and trailing whitespace.
         """
-        pruned = original_title
-        for pattern in constants.tag_parse_patterns.values():
-            pruned = re.sub(pattern, r"\1 \3", pruned)
-        return pruned.strip()
+        return _pruned_titles(original_title)
 
     @staticmethod
     def split_tag(input: str) -> List[str]:
         """Split the provided tag by pre-defined delimeters."""
-        split_tags = re.split(", | and | & |; ", input)
-        split_pruned_tags = [t.strip() for t in split_tags]
-        return split_pruned_tags
+        return list(_split_tags(input))
 
     @staticmethod
     def file_path_to_song_data(file_path: Path) -> str:
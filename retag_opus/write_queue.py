@@ -0,0 +1,183 @@
+"""Module for saving tags in the background.
+
+Saves are staged in a queue and written by background threads, so that
+the next song can be shown while the previous one is being written. The
+results are collected in the order the saves were staged.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Mapping
+
+from retag_opus.atomic_save import SaveJournal, save_tags_atomically, sync_file
+from retag_opus.constants import SYNC_BATCH, SYNC_FILE
+from retag_opus.music_tags import REMOVED_TAG
+from retag_opus.opus_writer import DEFAULT_COMMENT_PADDING, save_tags
+from retag_opus.profiling import PROFILER, STAGE_SAVE, STAGE_SYNC
+
+Tags = dict[str, list[str]]
+
+PENDING_WRITES_PER_WRITER = 4
+
+
+def save_resolved_tags(
+    file_path: Path,
+    resolved: Tags,
+    comment_padding: int = DEFAULT_COMMENT_PADDING,
+    save_journal: SaveJournal | None = None,
+) -> None:
+    """Write the resolved tags to the music file.
+
+    :param file_path: The music file.
+    :param resolved: The tags to write. Tags marked as removed are
+        deleted from the file.
+    :param comment_padding: Number of bytes to reserve for later changes
+        if the tags no longer fit in the comment header.
+    :param save_journal: Journal for saving atomically through a copy of
+        the file. Without it, the file is changed directly.
+    """
+    new_tags = {tag: data for tag, data in resolved.items() if data != REMOVED_TAG}
+    deleted_tags = [tag for tag, data in resolved.items() if data == REMOVED_TAG]
+    if save_journal is not None:
+        save_tags_atomically(file_path, new_tags, deleted_tags, comment_padding, save_journal)
+    else:
+        save_tags(file_path, new_tags, deleted_tags, comment_padding)
+
+
+class WriteResult:
+    """The outcome of saving the tags of one song."""
+
+    def __init__(self, file_path: Path, song_name: str, error: Exception | None = None) -> None:
+        """Store the outcome.
+
+        :param file_path: The music file.
+        :param song_name: Name of the song to show the user.
+        :param error: What went wrong, if the tags couldn't be saved.
+        """
+        self.file_path = file_path
+        self.song_name = song_name
+        self.error = error
+
+
+class WriteQueue:
+    """Queue of tags to save, written by background threads."""
+
+    def __init__(
+        self,
+        sync: str = SYNC_BATCH,
+        writers: int = 1,
+        comment_padding: int = DEFAULT_COMMENT_PADDING,
+        save_journal: SaveJournal | None = None,
+    ) -> None:
+        """Start the writer threads.
+
+        :param sync: When to make sure that saved files are on the disk.
+            With "file" each file is synced after it is written, with
+            "batch" the written files are synced together when the queue
+            is flushed, and with "none" it is left to the system.
+        :param writers: Number of files to write at the same time.
+        :param comment_padding: Number of bytes to reserve for later
+            changes when the tags no longer fit in the comment header.
+        :param save_journal: Journal for saving atomically. Files saved
+            that way are always synced before they replace the original.
+        """
+        self.sync = sync
+        self.comment_padding = comment_padding
+        self.save_journal = save_journal
+        self.saved = 0
+        self.failed: list[str] = []
+        self._executor = ThreadPoolExecutor(max_workers=writers, thread_name_prefix="retag-writer")
+        self._slots = threading.BoundedSemaphore(writers * PENDING_WRITES_PER_WRITER)
+        self._pending: deque[Future[WriteResult]] = deque()
+        self._unsynced: list[WriteResult] = []
+
+    def stage(self, file_path: Path, song_name: str, resolved: Mapping[str, list[str]]) -> None:
+        """Add tags to save to the queue.
+
+        If too many saves are pending, this waits until one is done.
+
+        :param file_path: The music file.
+        :param song_name: Name of the song to report failures with.
+        :param resolved: The tags to write.
+        """
+        self._slots.acquire()
+        future = self._executor.submit(self._write, file_path, song_name, dict(resolved))
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append(future)
+
+    def _write(self, file_path: Path, song_name: str, resolved: Tags) -> WriteResult:
+        """Save the tags of one song, catching any error."""
+        result = WriteResult(file_path, song_name)
+        try:
+            with PROFILER.stage(STAGE_SAVE):
+                save_resolved_tags(file_path, resolved, self.comment_padding, self.save_journal)
+            if self.sync == SYNC_FILE:
+                with PROFILER.stage(STAGE_SYNC):
+                    sync_file(file_path)
+        except Exception as e:
+            result.error = e
+        return result
+
+    def _collect(self, result: WriteResult) -> WriteResult:
+        """Count the outcome of a save."""
+        if result.error is None:
+            self.saved += 1
+        else:
+            self.failed.append(result.song_name)
+        return result
+
+    def _take(self, future: Future[WriteResult], results: list[WriteResult]) -> None:
+        """Add the result of a save to results, unless it waits for a sync.
+
+        With batched syncing, files that were written are held back until
+        they are synced, so that they aren't reported as saved before
+        they are on the disk.
+        """
+        result = future.result()
+        if self.sync == SYNC_BATCH and result.error is None:
+            self._unsynced.append(result)
+        else:
+            results.append(self._collect(result))
+
+    def completed(self) -> list[WriteResult]:
+        """Get the results of the saves that are done, without waiting.
+
+        Results are only returned once the saves staged before them are
+        done too, so that they come in the order they were staged. With
+        batched syncing, only failed saves are returned before the queue
+        is flushed.
+        """
+        results: list[WriteResult] = []
+        while self._pending and self._pending[0].done():
+            self._take(self._pending.popleft(), results)
+        return results
+
+    def flush(self) -> list[WriteResult]:
+        """Wait for all staged saves and sync the files if batched.
+
+        :return: The results of the saves that weren't returned yet,
+            including the batched saves once they are synced, or with the
+            error if they couldn't be.
+        """
+        results: list[WriteResult] = []
+        while self._pending:
+            self._take(self._pending.popleft(), results)
+        unsynced, self._unsynced = self._unsynced, []
+        for result in unsynced:
+            try:
+                with PROFILER.stage(STAGE_SYNC):
+                    sync_file(result.file_path)
+            except OSError as e:
+                result.error = e
+            results.append(self._collect(result))
+        return results
+
+    def close(self) -> list[WriteResult]:
+        """Flush the queue and stop the writer threads.
+
+        :return: The results of the saves that weren't returned yet.
+        """
+        results = self.flush()
+        self._executor.shutdown()
+        return results
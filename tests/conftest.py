@@ -0,0 +1,26 @@
+"""Fixtures shared by all tests."""
+import pytest
+
+from retag_opus import app
+from retag_opus.benchmark import write_opus_file
+
+
+@pytest.fixture(autouse=True)
+def temporary_cache_and_state(tmp_path, monkeypatch):
+    """Keep the cache and state of the app out of the home directory."""
+    monkeypatch.setattr(app, "CACHE_PATH", tmp_path / "cache" / "analysis.sqlite3")
+    monkeypatch.setattr(app, "STATE_DIR", tmp_path / "state")
+
+
+@pytest.fixture
+def make_opus_file(tmp_path):
+    """Get a function that writes a minimal Ogg Opus file with tags.
+
+    The audio is a number of pages of silent packets, so that the file
+    can also be read and saved by mutagen.
+    """
+
+    def write(tags, name="song.opus", audio_pages=3, padding=0):
+        return write_opus_file(tmp_path / name, tags, audio_pages, padding)
+
+    return write
@@ -0,0 +1,89 @@
+"""Tests for analysis.py."""
+import threading
+from pathlib import Path
+
+from mutagen import oggopus
+
+from retag_opus.analysis import AnalysisOptions, analyze_file, analyze_files
+
+description = [
+    "Provided to YouTube by Rich Men's Group Digital Ltd."
+    "\n\nProper Goodbyes (feat. Ben Ivor) · The Global · Ben Ivor"
+    "\n\nProper Goodbyes (feat. Ben Ivor)"
+    "\n\n℗ 2022 The Global under exclusive license to 5BE Ltd"
+    "\n\nReleased on: 2029-08-22"
+]
+
+
+def fake_init(self, file_path):
+    """Remember the path instead of reading the file."""
+    self.fake_path = Path(file_path)
+
+
+def fake_items(self):
+    """Return tags based on the name of the file."""
+    return [("title", [self.fake_path.stem]), ("artist", ["artist 1"]), ("synopsis", description)]
+
+
+def test_analyze_file(monkeypatch):
+    """Test that all sources are parsed and pruned."""
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", fake_init)
+    monkeypatch.setattr(oggopus.OggOpus, "items", fake_items)
+    options = AnalysisOptions(tags_to_delete=["title"])
+
+    analysis = analyze_file(Path("/music/Song (Live).opus"), options)
+
+    assert analysis.file_path == Path("/music/Song (Live).opus")
+    assert analysis.description_lines == description
+    assert analysis.new_data_exists
+    assert analysis.tags.original["title"] == ["Song (Live)"]
+    assert analysis.tags.fromtags["version"] == ["Live"]
+    assert analysis.tags.youtube["organization"] == ["Rich Men's Group Digital Ltd."]
+    assert analysis.tags.fromdesc["title"] == ["Proper Goodbyes"]
+    assert analysis.tags.resolved["title"] == ["[Removed]"]
+
+
+def test_analyze_file_manual_album(monkeypatch):
+    """Test that a manual album is resolved and the parsed one moved."""
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", fake_init)
+    monkeypatch.setattr(oggopus.OggOpus, "items", fake_items)
+
+    analysis = analyze_file(Path("song.opus"), AnalysisOptions(manual_album="manual album"))
+
+    assert analysis.tags.resolved["album"] == ["manual album"]
+    assert analysis.tags.youtube["discsubtitle"] == ["Proper Goodbyes (feat. Ben Ivor)"]
+    assert "album" not in analysis.tags.youtube
+
+
+def test_analyze_files_keeps_order(monkeypatch):
+    """Test that parallel analysis yields the files in the given order."""
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", fake_init)
+    monkeypatch.setattr(oggopus.OggOpus, "items", fake_items)
+    file_paths = [Path(f"song {number}.opus") for number in range(20)]
+
+    serial = [analysis.tags.original["title"] for analysis in analyze_files(file_paths, AnalysisOptions())]
+    parallel = [analysis.tags.original["title"] for analysis in analyze_files(file_paths, AnalysisOptions(), jobs=3)]
+
+    assert serial == [[f"song {number}"] for number in range(20)]
+    assert parallel == serial
+
+
+def test_analyze_files_prefetch(monkeypatch):
+    """Test that files are analysed in a background thread."""
+    analysed: list[str] = []
+
+    def recording_items(self):
+        analysed.append(threading.current_thread().name)
+        return fake_items(self)
+
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", fake_init)
+    monkeypatch.setattr(oggopus.OggOpus, "items", recording_items)
+    file_paths = [Path(f"song {number}.opus") for number in range(5)]
+
+    analyses = analyze_files(file_paths, AnalysisOptions(), prefetch=2)
+    first = next(analyses)
+
+    assert first.tags.original["title"] == ["song 0"]
+    assert [analysis.tags.original["title"] for analysis in analyses] == [[f"song {n}"] for n in range(1, 5)]
+    assert len(analysed) == 5
+    assert all(name.startswith("retag-prefetch") for name in analysed)
@@ -1,5 +1,9 @@
 """Tests for app.py and cli.py."""
+import json
+import os
 import re
+import subprocess
+import sys
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest.mock import Mock
@@ -9,7 +13,11 @@ from colorama import Fore
 from mutagen import oggopus
 from pydub import AudioSegment
 
-from retag_opus import app, utils
+from retag_opus import analysis, app, utils
+
+# The session sets up colorama when it is imported, which has to happen
+# before pytest starts capturing the output of a test
+from retag_opus import session  # noqa: F401  # isort: skip
 
 metadata = [
     ("title", ["Proper Goodbyes (feat. Benny Ivor) (2039 Remaster)"]),
@@ -87,7 +95,7 @@ def test_file_without_metadata(capsys, music_directory, monkeypatch):
     actual_output, _ = capsys.readouterr()
     expected_output = (
         "\n"
-        f"{Fore.BLUE}Song 1 of 1{Fore.RESET}\n"
+        f"{Fore.BLUE}Song 1{Fore.RESET}\n"
         f"{Fore.BLUE}----- Song: test -----{Fore.RESET}\n"
         f"{Fore.YELLOW}No new data exists. Skipping song.{Fore.RESET}\n"
     )
@@ -106,7 +114,7 @@ def test_file_with_no_new_metadata(capsys, music_directory, monkeypatch):
     actual_output, _ = capsys.readouterr()
     expected_output = (
         "\n"
-        f"{Fore.BLUE}Song 1 of 1{Fore.RESET}\n"
+        f"{Fore.BLUE}Song 1{Fore.RESET}\n"
         f"{Fore.BLUE}----- Song: test -----{Fore.RESET}\n"
         f"{Fore.YELLOW}No new data exists. Skipping song.{Fore.RESET}\n"
     )
@@ -153,7 +161,7 @@ def test_file_with_new_metadata(capsys, music_directory, monkeypatch):
 
     actual_output, _ = capsys.readouterr()
     expected_output = (
-        f"\n{Fore.BLUE}Song 1 of 1{Fore.RESET}"
+        f"\n{Fore.BLUE}Song 1{Fore.RESET}"
         f"\n{Fore.BLUE}----- Song: test -----{Fore.RESET}"
         f"\n{Fore.YELLOW}Organization: No value exists in metadata. "
         f'Using parsed data: ["Rich Men\'s Group Digital Ltd."].{Fore.RESET}'
@@ -215,7 +223,7 @@ def test_file_with_new_metadata_from_many_sources(capsys, music_directory, monke
 
     actual_output, _ = capsys.readouterr()
     expected_output = (
-        f"\n{Fore.BLUE}Song 1 of 1{Fore.RESET}"
+        f"\n{Fore.BLUE}Song 1{Fore.RESET}"
         f"\n{Fore.BLUE}----- Song: test -----{Fore.RESET}"
         f"\n{Fore.YELLOW}Organization: No value exists in metadata. "
         f'Using parsed data: ["Rich Men\'s Group Digital Ltd."].{Fore.RESET}'
@@ -565,3 +573,271 @@ def test_deleting_tag(music_directory, monkeypatch, capsys):
     # This is the core of the test:
     assert "album" not in actual_metadata
     assert "albumartist" in actual_metadata
+
+
+def test_batch_mode(capsys, music_directory, monkeypatch):
+    """Batch mode should resolve conflicts and save without menus."""
+    mock_show = Mock()
+    mock_save = Mock()
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", lambda *_: None)
+    monkeypatch.setattr(oggopus.OggOpus, "items", lambda *_: metadata)
+    monkeypatch.setattr(oggopus.OggOpus, "__setitem__", lambda *_: None)
+    monkeypatch.setattr(oggopus.OggOpus, "save", mock_save)
+    monkeypatch.setattr(utils.TerminalMenu, "__init__", lambda *_, **__: None)
+    monkeypatch.setattr(utils.TerminalMenu, "show", mock_show)
+
+    exit_code = app.run(["--directory", music_directory, "--batch", "--policy", "existing"])
+
+    actual_output = capsys.readouterr().out
+    assert exit_code == 0
+    mock_show.assert_not_called()
+    mock_save.assert_called_once()
+    assert "Artist: Mismatch between values in description and metadata. Using existing metadata" in actual_output
+    assert f"{Fore.GREEN}Metadata saved for file: test" in actual_output
+
+
+def test_files_analysed_while_scanning(capsys, make_opus_file, monkeypatch):
+    """Files should be analysed as they are found, not after the scan."""
+    file_paths = [make_opus_file(dict(metadata), name=f"{n}.opus") for n in range(3)]
+    events: list[str] = []
+
+    def scan(*_, **__):
+        for file_path in file_paths:
+            events.append(f"found {file_path.stem}")
+            yield file_path
+
+    analyze_file = analysis.analyze_file
+
+    def record_analysis(file_path, options):
+        events.append(f"analysed {file_path.stem}")
+        return analyze_file(file_path, options)
+
+    monkeypatch.setattr(session, "scan_music_files", scan)
+    monkeypatch.setattr(analysis, "analyze_file", record_analysis)
+
+    exit_code = app.run(
+        ["--directory", str(file_paths[0].parent), "--plan", os.devnull, "--no-cache", "--prefetch", "0"]
+    )
+
+    assert exit_code == 0
+    assert events == ["found 0", "analysed 0", "found 1", "analysed 1", "found 2", "analysed 2"]
+    assert f"{Fore.BLUE}Song 3{Fore.RESET}" in capsys.readouterr().out
+
+
+def test_batch_mode_failed_save(capsys, music_directory, monkeypatch):
+    """A song that can't be saved should be reported by name."""
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", lambda *_: None)
+    monkeypatch.setattr(oggopus.OggOpus, "items", lambda *_: metadata)
+    monkeypatch.setattr(oggopus.OggOpus, "__setitem__", lambda *_: None)
+    monkeypatch.setattr(oggopus.OggOpus, "save", Mock(side_effect=OSError("Disk full")))
+
+    exit_code = app.run(["--directory", music_directory, "--batch", "--sync", "none"])
+
+    actual_output = capsys.readouterr().out
+    assert exit_code == 1
+    assert "Failed to save metadata for file: test: Disk full" in actual_output
+    assert "Failed to save metadata for 1 songs:" in actual_output
+
+
+def test_batch_mode_unreadable_file(capsys, make_opus_file, tmp_path):
+    """A song that can't be read should be reported and skipped."""
+    file_path = make_opus_file(dict(metadata), name="test.opus")
+    (file_path.parent / "broken.opus").write_bytes(b"Not an Opus file at all")
+
+    for extra_args in [[], ["--jobs", "2"]]:
+        exit_code = app.run(["--directory", str(file_path.parent), "--batch", "--no-cache", *extra_args])
+
+        actual_output = capsys.readouterr().out
+        assert exit_code == 1
+        assert "Failed to read metadata for file: broken: " in actual_output
+        assert f"{Fore.GREEN}Metadata saved for file: test" in actual_output
+
+    exit_code = app.run(["--directory", str(file_path.parent), "--plan", str(tmp_path / "plan.jsonl")])
+
+    assert exit_code == 1
+    assert "Failed to read metadata for file: broken: " in capsys.readouterr().out
+    assert [json.loads(line)["path"] for line in (tmp_path / "plan.jsonl").read_text().splitlines()] == [str(file_path)]
+
+
+def test_batch_mode_atomic_save(capsys, make_opus_file):
+    """Saving atomically should write the tags through a copy."""
+    file_path = make_opus_file(dict(metadata), name="test.opus")
+
+    exit_code = app.run(["--directory", str(file_path.parent), "--batch", "--atomic"])
+
+    actual_output = capsys.readouterr().out
+    assert exit_code == 0
+    assert f"{Fore.GREEN}Metadata saved for file: test" in actual_output
+    assert oggopus.OggOpus(file_path)["date"] == ["2029-08-22"]
+    assert not list(file_path.parent.glob(".*.retag-tmp"))
+
+
+def test_plan_and_apply(capsys, make_opus_file, tmp_path):
+    """A plan should change nothing, and applying it should save it."""
+    file_path = make_opus_file(dict(metadata), name="test.opus")
+    stale_file_path = make_opus_file(dict(metadata), name="stale.opus")
+    old_data = file_path.read_bytes()
+    plan_path = tmp_path / "plan.jsonl"
+
+    exit_code = app.run(["--directory", str(file_path.parent), "--plan", str(plan_path)])
+
+    assert exit_code == 0
+    assert file_path.read_bytes() == old_data
+    records = [json.loads(line) for line in plan_path.read_text().splitlines()]
+    assert [record["path"] for record in records] == [str(stale_file_path), str(file_path)]
+    assert records[1]["changes"]["set"]["date"] == ["2029-08-22"]
+    assert "Planned changes to 2 of 2 songs" in capsys.readouterr().out
+
+    stale_file_path.write_bytes(stale_file_path.read_bytes() + b"\0")
+    exit_code = app.run(["--apply", str(plan_path)])
+
+    actual_output = capsys.readouterr().out
+    assert exit_code == 0
+    assert "Changed since the plan was made. Skipping song: stale" in actual_output
+    assert f"{Fore.GREEN}Metadata saved for file: test" in actual_output
+    assert oggopus.OggOpus(file_path)["date"] == ["2029-08-22"]
+
+
+def test_plan_with_file_moved_after_analysis(capsys, make_opus_file, tmp_path, monkeypatch):
+    """A song that is gone when its plan is made should be reported and skipped."""
+    file_path = make_opus_file(dict(metadata), name="test.opus")
+    moved_file_path = make_opus_file(dict(metadata), name="moved.opus")
+    plan_path = tmp_path / "plan.jsonl"
+    analyze = session.pipeline.analyze
+
+    def analyze_and_move(*args, **kwargs):
+        for file_analysis in analyze(*args, **kwargs):
+            if file_analysis.file_path == moved_file_path:
+                moved_file_path.unlink()
+            yield file_analysis
+
+    monkeypatch.setattr(session.pipeline, "analyze", analyze_and_move)
+
+    exit_code = app.run(["--directory", str(file_path.parent), "--plan", str(plan_path), "--no-cache"])
+
+    actual_output = capsys.readouterr().out
+    assert exit_code == 1
+    assert "Failed to read metadata for file: moved: " in actual_output
+    assert "Planned changes to 1 of 2 songs" in actual_output
+    assert [json.loads(line)["path"] for line in plan_path.read_text().splitlines()] == [str(file_path)]
+
+
+def test_directory_required_without_apply(capsys):
+    """The directory should only be optional when applying a plan."""
+    with pytest.raises(SystemExit):
+        app.run([])
+    assert "the following arguments are required: -d/--directory" in capsys.readouterr().err
+
+
+def test_profile(capsys, make_opus_file, tmp_path):
+    """The time spent in each stage should be reported at exit."""
+    file_path = make_opus_file(dict(metadata), name="test.opus")
+    profile_path = tmp_path / "profile.json"
+
+    exit_code = app.run(["--directory", str(file_path.parent), "--batch", "--profile-json", str(profile_path)])
+
+    actual_output = capsys.readouterr().out
+    stages = {row["stage"]: row for row in json.loads(profile_path.read_text())["stages"]}
+    assert exit_code == 0
+    assert "Time spent in each stage:" in actual_output
+    assert {"read", "parse_tags", "parse_description", "prune", "resolve", "save"} <= set(stages)
+    assert stages["read"]["count"] == 1
+    assert stages["parse_tags"]["count"] == 1
+
+
+def test_batch_mode_invalid_config(capsys, music_directory, monkeypatch, tmp_path):
+    """An unknown policy in the config file should be reported."""
+    config_path = tmp_path / "retag.toml"
+    config_path.write_text('[batch]\npolicy = "newest"\n')
+    monkeypatch.setattr(app, "CONFIG_PATH", config_path)
+
+    exit_code = app.run(["--directory", music_directory, "--batch"])
+
+    actual_output = capsys.readouterr().out
+    assert exit_code == 1
+    assert "Unknown resolution policy 'newest'" in actual_output
+
+
+def test_invalid_number_of_jobs(capsys, music_directory):
+    """The number of jobs has to be a positive integer."""
+    with pytest.raises(SystemExit):
+        app.run(["--directory", music_directory, "--jobs", "0"])
+    _, err = capsys.readouterr()
+    assert "must be at least 1: '0'" in err
+
+
+def test_skip_unchanged_file(capsys, music_directory, monkeypatch):
+    """A file that was skipped before and is unchanged isn't read again."""
+    mock_init = Mock(return_value=None)
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", mock_init)
+    monkeypatch.setattr(oggopus.OggOpus, "items", lambda *_: {})
+
+    app.run(["--directory", music_directory])
+    capsys.readouterr()
+    exit_code = app.run(["--directory", music_directory])
+
+    actual_output, _ = capsys.readouterr()
+    assert exit_code == 0
+    assert mock_init.call_count == 1
+    assert f"{Fore.YELLOW}Unchanged since it was skipped. Skipping song.{Fore.RESET}" in actual_output
+
+    app.run(["--directory", music_directory, "--no-cache"])
+    assert mock_init.call_count == 2
+
+
+def test_resume(capsys, music_directory, monkeypatch):
+    """Files handled in the previous session aren't opened when resuming."""
+    mock_init = Mock(return_value=None)
+    monkeypatch.setattr(oggopus.OggOpus, "__init__", mock_init)
+    monkeypatch.setattr(oggopus.OggOpus, "items", lambda *_: {})
+
+    app.run(["--directory", music_directory, "--no-cache"])
+    capsys.readouterr()
+    exit_code = app.run(["--directory", music_directory, "--no-cache", "--resume"])
+
+    actual_output, _ = capsys.readouterr()
+    assert exit_code == 0
+    assert mock_init.call_count == 1
+    assert actual_output == f"{Fore.BLUE}Resuming previous session: 1 songs already handled{Fore.RESET}\n"
+
+
+def test_startup_imports():
+    """Test that parsing arguments doesn't import the slow dependencies."""
+    code = "from retag_opus import app\ntry:\n    app.run(['--version'])\nexcept SystemExit:\n    pass\n"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines() if "|" in line}
+    assert "retag_opus.cli" in imported
+    for module in ("mutagen", "simple_term_menu", "colorama", "shtab", "pydub", "retag_opus.session"):
+        assert module not in imported
+
+
+def test_custom_rules(capsys, make_opus_file, monkeypatch, tmp_path):
+    """Rules in the config file should be parsed, and slow ones reported."""
+    tags = dict(metadata)
+    tags["synopsis"] = [tags["synopsis"][0] + "\n\nTheremin: Jane Doe"]
+    file_path = make_opus_file(tags, name="test.opus")
+    config_path = tmp_path / "retag.toml"
+    config_path.write_text(
+        "[[rules]]\n"
+        'tag = "performer:theremin"\n'
+        'name = "- Theremin"\n'
+        "patterns = ['[tT]heremin:\\s*(.+)']\n"
+        'keywords = ["theremin"]\n'
+        "[[rules]]\n"
+        'tag = "comment"\n'
+        'name = "Comment"\n'
+        "patterns = ['(a|aa)+(x)']\n"
+    )
+    monkeypatch.setattr(app, "CONFIG_PATH", config_path)
+    plan_path = tmp_path / "plan.jsonl"
+
+    exit_code = app.run(["--directory", str(file_path.parent), "--plan", str(plan_path)])
+
+    actual_output = capsys.readouterr().out
+    record = json.loads(plan_path.read_text())
+    assert exit_code == 0
+    assert record["candidates"]["youtube"]["performer:theremin"] == ["Jane Doe"]
+    assert "Warning: a pattern for 'comment' took" in actual_output
+    assert "could make parsing very slow: (a|aa)+(x)" in actual_output
@@ -0,0 +1,131 @@
+"""Tests for atomic_save.py."""
+import json
+import os
+
+import pytest
+from mutagen.oggopus import OggOpus
+
+from retag_opus import atomic_save
+from retag_opus.atomic_save import SAVE_READY, SAVE_STARTED, SaveJournal, clone_file, save_tags_atomically
+
+
+def test_clone_file(tmp_path):
+    """Test that a copy has the same contents and permissions."""
+    source = tmp_path / "source.opus"
+    source.write_bytes(os.urandom(100000))
+    source.chmod(0o640)
+    destination = tmp_path / "destination.opus"
+
+    os.utime(source, ns=(1_000_000_000_000_000_000, 1_100_000_000_000_000_000))
+
+    clone_file(source, destination)
+
+    assert destination.read_bytes() == source.read_bytes()
+    assert destination.stat().st_mode == source.stat().st_mode
+    assert destination.stat().st_mtime_ns == source.stat().st_mtime_ns
+
+
+def test_atomic_save_keeps_file_metadata(make_opus_file, tmp_path):
+    """Test that the saved file keeps the owner and extended attributes."""
+    file_path = make_opus_file({"title": ["Song"]})
+    try:
+        os.setxattr(file_path, "user.rating", b"5")
+    except OSError:
+        pytest.skip("Extended attributes not supported")
+    if os.geteuid() == 0:
+        os.chown(file_path, 1234, 1234)
+    old_stat = file_path.stat()
+    journal = SaveJournal(tmp_path / "saves-1.jsonl")
+
+    save_tags_atomically(file_path, {"title": ["New song"]}, [], 4096, journal)
+    journal.close()
+
+    new_stat = file_path.stat()
+    assert new_stat.st_ino != old_stat.st_ino
+    assert (new_stat.st_uid, new_stat.st_gid) == (old_stat.st_uid, old_stat.st_gid)
+    assert os.getxattr(file_path, "user.rating") == b"5"
+
+
+def test_save_tags_atomically(make_opus_file, tmp_path):
+    """Test that the tags are saved and no copy is left behind."""
+    file_path = make_opus_file({"title": ["Song"], "language": ["en"]})
+    journal_path = SaveJournal.path_for(tmp_path / "state")
+    journal = SaveJournal(journal_path)
+
+    save_tags_atomically(file_path, {"title": ["New song"]}, ["language"], 4096, journal)
+    journal.close()
+
+    assert dict(OggOpus(file_path).items()) == {"title": ["New song"]}
+    assert sorted(path.name for path in file_path.parent.iterdir()) == ["song.opus", "state"]
+    assert not journal_path.exists()
+
+
+def test_failed_save_leaves_file_untouched(make_opus_file, tmp_path, monkeypatch):
+    """Test that the file is unchanged and the copy removed on failure."""
+    file_path = make_opus_file({"title": ["Song"]})
+    old_data = file_path.read_bytes()
+    journal = SaveJournal(tmp_path / "saves.jsonl")
+
+    def failing_save(*_):
+        raise OSError("Disk full")
+
+    monkeypatch.setattr(atomic_save, "save_tags", failing_save)
+
+    with pytest.raises(OSError):
+        save_tags_atomically(file_path, {"title": ["New song"]}, [], 4096, journal)
+
+    assert file_path.read_bytes() == old_data
+    assert not file_path.with_name(".song.opus.retag-tmp").exists()
+
+
+def test_recover(tmp_path):
+    """Test that ready saves are finished and others undone."""
+    ready = tmp_path / "ready.opus"
+    ready.write_bytes(b"old")
+    ready_temp = tmp_path / ".ready.opus.retag-tmp"
+    ready_temp.write_bytes(b"new")
+    started = tmp_path / "started.opus"
+    started.write_bytes(b"old")
+    started_temp = tmp_path / ".started.opus.retag-tmp"
+    started_temp.write_bytes(b"partial")
+    journal_path = tmp_path / "saves-1.jsonl"
+    entries = [
+        {"path": str(ready), "temp": str(ready_temp), "state": SAVE_STARTED},
+        {"path": str(started), "temp": str(started_temp), "state": SAVE_STARTED},
+        {"path": str(ready), "temp": str(ready_temp), "state": SAVE_READY},
+    ]
+    journal_path.write_text("".join(json.dumps(entry) + "\n" for entry in entries) + '{"path": "/mus')
+
+    assert SaveJournal.recover(tmp_path) == (1, 1)
+
+    assert ready.read_bytes() == b"new"
+    assert started.read_bytes() == b"old"
+    assert not ready_temp.exists()
+    assert not started_temp.exists()
+    assert not journal_path.exists()
+    assert SaveJournal.recover(tmp_path) == (0, 0)
+
+
+def test_recover_leaves_open_journals_alone(tmp_path):
+    """Test that the saves of a journal that is still open aren't touched."""
+    file_path = tmp_path / "song.opus"
+    file_path.write_bytes(b"old")
+    temp_path = tmp_path / ".song.opus.retag-tmp"
+    temp_path.write_bytes(b"partial")
+    journal_path = tmp_path / "saves-1.jsonl"
+    journal = SaveJournal(journal_path)
+    journal.record(file_path, temp_path, SAVE_STARTED)
+
+    assert SaveJournal.recover(tmp_path) == (0, 0)
+    assert temp_path.read_bytes() == b"partial"
+    assert journal_path.exists()
+
+    journal.record(file_path, temp_path, SAVE_READY)
+    other_journal = SaveJournal(tmp_path / "saves-2.jsonl")
+    other_journal.close()
+    assert journal_path.exists()
+
+    journal._file.close()
+    assert SaveJournal.recover(tmp_path) == (1, 0)
+    assert file_path.read_bytes() == b"partial"
+    assert not journal_path.exists()
@@ -0,0 +1,44 @@
+"""Tests for benchmark.py."""
+import json
+import random
+
+from retag_opus import benchmark
+from retag_opus.benchmark import DESCRIPTION_KINDS, generate_corpus, generate_description
+from retag_opus.description_parser import DescriptionParser
+
+
+def test_generate_corpus():
+    """Test that the corpus is the same for the same seed."""
+    assert generate_corpus(20, seed=1) == generate_corpus(20, seed=1)
+    assert generate_corpus(20, seed=1) != generate_corpus(20, seed=2)
+
+
+def test_descriptions_can_be_parsed():
+    """Test that the generated descriptions are parsed like real ones."""
+    for kind in DESCRIPTION_KINDS:
+        parser = DescriptionParser()
+        parser.parse(generate_description(random.Random(0), kind))
+
+        assert parser.tags["date"]
+        assert parser.tags["copyright"]
+        assert parser.tags["artist"]
+
+
+def test_run(tmp_path, capsys):
+    """Test that every benchmark is reported."""
+    json_path = tmp_path / "results.json"
+
+    exit_code = benchmark.run(["--descriptions", "10", "--files", "3", "--repeat", "1", "--json", str(json_path)])
+
+    output = capsys.readouterr().out
+    results = json.loads(json_path.read_text())["results"]
+    assert exit_code == 0
+    assert [result["name"] for result in results] == [
+        "description_parse",
+        "tags_parse",
+        "tags_parse_many",
+        "new_data_check",
+        "analyze_file",
+    ]
+    assert all(result["items_per_second"] > 0 for result in results)
+    assert "description_parse" in output
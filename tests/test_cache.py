@@ -0,0 +1,101 @@
+"""Tests for cache.py."""
+import os
+from pathlib import Path
+
+import pytest
+
+from retag_opus.analysis import AnalysisOptions, FileAnalysis
+from retag_opus.cache import AnalysisCache
+from retag_opus.constants import STATUS_PASSED, STATUS_SAVED
+from retag_opus.music_tags import MusicTags
+
+
+@pytest.fixture
+def music_file(tmp_path):
+    """Return path to a fake music file."""
+    file_path = tmp_path / "song.opus"
+    file_path.write_bytes(b"OggS fake header")
+    return file_path
+
+
+@pytest.fixture
+def analysis(music_file):
+    """Return an analysis of the fake music file."""
+    tags = MusicTags()
+    tags.original = {"title": ["title (live)"]}
+    tags.fromtags = {"title": ["title"], "version": ["live"]}
+    tags.resolved = {"title": ["title (live)"], "language": ["[Removed]"]}
+    return FileAnalysis(music_file, tags, ["description"], True)
+
+
+def test_put_and_get(tmp_path, music_file, analysis):
+    """Test that a stored analysis is returned unchanged."""
+    cache = AnalysisCache(tmp_path / "cache" / "cache.sqlite3")
+    options = AnalysisOptions()
+    assert cache.get(music_file, options) is None
+
+    cache.put(analysis, options)
+    cached = cache.get(music_file, options)
+
+    assert cached is not None
+    assert cached.file_path == music_file
+    assert cached.tags.original == analysis.tags.original
+    assert cached.tags.fromtags == analysis.tags.fromtags
+    assert cached.tags.resolved == analysis.tags.resolved
+    assert cached.description_lines == ["description"]
+    assert cached.new_data_exists
+    assert cached.status is None
+    cache.close()
+
+
+def test_changed_file_or_options(tmp_path, music_file, analysis):
+    """Test that changed files and other options aren't cache hits."""
+    cache = AnalysisCache(tmp_path / "cache.sqlite3")
+    cache.put(analysis, AnalysisOptions())
+
+    assert cache.get(music_file, AnalysisOptions(manual_album="album")) is None
+    assert cache.get(music_file, AnalysisOptions(tags_to_delete=["language"])) is None
+
+    stat = os.stat(music_file)
+    os.utime(music_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(music_file, AnalysisOptions()) is None
+
+
+def test_verify_content(tmp_path, music_file, analysis):
+    """Test that content changes are found when verifying content."""
+    cache = AnalysisCache(tmp_path / "cache.sqlite3", verify_content=True)
+    cache.put(analysis, AnalysisOptions())
+    stat = os.stat(music_file)
+    music_file.write_bytes(b"OggS fake HEADER")
+    os.utime(music_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert cache.get(music_file, AnalysisOptions()) is None
+
+
+def test_status(tmp_path, music_file, analysis):
+    """Test that the status is stored and follows the file."""
+    cache = AnalysisCache(tmp_path / "cache.sqlite3")
+    options = AnalysisOptions()
+    cache.put(analysis, options)
+    cache.set_status(music_file, options, STATUS_PASSED)
+    passed = cache.get(music_file, options)
+    assert passed is not None
+    assert passed.status == STATUS_PASSED
+    assert passed.tags.original == analysis.tags.original
+
+    # Saving changes the file
+    music_file.write_bytes(b"OggS fake header with new tags")
+    cache.set_status(music_file, options, STATUS_SAVED)
+    saved = cache.get(music_file, options)
+    assert saved is not None
+    assert saved.status == STATUS_SAVED
+    assert saved.tags.original == {}
+
+
+def test_missing_file(tmp_path):
+    """Test that missing files are ignored."""
+    cache = AnalysisCache(tmp_path / "cache.sqlite3")
+    file_path = Path(tmp_path / "missing.opus")
+    cache.put(FileAnalysis(file_path, MusicTags(), None, False), AnalysisOptions())
+    cache.set_status(file_path, AnalysisOptions(), STATUS_PASSED)
+    assert cache.get(file_path, AnalysisOptions()) is None
@@ -0,0 +1,119 @@
+"""Tests for custom_rules.py."""
+import pytest
+
+from retag_opus.custom_rules import TagRule, rules_from_config
+from retag_opus.description_parser import DescriptionParser
+from retag_opus.exceptions import InvalidConfigException
+from retag_opus.music_tags import MusicTags
+from retag_opus.pattern_engine import PatternEngine
+from retag_opus.tag_table import get_table
+
+THEREMIN_RULE = {
+    "tag": "Performer:Theremin",
+    "name": "- Theremin",
+    "patterns": [r"(.*, )?[tT]heremin.*:\s*(.+)\s*"],
+    "keywords": ["Theremin"],
+}
+
+DESCRIPTION = "\n".join(
+    [
+        "Provided to YouTube by Label",
+        "Song · Artist",
+        "Album",
+        "Theremin: Jane Doe",
+        "Producer: Joe Doe",
+        "Remixed By: Some Remixer",
+    ]
+)
+
+
+def test_rules_from_config():
+    """Test reading valid rules."""
+    rules = rules_from_config({"rules": [THEREMIN_RULE, {"tag": "producer", "patterns": ["Remixed By: (.+)"]}]})
+    assert rules == (
+        TagRule("performer:theremin", "- Theremin", (r"(.*, )?[tT]heremin.*:\s*(.+)\s*",), ("theremin",)),
+        TagRule("producer", None, ("Remixed By: (.+)",), ()),
+    )
+    assert rules_from_config({}) == ()
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        ({"rules": {"tag": "x"}}, "must be an array of tables"),
+        ({"rules": ["x"]}, "Rule 1 must be a table"),
+        ({"rules": [{**THEREMIN_RULE, "pattern": []}]}, "Unknown keys in rule 1: pattern"),
+        ({"rules": [{**THEREMIN_RULE, "tag": "a=b"}]}, "'tag' of rule 1"),
+        ({"rules": [{**THEREMIN_RULE, "tag": "åäö"}]}, "'tag' of rule 1"),
+        ({"rules": [{**THEREMIN_RULE, "name": None, "tag": "newtag"} | {"name": 3}]}, "'name' of rule 1"),
+        ({"rules": [{"tag": "newtag", "patterns": ["(.+)"]}]}, "needs a 'name'"),
+        ({"rules": [{**THEREMIN_RULE, "patterns": []}]}, "Rule 1 has no patterns"),
+        ({"rules": [{**THEREMIN_RULE, "patterns": "(.+)"}]}, "'patterns' of rule 1 must be a list"),
+        ({"rules": [{**THEREMIN_RULE, "patterns": ["(.+"]}]}, "Invalid pattern in rule 1"),
+        ({"rules": [{**THEREMIN_RULE, "patterns": [".+"]}]}, "has no group"),
+        ({"rules": [{**THEREMIN_RULE, "patterns": [r"(a)\1(.+)"]}]}, "backreferences"),
+        ({"rules": [{**THEREMIN_RULE, "patterns": [r"(?P<name>.+)"]}]}, "named groups"),
+        ({"rules": [{**THEREMIN_RULE, "keywords": [""]}]}, "'keywords' of rule 1"),
+    ],
+)
+def test_invalid_rules(config, message):
+    """Test that malformed rules are reported."""
+    with pytest.raises(InvalidConfigException, match=message):
+        rules_from_config(config)
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [r"(?i)(?s)[tT]heremin: (.+)", r"(?x) theremin: \s* (.+)  # the player, after the colon"],
+)
+def test_rules_with_global_flags(pattern):
+    """Test that patterns with several flag groups or a trailing comment work when combined."""
+    rules = rules_from_config({"rules": [{**THEREMIN_RULE, "patterns": [pattern]}]})
+    parser = DescriptionParser(custom_rules=rules)
+    parser.parse(DESCRIPTION.lower())
+    assert parser.tags["performer:theremin"] == ["jane doe"]
+
+
+def test_rules_that_cant_be_combined(monkeypatch):
+    """Test that patterns that only fail as part of the combined regex are reported."""
+    monkeypatch.setattr(PatternEngine, "_scope_global_flags", staticmethod(lambda pattern: pattern))
+    with pytest.raises(InvalidConfigException, match="can't be combined"):
+        rules_from_config({"rules": [{**THEREMIN_RULE, "patterns": [r"(?i)[tT]heremin: (.+)"]}]})
+
+
+def test_rules_are_parsed():
+    """Test that new tags and more patterns for built-in tags are used."""
+    rules = rules_from_config({"rules": [THEREMIN_RULE, {"tag": "producer", "patterns": ["Remixed By: (.+)"]}]})
+    parser = DescriptionParser(custom_rules=rules)
+    parser.parse(DESCRIPTION)
+    assert parser.tags["performer:theremin"] == ["Jane Doe"]
+    assert parser.tags["producer"] == ["Joe Doe", "Some Remixer"]
+
+    parser = DescriptionParser()
+    parser.parse(DESCRIPTION)
+    assert "performer:theremin" not in parser.tags
+    assert parser.tags["producer"] == ["Joe Doe"]
+
+
+def test_rules_in_table():
+    """Test where the tags of rules are printed and matched."""
+    rules = rules_from_config(
+        {
+            "rules": [
+                THEREMIN_RULE,
+                {"tag": "album", "patterns": ["Record: (.+)"]},
+                {"tag": "x", "name": "X", "patterns": ["x: (.+)"]},
+            ]
+        }
+    )
+    table = get_table(custom_rules=rules)
+    assert table is get_table(custom_rules=rules)
+    assert MusicTags(custom_rules=rules).table is table
+    assert table.performer_names["performer:theremin"] == "- Theremin"
+    assert list(table.base_names)[-1] == "x"
+    assert list(table.performer_names)[-1] == "performer:theremin"
+
+    manual_table = get_table(manual_album_set=True, custom_rules=rules)
+    discsubtitle_patterns = [pattern for tag_id, pattern, _ in manual_table.patterns if tag_id == "discsubtitle"]
+    assert discsubtitle_patterns[-1] == "Record: (.+)"
+    assert "album" not in [tag_id for tag_id, _, _ in manual_table.patterns]
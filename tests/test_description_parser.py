@@ -0,0 +1,66 @@
+"""Tests for description_parser.py."""
+from retag_opus.description_parser import DescriptionParser
+
+DESCRIPTION = """Provided to YouTube by Some Records
+
+A Song (feat. Jane Doe) · Joe Doe · Jane Doe
+
+An Album
+
+℗ 2001 Some Records
+
+Composer: Joe Doe
+Producer: Joe Doe
+
+Lyrics line one
+Lyrics line two
+Mixer: Someone
+Composer: Jane Doe
+"""
+
+
+def test_parse_lines():
+    """Test that values are yielded as found and the tags are the same as with parse."""
+    parser = DescriptionParser()
+    found = list(parser.parse_lines(line for line in DESCRIPTION.splitlines()))
+    whole_parser = DescriptionParser()
+    whole_parser.parse(DESCRIPTION)
+
+    assert found == [
+        ("organization", "Some Records"),
+        ("artist", "Joe Doe"),
+        ("artist", "Jane Doe"),
+        ("title", "A Song (feat. Jane Doe)"),
+        ("artist", "Jane Doe"),
+        ("album", "An Album"),
+        ("copyright", "2001 Some Records"),
+        ("composer", "Joe Doe"),
+        ("producer", "Joe Doe"),
+        ("composer", "Jane Doe"),
+        ("date", "2001"),
+    ]
+    assert parser.tags == whole_parser.tags
+    assert parser.tags["composer"] == ["Joe Doe", "Jane Doe"]
+    assert parser.tags["date"] == ["2001"]
+    assert parser.tags["albumartist"] == ["Joe Doe"]
+
+
+def test_stop_tags():
+    """Test that parsing stops once every stop tag has a value."""
+    description = DESCRIPTION.replace("℗ 2001 Some Records\n", "℗ 2001 Some Records\n\nReleased on: 2001-05-01\n")
+    parser = DescriptionParser(stop_tags=("title", "album", "date"))
+    parser.parse(description)
+
+    assert parser.tags["album"] == ["An Album"]
+    assert parser.tags["date"] == ["2001-05-01"]
+    assert parser.tags["artist"] == ["Joe Doe", "Jane Doe"]
+    assert "composer" not in parser.tags
+
+    parser = DescriptionParser(stop_tags=("title", "album", "date"))
+    parser.parse(DESCRIPTION)
+    assert parser.tags["date"] == ["2001"]
+    assert parser.tags["composer"] == ["Joe Doe", "Jane Doe"]
+
+    parser = DescriptionParser(stop_tags=("album", "genre"))
+    parser.parse(DESCRIPTION)
+    assert parser.tags["composer"] == ["Joe Doe", "Jane Doe"]
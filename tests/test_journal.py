@@ -0,0 +1,55 @@
+"""Tests for journal.py."""
+from pathlib import Path
+
+from retag_opus.constants import STATUS_PASSED, STATUS_SAVED, STATUS_SKIPPED
+from retag_opus.journal import SessionJournal
+
+
+def test_record_and_resume(tmp_path):
+    """Test that decisions survive into a resumed session."""
+    journal_path = tmp_path / "state" / "session.jsonl"
+    journal = SessionJournal(journal_path)
+    journal.record(Path("/music/a.opus"), STATUS_SAVED)
+    journal.record(Path("/music/b.opus"), STATUS_SKIPPED)
+    journal.close()
+
+    resumed = SessionJournal(journal_path, resume=True)
+    assert resumed.is_completed(Path("/music/a.opus"))
+    assert resumed.is_completed(Path("/music/b.opus"))
+    assert not resumed.is_completed(Path("/music/c.opus"))
+    resumed.record(Path("/music/c.opus"), STATUS_PASSED)
+    resumed.close()
+
+    assert SessionJournal.read(journal_path) == {
+        "/music/a.opus": STATUS_SAVED,
+        "/music/b.opus": STATUS_SKIPPED,
+        "/music/c.opus": STATUS_PASSED,
+    }
+
+
+def test_new_session_starts_over(tmp_path):
+    """Test that a session that isn't resumed starts an empty journal."""
+    journal_path = tmp_path / "session.jsonl"
+    journal = SessionJournal(journal_path)
+    journal.record(Path("/music/a.opus"), STATUS_SAVED)
+    journal.close()
+
+    SessionJournal(journal_path).close()
+    assert SessionJournal.read(journal_path) == {}
+
+
+def test_partly_written_line(tmp_path):
+    """Test that broken lines, e.g. from a crash, are ignored."""
+    journal_path = tmp_path / "session.jsonl"
+    journal_path.write_text('{"path": "/music/a.opus", "status": "saved"}\n{"path": "/music/b.op')
+    assert SessionJournal.read(journal_path) == {"/music/a.opus": STATUS_SAVED}
+    assert SessionJournal.read(tmp_path / "missing.jsonl") == {}
+
+
+def test_path_for():
+    """Test that each music directory gets its own journal."""
+    state_dir = Path("/state")
+    first = SessionJournal.path_for(state_dir, Path("/music/first"))
+    assert first.parent == state_dir
+    assert first == SessionJournal.path_for(state_dir, Path("/music/first"))
+    assert first != SessionJournal.path_for(state_dir, Path("/music/second"))
@@ -0,0 +1,76 @@
+"""Tests for linear_regex.py."""
+import random
+import re
+import time
+
+import pytest
+
+from retag_opus import constants, linear_regex
+from retag_opus.linear_regex import LinearPattern, UnsupportedPattern
+from retag_opus.tag_table import STANDARD_TABLE
+
+PIECES = ["Song", "(", ")", "[", "]", " - ", " ", "feat. ", "ft ", "Live", "remix", "Remaster", "2011", "\n", "K"]
+PIECES += ["instrumental", "album version", "Name", ", ", ":", "Guitar", "electric ", "  ", "\t", "Composer"]
+
+PATTERNS = [
+    *constants.tag_parse_patterns.values(),
+    *(pattern for _, pattern, _ in STANDARD_TABLE.patterns if "(?!" not in pattern),
+    r"(a|ab)*c",
+    r"x*",
+    r"x*?",
+    r"(?i:b)B",
+    r"^a$",
+    r"\bSong\b",
+    r"(a)?(b)?a",
+    r"(?s).+",
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_same_as_re(pattern):
+    """Test that matches, searches and substitutions agree with re."""
+    rng = random.Random(0)
+    compiled = re.compile(pattern)
+    linear_pattern = LinearPattern(pattern)
+    template = r"\1 \3" if compiled.groups >= 3 else "-"
+    for _ in range(200):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 10)))
+        for method in ("match", "search"):
+            expected = getattr(compiled, method)(text)
+            actual = getattr(linear_pattern, method)(text)
+            assert (actual.span(), actual.groups()) == (expected.span(), expected.groups()) if expected else not actual
+        assert linear_pattern.sub(template, text) == compiled.sub(template, text), text
+
+
+@pytest.mark.parametrize("pattern", [r"(?!a)b", r"(?<=a)b", r"(a)\1", r"(?>a*)b", r"a*+b", r"(a*)*b"])
+def test_unsupported(pattern):
+    """Test that patterns that need backtracking are rejected."""
+    with pytest.raises(UnsupportedPattern):
+        LinearPattern(pattern)
+
+
+def test_unsupported_python_version(monkeypatch):
+    """Test that every pattern is rejected without a known regex parser."""
+    monkeypatch.setattr(linear_regex, "sre_parse", None)
+    with pytest.raises(UnsupportedPattern):
+        LinearPattern(r"a*b")
+
+
+def test_expand():
+    """Test that groups are put into templates like with re."""
+    text = "Song (2011 Remaster)"
+    pattern = r"(.*?)\s*\((\d*)(x)?(.*)\)"
+    linear_match = LinearPattern(pattern).match(text)
+    assert linear_match is not None
+    for template in [r"\1 \4", r"\g<2>-\3\1", r"[\n\\]\-"]:
+        assert linear_match.expand(template) == re.match(pattern, text).expand(template)
+    assert linear_match.group(3) is None
+    assert linear_match.span(2) == (6, 10)
+
+
+def test_linear_time():
+    """Test that a title that makes re backtrack for long is matched fast."""
+    title = "remix" + "  (remix  " * 500
+    start = time.perf_counter()
+    assert LinearPattern(constants.tag_parse_patterns["remix"]).match(title) is None
+    assert time.perf_counter() - start < 1
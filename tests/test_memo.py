@@ -0,0 +1,37 @@
+"""Tests for memo.py."""
+from retag_opus.memo import MEMOS, Memo, counts_since, memo_counts
+from retag_opus.utils import Utils
+
+
+def test_memo():
+    """Test that results are remembered up to the size of the memo."""
+    calls = []
+
+    def double(text):
+        calls.append(text)
+        return text * 2
+
+    memo = Memo("test_double", double, size=2)
+    try:
+        assert [memo("a"), memo("a"), memo("b"), memo("c"), memo("a")] == ["aa", "aa", "bb", "cc", "aa"]
+        assert calls == ["a", "b", "c", "a"]
+        assert memo.counts() == (1, 4)
+
+        memo.resize(0)
+        assert memo("a") == "aa"
+        assert memo("a") == "aa"
+        assert calls[-2:] == ["a", "a"]
+        assert memo.counts() == (1, 6)
+    finally:
+        MEMOS.remove(memo)
+
+
+def test_counts_since():
+    """Test getting the hits and misses of the helpers since a snapshot."""
+    earlier = memo_counts()
+    Utils.split_tag("Artist one, Artist two & Memo test")
+    tags = Utils.split_tag("Artist one, Artist two & Memo test")
+    tags.append("Changed")
+
+    assert Utils.split_tag("Artist one, Artist two & Memo test") == ["Artist one", "Artist two", "Memo test"]
+    assert counts_since(earlier) == {"split_tag": (2, 1)}
@@ -9,6 +9,7 @@ from mock import patch
 
 from retag_opus.exceptions import UserExitException
 from retag_opus.music_tags import MusicTags
+from retag_opus.resolution_policy import ResolutionPolicy
 
 Tags = dict[str, list[str]]
 
@@ -1438,6 +1439,42 @@ class TestMusicTags(unittest.TestCase):
         self.assertEqual(["artist 1"], tags.original.get("artist"))
         self.assertEqual(captured, ("", ""))
 
+    @patch("retag_opus.music_tags.TerminalMenu")
+    def test_resolve_metadata_with_policy(self, mock_menu: MagicMock) -> None:
+        """Test that conflicts are resolved by the policy without menus."""
+        tags = MusicTags()
+        tags.original = {"artist": ["artist 1"], "title": ["title 1"]}
+        tags.youtube = {"artist": ["artist 2", "artist 3"], "title": ["title 2"], "albumartist": ["artist 2"]}
+
+        tags.resolve_metadata(ResolutionPolicy("youtube", {"title": "existing"}))
+        captured = self.capsys.readouterr()  # type: ignore
+        mock_menu.assert_not_called()
+        self.assertEqual(["artist 2", "artist 3"], tags.resolved.get("artist"))
+        self.assertEqual(["title 1"], tags.resolved.get("title"))
+        self.assertEqual(["artist 2"], tags.resolved.get("albumartist"))
+        self.assertIn(
+            Fore.YELLOW
+            + "Title: Mismatch between values in description and metadata. Using existing metadata: ['title 1']."
+            + Fore.RESET,
+            captured.out,
+        )
+
+    @patch("retag_opus.utils.TerminalMenu")
+    def test_determine_album_artist_with_policy(self, mock_menu: MagicMock) -> None:
+        """Test that the album artist isn't selected in a menu with a policy."""
+        tags = MusicTags()
+        tags.original = {"artist": ["artist 1"]}
+        tags.youtube = {"artist": ["artist 2"]}
+        tags.resolved = {"artist": ["artist 2", "artist 3"]}
+        tags.determine_album_artist(ResolutionPolicy())
+        mock_menu.assert_not_called()
+        self.assertEqual(["artist 2"], tags.resolved.get("albumartist"))
+
+        tags.original["albumartist"] = ["artist 1"]
+        tags.resolved.pop("albumartist")
+        tags.determine_album_artist(ResolutionPolicy())
+        self.assertNotIn("albumartist", tags.resolved)
+
     @patch("retag_opus.music_tags.MusicTags.determine_album_artist")
     def test_resolve_metadata_equal_when_stripped(self, mock_album_artist: MagicMock) -> None:
         """Test that new metadata autoresolves when equal when stripped.
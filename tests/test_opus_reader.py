@@ -0,0 +1,70 @@
+"""Tests for opus_reader.py."""
+import pytest
+from mutagen.oggopus import OggOpus
+
+from retag_opus import opus_reader
+from retag_opus.exceptions import OpusHeaderException
+from retag_opus.opus_reader import parse_comment_packet, read_header_packets, read_tags
+
+
+def test_read_tags_like_mutagen(make_opus_file):
+    """Test that the tags are the same as those mutagen reads."""
+    file_path = make_opus_file(
+        {"TITLE": ["Song"], "artist": ["First", "Second"], "Description": ["Line 1\nLine 2 ℗ 2020"]}
+    )
+
+    tags = read_tags(file_path)
+
+    assert tags == {"title": ["Song"], "artist": ["First", "Second"], "description": ["Line 1\nLine 2 ℗ 2020"]}
+    assert tags == dict(OggOpus(file_path).items())
+
+
+def test_read_only_header_pages(make_opus_file):
+    """Test that a comment header spanning several pages is read alone."""
+    long_description = "A long description. " * 10000
+    file_path = make_opus_file({"description": [long_description]}, audio_pages=100)
+
+    with open(file_path, "rb") as f:
+        pages, packets = read_header_packets(f)
+        header_size = f.tell()
+
+    assert len(pages) > 2
+    assert packets[0].startswith(b"OpusHead")
+    assert parse_comment_packet(packets[1]) == {"description": [long_description]}
+    assert header_size < file_path.stat().st_size
+
+
+def test_fall_back_to_mutagen(make_opus_file, monkeypatch):
+    """Test that mutagen reads files with an unusual comment header."""
+    file_path = make_opus_file({"title": ["Song"]})
+
+    def unusual_header(_):
+        raise OpusHeaderException("Unusual")
+
+    monkeypatch.setattr(opus_reader, "parse_comment_packet", unusual_header)
+
+    assert read_tags(file_path) == {"title": ["Song"]}
+
+
+@pytest.mark.parametrize(
+    "packet",
+    [
+        b"OpusTags\x04\x00\x00\x00test\x01\x00\x00\x00\x10\x00\x00\x00title",
+        b"OpusTags\x04\x00\x00\x00test\x01\x00\x00\x00\x08\x00\x00\x00no equal",
+        b"OpusTags\x04\x00\x00\x00test",
+    ],
+)
+def test_invalid_comment_packet(packet):
+    """Test that comments mutagen would have to repair are rejected."""
+    with pytest.raises(OpusHeaderException):
+        parse_comment_packet(packet)
+
+
+def test_not_an_ogg_file(tmp_path):
+    """Test that a file that isn't Ogg can't be read directly."""
+    file_path = tmp_path / "song.opus"
+    file_path.write_bytes(b"ID3" + b"\x00" * 100)
+
+    with open(file_path, "rb") as f:
+        with pytest.raises(OpusHeaderException):
+            read_header_packets(f)
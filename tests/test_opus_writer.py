@@ -0,0 +1,57 @@
+"""Tests for opus_writer.py."""
+from mutagen.oggopus import OggOpus
+
+from retag_opus import opus_writer
+from retag_opus.exceptions import OpusHeaderException
+from retag_opus.opus_reader import read_header_packets, read_tags
+from retag_opus.opus_writer import save_tags
+
+
+def test_save_in_place(make_opus_file):
+    """Test that tags that fit in the padding are written in place."""
+    file_path = make_opus_file({"title": ["Song"], "language": ["en"]}, padding=1000)
+    old_data = file_path.read_bytes()
+    with open(file_path, "rb") as f:
+        read_header_packets(f)
+        header_size = f.tell()
+
+    in_place = save_tags(file_path, {"title": ["New song"], "artist": ["Artist"]}, ["language"])
+
+    new_data = file_path.read_bytes()
+    assert in_place
+    assert len(new_data) == len(old_data)
+    assert new_data[header_size:] == old_data[header_size:]
+    assert dict(OggOpus(file_path).items()) == {"title": ["New song"], "artist": ["Artist"]}
+
+
+def test_save_with_reserved_padding(make_opus_file):
+    """Test that padding is reserved when the tags have to grow."""
+    file_path = make_opus_file({"title": ["Song"]})
+
+    in_place = save_tags(file_path, {"description": ["A long description. " * 500]}, padding=2048)
+
+    assert not in_place
+    metadata = OggOpus(file_path)
+    assert metadata["title"] == ["Song"]
+    assert metadata["description"] == ["A long description. " * 500]
+    assert metadata.info.length > 0
+
+    assert save_tags(file_path, {"artist": ["Artist"]})
+    assert read_tags(file_path) == {
+        "title": ["Song"],
+        "description": ["A long description. " * 500],
+        "artist": ["Artist"],
+    }
+
+
+def test_fall_back_to_mutagen(make_opus_file, monkeypatch):
+    """Test that mutagen saves files with an unusual header layout."""
+    file_path = make_opus_file({"title": ["Song"], "language": ["en"]})
+
+    def unusual_header(*_):
+        raise OpusHeaderException("Unusual")
+
+    monkeypatch.setattr(opus_writer, "_save_header", unusual_header)
+
+    assert not save_tags(file_path, {"title": ["New song"]}, ["language"])
+    assert dict(OggOpus(file_path).items()) == {"title": ["New song"]}
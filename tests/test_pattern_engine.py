@@ -0,0 +1,100 @@
+"""Tests for pattern_engine.py."""
+import re
+import unittest
+
+from retag_opus.memo import counts_since, memo_counts
+from retag_opus.pattern_engine import PatternEngine, get_engine, tag_patterns
+
+
+class TestPatternEngine(unittest.TestCase):
+    """Test the PatternEngine class."""
+
+    lines = [
+        "Provided to YouTube by Rich Men's Group Digital Ltd.",
+        "Proper Goodbyes (feat. Ben Ivor) · The Global · Ben Ivor",
+        "℗ 2022 The Global under exclusive license to 5BE Ltd",
+        "Released on: 2029-08-22",
+        "Composer, Lyricist: Jane Doe",
+        "Lead Vocals: John Doe ",
+        "Vocal Engineer: Not A Singer",
+        "Makeup Artist: Someone",
+        "Associated Performer, Electric Guitar: Guitar Person",
+        "Programmer: Code Person",
+        "“Some Song” by Some Artist from ‘Some Album’",
+        "A line that matches nothing",
+        "",
+        "Associated Performer, Guitar: Guitar Person, Second Person, Electric Guitar: Third Person",
+        "Composer, Lyricist: " + "A Very Long Name, " * 5 + "Last Name",
+        "Lead Vocals: " + "Singer, " * 10 + "Vocal Engineer",
+        "Composer, Lyricist: " + "A Very Long Name, " * 30 + "Last Name",
+        "Lead Vocals: " + "Singer, " * 70 + "Vocal Engineer",
+        "Guitar, Electric Guitar: " + "Guitar Person, " * 40,
+    ]
+
+    def test_same_matches_as_separate_patterns(self) -> None:
+        """Test that the combined regex agrees with the patterns."""
+        for manual_album_set in [False, True]:
+            engine = get_engine(manual_album_set)
+            for line in self.lines:
+                expected = []
+                for tag_id, pattern, _ in tag_patterns(manual_album_set):
+                    pattern_match = re.match(pattern, line)
+                    if pattern_match:
+                        expected.append((tag_id, pattern_match.groups()[-1].strip()))
+                self.assertListEqual(expected, list(engine.match(line)))
+
+    def test_manual_album_uses_discsubtitle(self) -> None:
+        """Test that album patterns are used for discsubtitle."""
+        line = "“Some Song” by Some Artist from ‘Some Album’"
+        self.assertIn(("album", "Some Album"), list(get_engine().match(line)))
+        manual_matches = list(get_engine(manual_album_set=True).match(line))
+        self.assertIn(("discsubtitle", "Some Album"), manual_matches)
+        self.assertNotIn("album", [tag_id for tag_id, _ in manual_matches])
+
+    def test_global_flags_are_scoped(self) -> None:
+        """Test that leading global flags only apply to their pattern."""
+        engine = PatternEngine([("first", r"(?i)mixed by:\s*(.+)", []), ("second", r"Mixed (By)", [])])
+        self.assertListEqual([("first", "Me")], list(engine.match("MIXED BY: Me")))
+        self.assertListEqual([("first", "Me"), ("second", "By")], list(engine.match("Mixed By: Me")))
+
+    def test_pattern_without_group(self) -> None:
+        """Test that patterns without a value group are rejected."""
+        with self.assertRaises(ValueError):
+            PatternEngine([("broken", r"no groups here", [])])
+
+    def test_keywords_select_candidates(self) -> None:
+        """Test that only patterns with a keyword in the line are tried."""
+        engine = PatternEngine(
+            [
+                ("composer", r".*[cC]omposer.*:\s*(.+)", ["composer"]),
+                ("lyricist", r".*[wW]rit(er|ten).*:\s*(.+)", ["writ"]),
+                ("anything", r"(.+)", []),
+            ]
+        )
+        self.assertEqual(frozenset({0, 2}), engine.candidates("COMPOSER: Jane"))
+        self.assertEqual(frozenset({0, 1, 2}), engine.candidates("Composer, Writer: Jane"))
+        self.assertEqual(frozenset({2}), engine.candidates("Mixer: Jane"))
+        self.assertListEqual([("anything", "Mixer: Jane")], list(engine.match("Mixer: Jane")))
+
+    def test_cached_match(self) -> None:
+        """Test that the tags of repeated lines are remembered."""
+        engine = get_engine()
+        earlier = memo_counts()
+        for line in self.lines * 2:
+            self.assertTupleEqual(tuple(engine.match(line)), engine.cached_match(line))
+        hits, misses = counts_since(earlier)["description_line"]
+        self.assertGreaterEqual(hits, len(self.lines))
+        self.assertLessEqual(misses, len(set(self.lines)))
+
+    def test_no_keyword_no_match(self) -> None:
+        """Test that lines without any keyword aren't matched at all."""
+        engine = get_engine()
+        self.assertEqual(frozenset(), engine.candidates("Mixing Engineer: Someone"))
+        self.assertListEqual([], list(engine.match("Mixing Engineer: Someone")))
+
+    def test_keywords_are_in_matched_lines(self) -> None:
+        """Test that the built-in keywords are present in matched lines."""
+        for tag_id, pattern, keywords in tag_patterns():
+            for line in self.lines:
+                if re.match(pattern, line):
+                    self.assertTrue(any(k in line.lower() for k in keywords), f"{tag_id}: {line}")
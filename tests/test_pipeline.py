@@ -0,0 +1,66 @@
+"""Tests for pipeline.py."""
+from retag_opus import pipeline
+from retag_opus.profiling import STAGE_RESOLVE, STAGE_WAIT_FOR_ANALYSIS, Profiler
+from retag_opus.resolution_policy import ResolutionPolicy
+
+DESCRIPTION = (
+    "Provided to YouTube by Some Records\n\n"
+    "Proper Goodbyes · The Global\n\n"
+    "An Album\n\n"
+    "Released on: 2022-08-22\n"
+)
+
+
+def test_analyze(make_opus_file, capsys):
+    """Test that tags are proposed without printing anything."""
+    conflicting = make_opus_file(
+        {"title": ["Proper Goodbyes"], "artist": ["Someone Else"], "description": [DESCRIPTION]}, "conflicting.opus"
+    )
+    unchanged = make_opus_file({"title": ["Nothing new"]}, "unchanged.opus")
+
+    analyses = list(pipeline.analyze(file_path for file_path in [conflicting, unchanged]))
+
+    assert [analysis.file_path for analysis in analyses] == [conflicting, unchanged]
+    assert capsys.readouterr().out == ""
+    proposed, skipped = analyses
+    assert proposed.resolved is not None
+    assert proposed.resolved["artist"] == ["The Global"]
+    assert proposed.resolved["album"] == ["An Album"]
+    assert proposed.conflicts["artist"]["existing"] == ["Someone Else"]
+    assert proposed.conflicts["artist"]["youtube"] == ["The Global"]
+    assert any("Album" in message for message in proposed.messages)
+    assert skipped.resolved is None
+    assert skipped.conflicts == {}
+
+
+def test_analyze_with_policy_and_profiler(make_opus_file):
+    """Test that the policy is used and the stages are timed."""
+    file_path = make_opus_file({"title": ["Proper Goodbyes"], "artist": ["Someone Else"], "description": [DESCRIPTION]})
+    profiler = Profiler()
+    profiler.enable()
+
+    (analysis,) = pipeline.analyze([file_path], policy=ResolutionPolicy("existing"), profiler=profiler)
+
+    assert analysis.resolved is not None
+    assert analysis.resolved["artist"] == ["Someone Else"]
+    assert {STAGE_WAIT_FOR_ANALYSIS, STAGE_RESOLVE} <= set(profiler.durations)
+
+    (analysis,) = pipeline.analyze([file_path], propose_tags=False)
+    assert analysis.resolved is None
+
+
+def test_analyze_unreadable_file(make_opus_file, tmp_path):
+    """Test that a file that can't be read is yielded with the error."""
+    first = make_opus_file({"title": ["Proper Goodbyes"], "description": [DESCRIPTION]}, "first.opus")
+    broken = tmp_path / "broken.opus"
+    broken.write_bytes(b"Not an Opus file at all")
+    last = make_opus_file({"title": ["Proper Goodbyes"], "description": [DESCRIPTION]}, "last.opus")
+
+    for jobs in [1, 2]:
+        analyses = list(pipeline.analyze([first, broken, last], jobs=jobs))
+
+        assert [analysis.file_path for analysis in analyses] == [first, broken, last]
+        assert analyses[1].error is not None
+        assert analyses[1].resolved is None
+        assert analyses[0].error is None and analyses[0].resolved is not None
+        assert analyses[2].error is None and analyses[2].resolved is not None
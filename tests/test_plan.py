@@ -0,0 +1,64 @@
+"""Tests for plan.py."""
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from retag_opus.analysis import FileAnalysis
+from retag_opus.exceptions import InvalidPlanException
+from retag_opus.music_tags import REMOVED_TAG, MusicTags
+from retag_opus.plan import plan_record, read_plan
+
+
+def test_plan_record(tmp_path):
+    """Test that only tags that differ from the original are changed."""
+    file_path = tmp_path / "song.opus"
+    file_path.write_bytes(b"data")
+    tags = MusicTags()
+    tags.original = {"title": ["Song"], "language": ["en"], "artist": ["Artist"]}
+    tags.youtube = {"album": ["Album"]}
+    resolved = {"title": ["Song"], "language": REMOVED_TAG, "album": ["Album"], "genre": REMOVED_TAG}
+
+    record = plan_record(FileAnalysis(file_path, tags, ["Description"], True), resolved)
+
+    assert record["path"] == str(file_path)
+    assert record["size"] == 4
+    assert record["candidates"]["youtube"] == {"album": ["Album"]}
+    assert record["changes"] == {"set": {"album": ["Album"]}, "delete": ["language"]}
+    json.dumps(record)
+
+
+def test_read_plan(tmp_path):
+    """Test that planned changes are read and checked against the song."""
+    file_path = tmp_path / "song.opus"
+    file_path.write_bytes(b"data")
+    stat = os.stat(file_path)
+    records = [
+        {"path": str(file_path), "size": 4, "mtime_ns": stat.st_mtime_ns, "changes": {"set": {}, "delete": []}},
+        {
+            "path": str(file_path),
+            "size": 5,
+            "mtime_ns": stat.st_mtime_ns,
+            "changes": {"set": {"album": ["Album"]}, "delete": ["language"]},
+        },
+    ]
+    plan_path = tmp_path / "plan.jsonl"
+    plan_path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    current, stale = read_plan(plan_path)
+
+    assert current.file_path == Path(file_path)
+    assert current.is_empty()
+    assert current.is_current()
+    assert not stale.is_current()
+    assert stale.resolved == {"album": ["Album"], "language": REMOVED_TAG}
+
+
+def test_invalid_plan(tmp_path):
+    """Test that an invalid line is reported with its number."""
+    plan_path = tmp_path / "plan.jsonl"
+    plan_path.write_text('\n{"path": "song.opus"}\n')
+
+    with pytest.raises(InvalidPlanException, match="line 2"):
+        list(read_plan(plan_path))
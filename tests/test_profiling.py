@@ -0,0 +1,63 @@
+"""Tests for profiling.py."""
+import json
+
+from retag_opus.profiling import Profiler, percentile
+
+
+def test_percentile():
+    """Test the nearest-rank percentiles."""
+    values = [float(number) for number in range(1, 21)]
+
+    assert percentile(values, 0.5) == 10.0
+    assert percentile(values, 0.95) == 19.0
+    assert percentile([3.0], 0.95) == 3.0
+
+
+def test_summary(tmp_path):
+    """Test that durations are summarised per stage."""
+    profiler = Profiler()
+    profiler.enable()
+    for seconds in [0.1, 0.2, 0.3]:
+        profiler.add("parse", seconds)
+    profiler.add_all({"read": 1.0})
+
+    summary = profiler.summary()
+
+    assert [row["stage"] for row in summary] == ["read", "parse"]
+    assert summary[1]["count"] == 3
+    assert summary[1]["p50"] == 0.2
+    assert summary[1]["max"] == 0.3
+    assert "parse" in profiler.format_table()
+    profiler.write_json(tmp_path / "profile.json")
+    assert json.loads((tmp_path / "profile.json").read_text())["stages"] == summary
+
+
+def test_stage_and_iterate():
+    """Test timing blocks of code and getting items from an iterator."""
+    profiler = Profiler()
+    with profiler.stage("off"):
+        pass
+    profiler.enable()
+    with profiler.stage("block"):
+        pass
+
+    assert list(profiler.iterate("next", [1, 2])) == [1, 2]
+    assert set(profiler.durations) == {"block", "next"}
+    assert len(profiler.durations["next"]) == 3
+
+
+def test_memo_counts(tmp_path):
+    """Test that hits and misses of the memos are added up and reported."""
+    profiler = Profiler()
+    profiler.add_memo_counts({"split_tag": (1, 1)})
+    profiler.enable()
+    profiler.add_memo_counts({"split_tag": (3, 1)})
+    profiler.add_memo_counts({"split_tag": (0, 4), "prune_title": (2, 0)})
+
+    assert profiler.memo_summary() == [
+        {"memo": "prune_title", "hits": 2, "misses": 0, "hit_rate": 1.0},
+        {"memo": "split_tag", "hits": 3, "misses": 5, "hit_rate": 0.375},
+    ]
+    assert "37.5%" in profiler.format_table()
+    profiler.write_json(tmp_path / "profile.json")
+    assert json.loads((tmp_path / "profile.json").read_text())["memos"] == profiler.memo_summary()
@@ -0,0 +1,52 @@
+"""Tests for regex_audit.py."""
+from retag_opus import regex_audit
+from retag_opus.custom_rules import TagRule
+from retag_opus.regex_audit import SOURCE_RULE, SOURCE_TITLE, PatternAudit, audit_patterns, find_slow_match
+
+THEREMIN_PATTERN = r"(.*, )?[tT]heremin.*:\s*(.+)\s*"
+
+
+def test_find_slow_match():
+    """Test that only catastrophic backtracking is reported."""
+    assert find_slow_match(THEREMIN_PATTERN, ("theremin",)) is None
+    slow_match = find_slow_match(r"(.*, )?[tT]heremin(a|aa)+(x)", ("theremin",))
+    assert slow_match is not None
+    seconds, length = slow_match
+    assert seconds > 0.01
+    assert length <= 300
+
+
+def test_pattern_audit():
+    """Test that patterns LinearPattern can't match are reported as slow."""
+    audit = PatternAudit(SOURCE_RULE, "comment", r"(?!x)(a|aa)+(x)", ())
+    assert not audit.linear
+    assert audit.is_slow
+    assert audit.describe().startswith("slow     rule comment: (?!x)(a|aa)+(x)\n")
+
+    audit = PatternAudit(SOURCE_RULE, "performer:theremin", THEREMIN_PATTERN, ("theremin",))
+    assert audit.linear
+    assert not audit.is_slow
+    assert audit.guarded_slow_match is None
+    assert audit.describe() == f"ok       rule performer:theremin: {THEREMIN_PATTERN}"
+
+
+def test_built_in_patterns_are_not_slow():
+    """Test that every built-in pattern is fast or guarded."""
+    audits = audit_patterns((TagRule("comment", None, (r"(a|aa)+(x)",), ()),))
+    assert [audit.tag for audit in audits if audit.is_slow] == ["comment"]
+    guarded = [audit.tag for audit in audits if audit.source == SOURCE_TITLE and audit.guarded_slow_match is not None]
+    assert guarded
+
+
+def test_run(tmp_path, capsys):
+    """Test that the exit code tells whether any pattern is slow."""
+    config_path = tmp_path / "retag.toml"
+    assert regex_audit.run(["--config", str(config_path)]) == 0
+    assert "slow     " not in capsys.readouterr().out
+
+    config_path.write_text("[[rules]]\ntag = 'comment'\nname = 'Comment'\npatterns = ['(a|aa)+(x)']\n")
+    assert regex_audit.run(["--config", str(config_path)]) == 1
+    assert "slow     rule comment: (a|aa)+(x)" in capsys.readouterr().out
+
+    config_path.write_text("rules = 1\n")
+    assert regex_audit.run(["--config", str(config_path)]) == 2
@@ -0,0 +1,63 @@
+"""Tests for resolution_policy.py."""
+import unittest
+
+from retag_opus.exceptions import InvalidConfigException
+from retag_opus.resolution_policy import ResolutionPolicy
+
+
+class TestResolutionPolicy(unittest.TestCase):
+    """Test the ResolutionPolicy class."""
+
+    candidates = {
+        "youtube": ["youtube artist"],
+        "fromdesc": ["parsed youtube artist"],
+        "fromtags": ["parsed artist"],
+        "existing": ["existing artist"],
+    }
+
+    def test_choose_default_policy(self) -> None:
+        """Test that the preferred source is chosen."""
+        self.assertEqual(
+            ("YouTube description", ["youtube artist"]), ResolutionPolicy().choose("artist", self.candidates)
+        )
+        self.assertEqual(
+            ("Existing metadata", ["existing artist"]), ResolutionPolicy("existing").choose("artist", self.candidates)
+        )
+        self.assertEqual(
+            ("Parsed from original tags", ["parsed artist"]),
+            ResolutionPolicy("fromtags").choose("artist", self.candidates),
+        )
+
+    def test_choose_falls_back(self) -> None:
+        """Test that the next source is used if the preferred is empty."""
+        candidates = {"youtube": [], "fromdesc": ["parsed youtube artist"], "existing": ["existing artist"]}
+        self.assertEqual(
+            ("Parsed from YouTube tags", ["parsed youtube artist"]), ResolutionPolicy().choose("artist", candidates)
+        )
+        self.assertEqual(("Existing metadata", []), ResolutionPolicy().choose("artist", {}))
+
+    def test_tag_policies(self) -> None:
+        """Test that per-tag policies override the default policy."""
+        policy = ResolutionPolicy("youtube", {"title": "existing"})
+        self.assertEqual(("Existing metadata", ["existing artist"]), policy.choose("title", self.candidates))
+        self.assertEqual(("YouTube description", ["youtube artist"]), policy.choose("artist", self.candidates))
+
+    def test_from_config(self) -> None:
+        """Test reading the policy from the config file."""
+        config = {"batch": {"policy": "fromtags", "tag_policies": {"date": "youtube"}}}
+        policy = ResolutionPolicy.from_config(config)
+        self.assertEqual("fromtags", policy.policy_for("artist"))
+        self.assertEqual("youtube", policy.policy_for("date"))
+        self.assertEqual("existing", ResolutionPolicy.from_config(config, "existing").policy_for("artist"))
+        self.assertEqual("youtube", ResolutionPolicy.from_config({}).policy_for("artist"))
+
+    def test_invalid_config(self) -> None:
+        """Test that unknown policies and malformed sections are rejected."""
+        with self.assertRaises(InvalidConfigException):
+            ResolutionPolicy.from_config({"batch": {"policy": "newest"}})
+        with self.assertRaises(InvalidConfigException):
+            ResolutionPolicy.from_config({"batch": {"tag_policies": {"artist": "newest"}}})
+        with self.assertRaises(InvalidConfigException):
+            ResolutionPolicy.from_config({"batch": "youtube"})
+        with self.assertRaises(InvalidConfigException):
+            ResolutionPolicy.from_config({"batch": {"tag_policies": ["artist"]}})
@@ -0,0 +1,69 @@
+"""Tests for scanner.py."""
+from pathlib import Path
+
+import pytest
+
+from retag_opus.scanner import scan_music_files
+
+
+@pytest.fixture
+def music_tree(tmp_path):
+    """Create a directory tree with music and other files."""
+    for relative_path in [
+        "b.opus",
+        "a.opus",
+        "cover.jpg",
+        "Artist/Album/01.opus",
+        "Artist/Album/02.opus",
+        "Artist/Live/01.opus",
+        "Other/song.OPUS",
+    ]:
+        file_path = tmp_path / relative_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.touch()
+    (tmp_path / "folder.opus").mkdir()
+    return tmp_path
+
+
+def relative(paths, root: Path) -> list[str]:
+    """Convert paths to strings relative to root."""
+    return [path.relative_to(root).as_posix() for path in paths]
+
+
+def test_top_level_only(music_tree):
+    """Test that only files in the directory itself are found."""
+    assert relative(scan_music_files(music_tree), music_tree) == ["a.opus", "b.opus"]
+
+
+def test_recursive(music_tree):
+    """Test that subdirectories are scanned in order."""
+    assert relative(scan_music_files(music_tree, recursive=True), music_tree) == [
+        "a.opus",
+        "b.opus",
+        "Artist/Album/01.opus",
+        "Artist/Album/02.opus",
+        "Artist/Live/01.opus",
+    ]
+
+
+def test_include_and_exclude(music_tree):
+    """Test filtering files and directories with glob patterns."""
+    found = scan_music_files(music_tree, recursive=True, include=["*.opus", "*.OPUS"], exclude=["Live", "b.*"])
+    assert relative(found, music_tree) == ["a.opus", "Artist/Album/01.opus", "Artist/Album/02.opus", "Other/song.OPUS"]
+
+    found = scan_music_files(music_tree, recursive=True, exclude=["Artist/Album/0[2-9].opus"])
+    assert relative(found, music_tree) == ["a.opus", "b.opus", "Artist/Album/01.opus", "Artist/Live/01.opus"]
+
+
+def test_is_lazy(music_tree):
+    """Test that files are yielded before the whole tree is scanned."""
+    found = scan_music_files(music_tree, recursive=True)
+    assert next(found) == music_tree / "a.opus"
+    (music_tree / "Artist" / "Album" / "03.opus").touch()
+    assert relative(found, music_tree) == [
+        "b.opus",
+        "Artist/Album/01.opus",
+        "Artist/Album/02.opus",
+        "Artist/Album/03.opus",
+        "Artist/Live/01.opus",
+    ]
@@ -0,0 +1,75 @@
+"""Tests for tag_store.py."""
+import json
+import pickle
+
+from retag_opus.music_tags import MusicTags
+from retag_opus.tag_store import TagStore
+
+
+def test_behaves_like_dict():
+    """Test that the store reads and compares like a dictionary of lists."""
+    tags = TagStore({"artist": ["Artist 1", "Artist 2"], "title": ["Song"]})
+    assert tags == {"artist": ["Artist 1", "Artist 2"], "title": ["Song"]}
+    assert tags["artist"] == ["Artist 1", "Artist 2"]
+    assert tags.get("album") is None
+    assert "title" in tags
+    assert list(tags) == ["artist", "title"]
+    assert len(tags) == 2
+    assert tags.pop("title") == ["Song"]
+    assert json.dumps(tags.as_dict()) == '{"artist": ["Artist 1", "Artist 2"]}'
+
+
+def test_values_are_copies():
+    """Test that changing a list read from the store doesn't change it."""
+    tags = TagStore({"artist": ["Artist 1"]})
+    artists = tags["artist"]
+    artists.append("Artist 2")
+    assert tags["artist"] == ["Artist 1"]
+    tags["artist"] = artists
+    assert tags["artist"] == ["Artist 1", "Artist 2"]
+
+
+def test_keys_and_short_values_are_interned():
+    """Test that equal tag names and short values are the same object."""
+    first = TagStore({"".join(["art", "ist"]): ["".join(["Some ", "Name"])]})
+    second = TagStore({"".join(["arti", "st"]): ["".join(["Some N", "ame"])]})
+    assert next(iter(first)) is next(iter(second))
+    assert first._data["artist"][0] is second._data["artist"][0]
+    long_value = "x" * 1000
+    assert TagStore({"synopsis": [long_value]})._data["synopsis"][0] is long_value
+
+
+def test_copy_on_write():
+    """Test that copies share entries until one of them is changed."""
+    original = TagStore({"artist": ["Artist 1"], "title": ["Song"]})
+    copy = original.copy()
+    assert copy._data is original._data
+    copy["artist"] = ["Artist 2"]
+    del copy["title"]
+    assert copy._data is not original._data
+    assert original == {"artist": ["Artist 1"], "title": ["Song"]}
+    assert copy == {"artist": ["Artist 2"]}
+    original["title"] = ["Other Song"]
+    assert copy == {"artist": ["Artist 2"]}
+
+
+def test_music_tags_sources():
+    """Test that tags assigned to a song are stored as separate stores."""
+    tags = MusicTags()
+    tags.original = {"artist": ["Artist 1"]}
+    tags.resolved = tags.original
+    assert isinstance(tags.original, TagStore)
+    tags.resolved["artist"] = ["Artist 2"]
+    assert tags.original == {"artist": ["Artist 1"]}
+    assert tags.resolved == {"artist": ["Artist 2"]}
+
+
+def test_pickle_keeps_sharing_safe():
+    """Test that pickled copies still don't change each other."""
+    tags = MusicTags()
+    tags.original = {"artist": ["Artist 1"]}
+    tags.resolved = tags.original
+    unpickled = pickle.loads(pickle.dumps(tags))
+    unpickled.resolved["artist"] = ["Artist 2"]
+    assert unpickled.original == {"artist": ["Artist 1"]}
+    assert unpickled.resolved == {"artist": ["Artist 2"]}
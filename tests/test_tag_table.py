@@ -0,0 +1,58 @@
+"""Tests for tag_table.py."""
+import pickle
+import unittest
+
+from retag_opus import constants
+from retag_opus.music_tags import MusicTags
+from retag_opus.tag_table import MANUAL_ALBUM_TABLE, STANDARD_TABLE, get_table
+
+
+class TestTagTable(unittest.TestCase):
+    """Test the TagTable class."""
+
+    def test_tables_are_shared(self) -> None:
+        """Test that songs share the table of their mode."""
+        self.assertIs(MusicTags().table, STANDARD_TABLE)
+        self.assertIs(MusicTags(manual_album_set=True).table, MANUAL_ALBUM_TABLE)
+        self.assertIs(get_table(), get_table())
+
+    def test_tables_are_read_only(self) -> None:
+        """Test that the shared tables can't be changed."""
+        with self.assertRaises(TypeError):
+            STANDARD_TABLE.base_names["album"] = "Changed"  # type: ignore
+        with self.assertRaises(TypeError):
+            MANUAL_ALBUM_TABLE.performer_names["performer:vocals"] = "Changed"  # type: ignore
+
+    def test_standard_table(self) -> None:
+        """Test that the standard table has the tags of the constants."""
+        self.assertListEqual(list(constants.all_tags), list(STANDARD_TABLE.base_names))
+        self.assertListEqual(list(constants.performer_tags), list(STANDARD_TABLE.performer_names))
+        self.assertEqual("Album", STANDARD_TABLE.base_names["album"])
+        self.assertIn("album", [tag_id for tag_id, _, _ in STANDARD_TABLE.patterns])
+
+    def test_manual_album_table(self) -> None:
+        """Test that album patterns are used for the disc subtitle."""
+        self.assertEqual("discsubtitle", list(MANUAL_ALBUM_TABLE.base_names)[-1])
+        self.assertEqual("Disc subtitle", MANUAL_ALBUM_TABLE.base_names["discsubtitle"])
+        self.assertEqual("Album", MANUAL_ALBUM_TABLE.base_names["album"])
+        tag_ids = [tag_id for tag_id, _, _ in MANUAL_ALBUM_TABLE.patterns]
+        self.assertNotIn("album", tag_ids)
+        album_patterns = [pattern for tag_id, pattern, _ in STANDARD_TABLE.patterns if tag_id == "album"]
+        discsubtitle_patterns = [
+            pattern for tag_id, pattern, _ in MANUAL_ALBUM_TABLE.patterns if tag_id == "discsubtitle"
+        ]
+        self.assertListEqual(album_patterns, discsubtitle_patterns)
+        self.assertNotIn("discsubtitle", STANDARD_TABLE.base_names)
+
+    def test_is_known(self) -> None:
+        """Test checking whether a tag is in the table."""
+        self.assertTrue(STANDARD_TABLE.is_known("title"))
+        self.assertTrue(STANDARD_TABLE.is_known("performer:vocals"))
+        self.assertFalse(STANDARD_TABLE.is_known("discsubtitle"))
+        self.assertTrue(MANUAL_ALBUM_TABLE.is_known("discsubtitle"))
+        self.assertFalse(STANDARD_TABLE.is_known("purl"))
+
+    def test_pickled_as_shared_table(self) -> None:
+        """Test that unpickled songs use the shared table."""
+        tags = pickle.loads(pickle.dumps(MusicTags(manual_album_set=True)))
+        self.assertIs(tags.table, MANUAL_ALBUM_TABLE)
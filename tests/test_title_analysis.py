@@ -0,0 +1,107 @@
+"""Tests for title_analysis.py."""
+import random
+import re
+import time
+
+import pytest
+
+from retag_opus import constants, linear_regex, title_analysis
+from retag_opus.linear_regex import LINEAR_MATCH_LENGTH
+from retag_opus.tags_parser import TagsParser
+from retag_opus.title_analysis import TitleAnalysis
+
+TITLES = [
+    "A song",
+    "Song name (feat. Second Artist) (2022 Remaster)",
+    "Song name (Artist remix) (Live at famous arena) ft. Second Artist",
+    "Song name - 2011 Remastered Version",
+    "Song name [Instrumental] (instrumental)",
+    "Song name (Album Version)",
+    "Album (Live) Version",
+    "Album(live) version (album version)",
+    "x(live)ft. Y",
+    "Song (Remix)\nsecond line (Live)\nthird - Remix",
+    "Song (Kelvin Remix)",
+    "Song (Liſe) (remaſter)",
+    "Spring (för livet)",
+    "",
+]
+
+
+def reference_prune(title: str) -> str:
+    """Prune a title the way it was done before the single pass."""
+    for pattern in constants.tag_parse_patterns.values():
+        title = re.sub(pattern, r"\1 \3", title)
+    return title.strip()
+
+
+def random_title(rng: random.Random) -> str:
+    """Put together a title from pieces that the patterns look for."""
+    pieces = ["Song", "(", ")", "[", "]", " - ", " ", "feat. ", "ft ", "Live", "remix", "Remaster", "2011"]
+    pieces += ["instrumental", "album version", "\n", "K", "Name", ", ", " and "]
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+
+
+@pytest.mark.parametrize("title", TITLES)
+def test_same_as_separate_patterns(title):
+    """Test that the analysis agrees with matching the patterns one by one."""
+    analysis = TitleAnalysis(title)
+    for name, pattern in constants.tag_parse_patterns.items():
+        expected = re.match(pattern, title)
+        actual = analysis.matches[name]
+        assert (expected.groups() if expected else None) == (actual.groups() if actual else None)
+    assert analysis.pruned == reference_prune(title)
+
+
+def test_random_titles():
+    """Test pruning random titles against substituting each pattern."""
+    rng = random.Random(0)
+    for _ in range(2000):
+        title = random_title(rng)
+        assert TitleAnalysis(title).pruned == reference_prune(title), title
+
+
+def test_parse_many():
+    """Test that parsing many sets of tags gives the same as one by one."""
+    tag_sets = [{"title": [title], "artist": ["Artist 1, Artist 2"]} for title in TITLES] * 2
+    expected = []
+    for tags in tag_sets:
+        tags_parser = TagsParser(tags)
+        tags_parser.parse_tags()
+        tags_parser.split_select_original_tags()
+        expected.append(tags_parser.tags)
+    assert TagsParser.parse_many(tag_sets, split_original=True) == expected
+    assert TagsParser.parse_many(tag_sets[:2]) == [
+        {},
+        {"version": ["2022 Remaster"], "artist": ["Artist 1", "Artist 2", "Second Artist"], "title": ["Song name"]},
+    ]
+
+
+def test_long_titles():
+    """Test that long titles, matched in linear time, are pruned the same."""
+    rng = random.Random(1)
+    for _ in range(10):
+        pieces = ["Long song name ", "(feat. Artist)", " - ", "(Live) ", "[remix] "]
+        title = "A song with a long name" + "".join(rng.choice(pieces) for _ in range(60))
+        analysis = TitleAnalysis(title + random_title(rng))
+        assert len(analysis.title) > LINEAR_MATCH_LENGTH
+        assert analysis.pruned == reference_prune(analysis.title), analysis.title
+
+
+def test_long_titles_without_linear_patterns(monkeypatch):
+    """Test that long titles are matched with re if LinearPattern can't be used."""
+    monkeypatch.setattr(linear_regex, "sre_parse", None)
+    monkeypatch.setattr(title_analysis, "_linear_patterns", {})
+    title = "A song with a long name" + " (feat. Artist)" * 40 + " (Live)"
+
+    analysis = TitleAnalysis(title)
+
+    assert len(analysis.title) > LINEAR_MATCH_LENGTH
+    assert analysis.pruned == reference_prune(analysis.title)
+
+
+def test_pathological_title():
+    """Test that a title the patterns backtrack on is analysed fast."""
+    start = time.perf_counter()
+    TitleAnalysis("Song - remix" + "  (remix  " * 300)
+    assert time.perf_counter() - start < 2
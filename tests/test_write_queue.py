@@ -0,0 +1,79 @@
+"""Tests for write_queue.py."""
+import os
+from pathlib import Path
+
+from mutagen.oggopus import OggOpus
+
+from retag_opus import write_queue
+from retag_opus.constants import SYNC_BATCH, SYNC_FILE, SYNC_NONE
+from retag_opus.music_tags import REMOVED_TAG
+from retag_opus.write_queue import WriteQueue
+
+
+def test_save_in_background(make_opus_file):
+    """Test that staged tags are saved and reported in order."""
+    file_paths = [make_opus_file({"title": ["Song"], "language": ["en"]}, name=f"{n}.opus") for n in range(10)]
+    queue = WriteQueue(sync=SYNC_NONE, writers=3)
+
+    for number, file_path in enumerate(file_paths):
+        queue.stage(file_path, f"Song {number}", {"title": [f"Song {number}"], "language": REMOVED_TAG})
+    results = queue.completed() + queue.close()
+
+    assert [result.song_name for result in results] == [f"Song {number}" for number in range(10)]
+    assert all(result.error is None for result in results)
+    assert queue.saved == 10
+    for number, file_path in enumerate(file_paths):
+        assert dict(OggOpus(file_path).items()) == {"title": [f"Song {number}"]}
+
+
+def test_report_failures(make_opus_file):
+    """Test that a failed save is reported with the song name."""
+    file_path = make_opus_file({"title": ["Song"]})
+    queue = WriteQueue(sync=SYNC_FILE)
+
+    queue.stage(Path("/nonexistent/song.opus"), "Missing song", {"title": ["Song"]})
+    queue.stage(file_path, "Song", {"artist": ["Artist"]})
+    results = queue.close()
+
+    assert results[0].error is not None
+    assert results[1].error is None
+    assert queue.saved == 1
+    assert queue.failed == ["Missing song"]
+
+
+def test_batched_sync(make_opus_file, monkeypatch):
+    """Test that files are synced together when the queue is flushed."""
+    synced: list[Path] = []
+    monkeypatch.setattr(write_queue, "sync_file", synced.append)
+    file_paths = [make_opus_file({"title": ["Song"]}, name=f"{n}.opus") for n in range(3)]
+    queue = WriteQueue(sync=SYNC_BATCH)
+
+    for file_path in file_paths:
+        queue.stage(file_path, file_path.stem, {"artist": ["Artist"]})
+    results = queue.close()
+
+    assert [result.file_path for result in results] == file_paths
+    assert synced == file_paths
+
+
+def test_batched_sync_failure(make_opus_file, monkeypatch):
+    """Test that songs are only reported as saved once they are synced."""
+    file_paths = [make_opus_file({"title": ["Song"]}, name=f"{n}.opus") for n in range(2)]
+    queue = WriteQueue(sync=SYNC_BATCH)
+
+    for file_path in file_paths:
+        queue.stage(file_path, file_path.stem, {"artist": ["Artist"]})
+    for future in list(queue._pending):
+        future.result()
+    assert queue.completed() == []
+
+    def failing_fsync(_):
+        raise OSError("I/O error")
+
+    monkeypatch.setattr(os, "fsync", failing_fsync)
+    results = queue.close()
+
+    assert [result.file_path for result in results] == file_paths
+    assert all(isinstance(result.error, OSError) for result in results)
+    assert queue.saved == 0
+    assert queue.failed == ["0", "1"]